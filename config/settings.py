@@ -4,6 +4,7 @@ Django settings for config project.
 
 from pathlib import Path
 import os
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 # .env 파일 로드
@@ -38,6 +39,8 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     # [New] SaaS 보안: 일반 사용자 관리자 페이지 접근 차단
     'core.middleware.AdminAccessRestrictionMiddleware',
+    # [New] 요청별 성능 계측 (/metrics)
+    'core.middleware.PerformanceMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -113,6 +116,102 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Asia/Seoul'
 
+# 정기 작업 (celery -A config beat). 시장별 장 운영 여부/휴장일은 core.market_hours 가 판단
+QUOTE_REFRESH_INTERVAL = int(os.getenv('QUOTE_REFRESH_INTERVAL', '300'))  # 장중 시세 갱신 주기 (초)
+EOD_REFRESH_CHECK_INTERVAL = 30 * 60  # 장 마감 갱신 대상 확인 주기 (초)
+EOD_REFRESH_DELAY = 30 * 60           # 장 마감 후 이만큼 지나서 종가/캔들 갱신 (초)
+FUNDAMENTALS_MAX_AGE = 60 * 60 * 24 * 7  # 기업정보(PER/PBR/시가총액/개요) 갱신 주기 (초)
+MARKET_HOLIDAYS = {}                  # core.market_hours.HOLIDAYS 에 추가할 휴장일 {'KRX': ['2027-01-01', ...]}
+CELERY_BEAT_SCHEDULE = {
+    'refresh-open-market-quotes': {
+        'task': 'core.tasks.refresh_open_market_quotes',
+        'schedule': QUOTE_REFRESH_INTERVAL,
+        'options': {'expires': QUOTE_REFRESH_INTERVAL},  # 밀린 실행은 버림
+    },
+    'refresh-end-of-day': {
+        'task': 'core.tasks.refresh_end_of_day',
+        'schedule': EOD_REFRESH_CHECK_INTERVAL,
+        'options': {'expires': EOD_REFRESH_CHECK_INTERVAL},
+    },
+    'refresh-fundamentals': {
+        'task': 'core.tasks.refresh_fundamentals',
+        'schedule': 60 * 60 * 24,
+    },
+    'refresh-symbol-master': {
+        'task': 'core.tasks.refresh_symbol_master',
+        'schedule': 60 * 60 * 24,
+    },
+    'refresh-fx-rates': {
+        'task': 'core.tasks.refresh_fx_rates',
+        'schedule': 60 * 60 * 24,
+    },
+}
+
+# 원가 계산 방식: 'average' (이동평균, 기본) | 'fifo' (선입선출 로트)
+# 매도 시 lot_ids를 지정하면 방식과 무관하게 해당 로트(Specific-ID)를 차감합니다.
+COST_BASIS_METHOD = os.getenv('COST_BASIS_METHOD', 'average')
+
+# 종목 시세 일괄 갱신 (core.tasks.refresh_stocks)
+STOCK_REFRESH_WORKERS = int(os.getenv('STOCK_REFRESH_WORKERS', '8'))
+STOCK_REFRESH_HOST_LIMITS = {'yahoo': 4, 'naver': 2}  # 호스트별 동시 요청 수
+
+# 시세 신선도 (core.market_hours): 장중에는 짧게, 장 마감 후에는 길게 (초)
+QUOTE_TTL_MARKET_OPEN = int(os.getenv('QUOTE_TTL_MARKET_OPEN', '60'))
+QUOTE_TTL_MARKET_CLOSED = int(os.getenv('QUOTE_TTL_MARKET_CLOSED', str(60 * 60 * 6)))
+
+# 실시간 시세 푸시 (core.services_stream, SSE): 프로세스당 브로드캐스터 1개가 열린 스트림의 종목을 묶어 갱신
+# SSE 연결 하나가 워커 스레드 하나를 점유하므로 gunicorn 은 --threads (gthread) 로 띄울 것
+PRICE_STREAM_INTERVAL = int(os.getenv('PRICE_STREAM_INTERVAL', '5'))     # 브로드캐스터 주기 (초)
+PRICE_STREAM_HEARTBEAT = int(os.getenv('PRICE_STREAM_HEARTBEAT', '15'))  # 유휴 스트림 keep-alive (초)
+
+# 캐시 (CACHE_BACKEND=db|redis|file|locmem)
+# 버전 키(core.cache)는 웹/Celery 워커가 함께 봐야 무효화가 전파되므로 기본은 프로세스 간 공유되는 db
+# - db: 외부 서비스 없이 프로세스 간 공유 (테이블은 마이그레이션 0056 이 생성, 설정 변경 시 `createcachetable`)
+# - redis: Celery 브로커와 같은 Redis 사용 (DB 번호만 분리), 운영 권장
+# - file: 같은 호스트의 프로세스끼리만 공유
+# - locmem: 프로세스별 메모리, DEBUG 에서만 허용 (Celery 워커의 무효화가 웹 프로세스에 보이지 않음)
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'db')
+if CACHE_BACKEND == 'locmem' and not DEBUG:
+    raise ImproperlyConfigured(
+        "CACHE_BACKEND=locmem is per-process: cache invalidations from Celery workers and other "
+        "web processes are lost. Use db or redis outside DEBUG."
+    )
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'core-default',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', str(BASE_DIR / '.cache')),
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'core_cache',
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('CACHE_REDIS_URL', 'redis://127.0.0.1:6379/1'),
+    },
+}
+CACHES = {
+    'default': {
+        **CACHE_BACKENDS[CACHE_BACKEND],
+        'TIMEOUT': 60 * 60,
+        'KEY_PREFIX': 'core',
+        'OPTIONS': {'MAX_ENTRIES': 10000} if CACHE_BACKEND != 'redis' else {},
+    }
+}
+
+# 성능 계측 (core.middleware.PerformanceMetricsMiddleware)
+PERF_METRICS_ENABLED = os.getenv('PERF_METRICS_ENABLED', 'true').lower() == 'true'
+PERF_SLOW_REQUEST_MS = int(os.getenv('PERF_SLOW_REQUEST_MS', '1000'))  # 이 시간 이상이면 쿼리 목록과 함께 로그
+PERF_TRACE_MEMORY = os.getenv('PERF_TRACE_MEMORY', 'false').lower() == 'true'  # tracemalloc 기반 최대 메모리 (오버헤드 있음, 다른 요청과 겹친 요청은 기록 안 함)
+# /metrics 접근: superuser 또는 `Authorization: Bearer <PERF_METRICS_TOKEN>` (Prometheus scrape)
+PERF_METRICS_TOKEN = os.getenv('PERF_METRICS_TOKEN', '')
+# IP 허용 목록 (쉼표 구분, 기본 비활성) - 리버스 프록시 뒤에서는 REMOTE_ADDR 가 프록시 주소이므로 켜지 말 것
+PERF_METRICS_ALLOWED_IPS = [ip.strip() for ip in os.getenv('PERF_METRICS_ALLOWED_IPS', '').split(',') if ip.strip()]
+
 # 커스텀 유저 모델 및 인증 리다이렉션
 AUTH_USER_MODEL = 'core.User'
 LOGIN_URL = 'login'
@@ -3,13 +3,16 @@ from django.urls import path
 from django.conf import settings 
 from django.conf.urls.static import static 
 from django.contrib.auth import views as auth_views
-from core import views, views_backtest
+from core import views, views_backtest, metrics
 from core.views import SmsWebhookView
 
 urlpatterns = [
     # 관리자 페이지
     path('admin/', admin.site.urls),
 
+    # 성능 지표 (Prometheus)
+    path('metrics', metrics.metrics_view, name='metrics'),
+
     # 로그인 / 로그아웃
     path('login/', auth_views.LoginView.as_view(template_name='login.html'), name='login'),
     path('logout/', auth_views.LogoutView.as_view(), name='logout'),
@@ -55,6 +58,8 @@ urlpatterns = [
     # 3-1. 재무 관리
     path('finance/', views.financial_management, name='financial_management'),
     path('finance/cash-op/', views.cash_operation, name='cash_operation'),
+    path('finance/as-of/', views.financial_as_of_api, name='financial_as_of_api'),
+    path('finance/performance/', views.performance_api, name='performance_api'),
 
     # 3-2. 계좌 관리
     path('account/', views.account_management, name='account_management'),
@@ -80,6 +85,8 @@ urlpatterns = [
     path('stock/add/', views.add_interest_stock, name='add_interest_stock'),
     path('stock/delete/<int:stock_id>/', views.delete_interest_stock, name='delete_interest_stock'),
     path('stock/detail/', views.get_stock_detail, name='get_stock_detail'),
+    path('api/stock/<int:stock_id>/chart/', views.stock_chart_data, name='stock_chart_data'),
+    path('api/stream/prices/', views.price_stream, name='price_stream'),
     path('stock/search/', views.search_stock_api, name='search_stock_api'),
     path('stock/update-order/', views.update_stock_ordering, name='update_stock_ordering'),
 
@@ -88,6 +95,7 @@ urlpatterns = [
     
     # Stock APIs
     path('api/stock/update/', views.update_all_stocks_api, name='update_all_stocks_api'),
+    path('api/stock/update/<int:job_id>/', views.stock_refresh_status, name='stock_refresh_status'),
 
     # [New] Backtest
     # [New] Strategy Management (Split)
@@ -0,0 +1,70 @@
+"""
+Versioned per-organization cache keys.
+
+Every cached value derived from an organization's ledger is stored under a key that embeds the
+organization's current version for a scope. Bumping the version (one incr) makes all of those
+keys unreachable at once; the stale entries simply expire. Backend selection lives in
+settings.CACHES (CACHE_BACKEND=db|redis|file|locmem).
+
+Version counters never expire and are seeded with time.time_ns(), so a counter that is evicted
+anyway restarts above every version handed out before (old keys never become reachable again).
+"""
+import time
+
+from django.core.cache import cache
+
+# Scopes: each has its own version counter per organization
+LEDGER = 'ledger'    # Transaction / DailySnapshot derived data (portfolio, financials, performance)
+SIDEBAR = 'sidebar'  # Agent / Department derived data
+CANDLES = 'candles'  # Candle derived data (chart series) - versioned per stock id instead of organization
+
+DEFAULT_TIMEOUT = 60 * 60 * 24
+
+_MISSING = object()
+
+
+def _version_key(organization_id, scope):
+    return f"ver:{scope}:{organization_id}"
+
+
+def get_version(organization_id, scope=LEDGER):
+    key = _version_key(organization_id, scope)
+    version = cache.get(key)
+    if version is None:
+        # 첫 조회(또는 eviction): 반복되지 않는 값으로 시드, 동시 조회는 먼저 저장된 값을 따름
+        seed = time.time_ns()
+        cache.add(key, seed, None)
+        version = cache.get(key, seed)
+    return version
+
+
+def bump_version(organization_id, scope=LEDGER):
+    """
+    Invalidates every key of the organization in `scope` in O(1).
+    """
+    key = _version_key(organization_id, scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Not set yet (or evicted): a fresh seed is above any version used before
+        cache.set(key, time.time_ns(), None)
+
+
+def org_key(organization_id, name, *parts, scope=LEDGER):
+    """
+    e.g. org_key(3, 'perf', start, end) -> "ledger:3:v7:perf:2024-01-01:None"
+    """
+    suffix = ":".join(str(p) for p in parts)
+    base = f"{scope}:{organization_id}:v{get_version(organization_id, scope)}:{name}"
+    return f"{base}:{suffix}" if parts else base
+
+
+def get_or_set(key, compute, timeout=DEFAULT_TIMEOUT):
+    """
+    Like cache.get_or_set, but also caches a computed None.
+    """
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = compute()
+        cache.set(key, value, timeout)
+    return value
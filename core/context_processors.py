@@ -1,8 +1,21 @@
-from .models import Agent, UserFavorite
+from django.utils.functional import SimpleLazyObject
+from .services import SidebarService
 
 def sidebar_data(request):
-    context = {'agents': [], 'favorites': []}
-    if request.user.is_authenticated and request.user.organization:
-        context['agents'] = Agent.objects.filter(organization=request.user.organization)
-        context['favorites'] = UserFavorite.objects.filter(user=request.user).order_by('display_order')
-    return context
\ No newline at end of file
+    """
+    사이드바 AI 직원 목록 / 즐겨찾기 (캐시, 지연 로딩).
+    템플릿이 실제로 agents / favorites 를 사용할 때만 캐시(또는 DB)를 조회합니다.
+    """
+    def agents():
+        user = request.user
+        if user.is_authenticated and user.organization_id:
+            return SidebarService.get_agents(user.organization_id)
+        return []
+
+    def favorites():
+        user = request.user
+        if user.is_authenticated and user.organization_id:
+            return SidebarService.get_favorites(user.id)
+        return []
+
+    return {'agents': SimpleLazyObject(agents), 'favorites': SimpleLazyObject(favorites)}
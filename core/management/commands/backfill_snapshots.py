@@ -0,0 +1,62 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from core.models import Organization
+from core.services_ledger import LedgerService
+
+
+class Command(BaseCommand):
+    help = 'Backfills missing DailySnapshot rows by walking each organization ledger once (parallel per organization).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--org', type=int, action='append', help='Organization id (repeatable). Default: all')
+        parser.add_argument('--start', type=str, help='YYYY-MM-DD (default: first transaction date)')
+        parser.add_argument('--end', type=str, help='YYYY-MM-DD (default: yesterday)')
+        parser.add_argument('--overwrite', action='store_true', help='Recompute existing snapshots too')
+        parser.add_argument('--workers', type=int, default=4, help='Organizations processed in parallel')
+        parser.add_argument('--celery', action='store_true', help='Dispatch to Celery workers instead of running here')
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options['start']) if options['start'] else None
+            end = date.fromisoformat(options['end']) if options['end'] else None
+        except ValueError:
+            raise CommandError('Dates must be YYYY-MM-DD')
+
+        orgs = Organization.objects.all()
+        if options['org']:
+            orgs = orgs.filter(id__in=options['org'])
+        orgs = list(orgs)
+
+        if options['celery']:
+            from celery import group
+            from core.tasks import backfill_daily_snapshots
+            group(
+                backfill_daily_snapshots.s(org.id, options['start'], options['end'], options['overwrite'])
+                for org in orgs
+            ).apply_async()
+            self.stdout.write(self.style.SUCCESS(f"Dispatched backfill for {len(orgs)} organizations"))
+            return
+
+        def run(org):
+            try:
+                return LedgerService.backfill_snapshots(org, start=start, end=end, overwrite=options['overwrite'])
+            finally:
+                # 스레드별 DB 커넥션 정리
+                connection.close()
+
+        total = 0
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as executor:
+            futures = {executor.submit(run, org): org for org in orgs}
+            for future in as_completed(futures):
+                org = futures[future]
+                try:
+                    written = future.result()
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f"{org.name}: failed ({e})"))
+                    continue
+                total += written
+                self.stdout.write(f"{org.name}: {written} snapshots")
+
+        self.stdout.write(self.style.SUCCESS(f"Completed. {total} snapshots written for {len(orgs)} organizations"))
@@ -0,0 +1,176 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import URLPattern, get_resolver
+from core.models import (
+    Organization, User, Agent, Approval, Post, UserFavorite, InterestStock, Strategy, Stock,
+    PortfolioDisclosure, Position,
+)
+
+# Routes that call external services (yfinance / Naver / OpenAI) on GET or are not tenant pages
+SKIP_URL_NAMES = {
+    'logout', 'metrics', 'sms_webhook',
+    'get_stock_detail', 'search_stock_api', 'update_all_stocks_api',
+    'run_backtest_api', 'export_backtest_csv',
+    'price_stream',  # text/event-stream, never finishes
+}
+
+
+
+def disclose_one_position(user, org):
+    """
+    portfolio_ranking redirects CEOs without a public stock; disclose one so both tenants render the page.
+    """
+    stock_id = (
+        Position.objects.filter(organization=org, quantity__gt=0).order_by('id').values_list('stock_id', flat=True).first()
+        or Stock.objects.order_by('id').values_list('id', flat=True).first()
+    )
+    if stock_id:
+        PortfolioDisclosure.objects.update_or_create(user=user, stock_id=stock_id, defaults={'is_public': True})
+
+
+# Per-route state set up (and rolled back) before measuring, so status codes do not depend on tenant settings
+ROUTE_SETUP = {
+    'portfolio_ranking': disclose_one_position,
+}
+
+
+def url_object(name, user, org):
+    """
+    Id for the single path parameter of `name` within the tenant, or None when it has no such row.
+    """
+    agents = Agent.objects.filter(organization=org)
+    approvals = Approval.objects.filter(organization=org)
+    posts = Post.objects.filter(organization=org)
+    strategies = Strategy.objects.filter(user=user)
+    lookups = {
+        'agent_edit': agents,
+        'agent_delete': agents,
+        'messenger': agents,
+        'delete_favorite': UserFavorite.objects.filter(user=user),
+        'master_user_toggle_status': User.objects.filter(organization=org),
+        'post_detail': posts,
+        'post_edit': posts.filter(author=user),
+        'post_delete': posts.filter(author=user),
+        'approval_detail': approvals,
+        'delete_approval': approvals,
+        'delete_chat_room': approvals,
+        'strategy_builder_edit': strategies,
+        'load_strategy_api': strategies,
+        'delete_strategy_api': strategies,
+        'follow_toggle': User.objects.filter(organization=org).exclude(id=user.id),
+        'stock_chart_data': Stock.objects.filter(candles__isnull=False).distinct(),
+    }
+    if name == 'delete_interest_stock':
+        return InterestStock.objects.filter(user=user).values_list('stock_id', flat=True).first()
+    queryset = lookups.get(name)
+    return queryset.order_by('id').values_list('id', flat=True).first() if queryset is not None else None
+
+
+def tenant_urls(user, org):
+    """
+    {label: (url, route name)} for every named route in config/urls.py, path parameters filled from the tenant.
+    """
+    urls = {}
+    for pattern in get_resolver().url_patterns:
+        # admin/ (include) and DEBUG static/media routes are not app pages
+        if not isinstance(pattern, URLPattern) or not pattern.name or pattern.name in SKIP_URL_NAMES:
+            continue
+        route = '/' + str(pattern.pattern)
+        params = list(pattern.pattern.regex.groupindex)
+        if not params:
+            urls[route] = (route, pattern.name)
+            continue
+        object_id = url_object(pattern.name, user, org)
+        if object_id is None:
+            urls[route] = (None, pattern.name)
+            continue
+        path = route
+        for param in params:
+            path = path.replace(f"<int:{param}>", str(object_id))
+        urls[route] = (path, pattern.name)
+    return urls
+
+
+class Command(BaseCommand):
+    help = ('Renders every route in config/urls.py (GET) for a small and a large tenant and fails when '
+            'the query count grows with row count (N+1), a route errors (5xx) or the two tenants get '
+            'different status codes. Seed both with generate_large_dataset.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--small-org', type=int, help='Organization id of the small tenant (default: fewest transactions)')
+        parser.add_argument('--large-org', type=int, help='Organization id of the large tenant (default: most transactions)')
+        parser.add_argument('--tolerance', type=int, default=2,
+                            help='Extra queries allowed on the large tenant (data-dependent branches)')
+        parser.add_argument('--verbose-queries', action='store_true', help='Print the queries of failing routes')
+
+    def handle(self, *args, **options):
+        orgs = list(
+            Organization.objects.filter(user__role='ceo')
+            .annotate(n=Count('transactions', distinct=True)).filter(n__gt=0).order_by('n')
+        )
+        small = Organization.objects.filter(id=options['small_org']).first() if options['small_org'] else (orgs[0] if orgs else None)
+        large = Organization.objects.filter(id=options['large_org']).first() if options['large_org'] else (orgs[-1] if orgs else None)
+        if not small or not large or small == large:
+            raise CommandError('Need two tenants of different size, e.g. '
+                               'generate_large_dataset --prefix qcs --transactions 400 ... and the default-sized one')
+
+        setup_test_environment()
+        try:
+            small_counts = self.measure(small)
+            large_counts = self.measure(large)
+        finally:
+            teardown_test_environment()
+
+        self.stdout.write(f"{'route':45} {'small':>7} {'large':>7}")
+        failures = []
+        for route, (small_count, small_status, _) in small_counts.items():
+            large_count, large_status, queries = large_counts.get(route, (None, None, []))
+            if small_count is None or large_count is None:
+                self.stdout.write(f"{route:45} {'-':>7} {'-':>7}  (no object in tenant)")
+                continue
+            line = f"{route:45} {small_count:>7} {large_count:>7}"
+            if small_status >= 500 or large_status >= 500 or small_status != large_status:
+                # 서버 오류나 테넌트마다 다른 응답은 비교 불가 -> 통과로 보지 않음
+                failures.append(route)
+                self.stdout.write(self.style.ERROR(f"{line}  status {small_status} vs {large_status}"))
+            elif large_count > small_count + options['tolerance']:
+                failures.append(route)
+                self.stdout.write(self.style.ERROR(f"{line}  GROWS WITH DATA"))
+                if options['verbose_queries']:
+                    for sql in queries:
+                        self.stdout.write(f"    {sql[:200]}")
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{line}  ok ({large_status})"))
+
+        if failures:
+            raise CommandError(f"{len(failures)} routes fail (5xx / status mismatch) or issue more queries "
+                               f"on the large tenant: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS(f"Query counts are independent of data size ({small.name} / {large.name})"))
+
+    def measure(self, org):
+        """
+        {route: (query count, status, [sql])} as the tenant's CEO. Each route is requested twice
+        (the first warms caches) inside a transaction that is rolled back, so GET handlers that
+        write and ROUTE_SETUP leave no trace.
+        """
+        user = User.objects.filter(organization=org, role='ceo').order_by('id').first()
+        client = Client(raise_request_exception=False)
+        client.force_login(user)
+
+        results = {}
+        for route, (url, name) in tenant_urls(user, org).items():
+            if url is None:
+                results[route] = (None, None, [])
+                continue
+            with transaction.atomic():
+                if name in ROUTE_SETUP:
+                    ROUTE_SETUP[name](user, org)
+                client.get(url)
+                with CaptureQueriesContext(connection) as ctx:
+                    response = client.get(url)
+                transaction.set_rollback(True)
+            results[route] = (len(ctx.captured_queries), response.status_code, [q['sql'] for q in ctx.captured_queries])
+        return results
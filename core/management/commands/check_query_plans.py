@@ -0,0 +1,106 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from core.models import Organization, Transaction, Approval
+
+
+def hot_queries(org, stock_id, account_id):
+    """
+    (name, table, acceptable composite indexes, queryset) for the ledger/approval access paths
+    used by the views and services, built the same way (filters and ordering) as the real ones.
+    Where a query has a dedicated index, that index is the only accepted one; a more general
+    index that merely avoids a full scan is still a regression.
+    """
+    now = timezone.now()
+    tx = Transaction.objects.filter(organization=org)
+    approvals = Approval.objects.filter(organization=org)
+    return [
+        ('ledger page (keyset)', 'core_transaction', ['tx_org_ts_idx'],
+         tx.order_by('-timestamp', '-id')[:16]),
+        ('ledger opening balance', 'core_transaction', ['tx_org_ts_idx'],
+         tx.filter(Q(timestamp__lt=now) | Q(timestamp=now, id__lt=0)).values('amount')),
+        ('ledger day range', 'core_transaction', ['tx_org_ts_idx'],
+         tx.filter(timestamp__gte=now - timedelta(days=1), timestamp__lt=now).order_by('-timestamp', '-id')),
+        ('stock replay (Position/TaxLot)', 'core_transaction', ['tx_org_asset_ts_idx'],
+         tx.filter(related_asset_id=stock_id, transaction_type__in=['BUY', 'SELL']).order_by('timestamp', 'id')),
+        ('portfolio aggregation', 'core_transaction', ['tx_org_ts_idx', 'tx_org_asset_ts_idx'],
+         tx.filter(related_asset__isnull=False).order_by('timestamp')),
+        ('account portfolio', 'core_transaction', ['tx_org_account_asset_idx'],
+         tx.filter(account_id=account_id, related_asset__isnull=False).order_by('related_asset', 'timestamp')),
+        ('cash flows (TWR/MWR)', 'core_transaction', ['tx_org_type_ts_idx'],
+         tx.filter(transaction_type__in=['DEPOSIT', 'WITHDRAW'], timestamp__gte=now - timedelta(days=365), timestamp__lt=now)
+         .annotate(day=TruncDate('timestamp', tzinfo=timezone.get_current_timezone()))
+         .values('day').annotate(total=Sum('amount')).order_by('day')),
+        ('sell total', 'core_transaction', ['tx_org_type_ts_idx'],
+         tx.filter(transaction_type='SELL').values('amount')),
+        ('approval list', 'core_approval', ['approval_org_updated_idx'],
+         approvals.order_by('-updated_at')),
+        ('approval list by status', 'core_approval', ['approval_org_status_upd_idx'],
+         approvals.filter(status='pending').order_by('-updated_at')),
+        ('pending trade drafts', 'core_approval', ['approval_org_type_status_idx', 'approval_org_status_upd_idx'],
+         approvals.filter(report_type__in=['buy', 'sell'], status='pending').order_by('-created_at')),
+    ]
+
+
+def full_scans(plan, table):
+    """
+    Plan lines that read every row of `table` (SQLite EXPLAIN QUERY PLAN / PostgreSQL EXPLAIN).
+    """
+    bad = []
+    for line in plan.splitlines():
+        text = line.strip()
+        if connection.vendor == 'sqlite':
+            # "SCAN core_transaction" (table) or "SCAN core_transaction USING INDEX ..." (whole index);
+            # an indexed lookup shows up as "SEARCH core_transaction USING INDEX ..."
+            if f"SCAN {table}" in text or f"SCAN TABLE {table}" in text:
+                bad.append(text)
+        elif f"Seq Scan on {table}" in text:
+            bad.append(text)
+    return bad
+
+
+class Command(BaseCommand):
+    help = ('Runs EXPLAIN on the hot ledger/approval queries and fails if any falls back to a full scan '
+            'or stops using its composite index.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--org', type=int, help='Organization id (default: the one with the most transactions)')
+        parser.add_argument('--analyze', action='store_true', help='Refresh planner statistics first (ANALYZE)')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan')
+
+    def handle(self, *args, **options):
+        if options['org']:
+            org = Organization.objects.filter(id=options['org']).first()
+        else:
+            org = Organization.objects.annotate(n=Count('transactions')).order_by('-n').first()
+        if not org:
+            raise CommandError('No organization to check (seed data with generate_large_dataset first)')
+
+        if options['analyze']:
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        sample = Transaction.objects.filter(organization=org, related_asset__isnull=False).values('related_asset_id', 'account_id').first() or {}
+        failures = []
+        for name, table, indexes, queryset in hot_queries(org, sample.get('related_asset_id') or 0, sample.get('account_id') or 0):
+            plan = queryset.explain()
+            if options['verbose_plans']:
+                self.stdout.write(f"-- {name}\n{plan}")
+
+            bad = full_scans(plan, table)
+            if bad:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"FULL SCAN  {name}: {' / '.join(bad)}"))
+            elif not any(index in plan for index in indexes):
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"NO INDEX   {name}: expected one of {', '.join(indexes)}"))
+            else:
+                used = next(index for index in indexes if index in plan)
+                self.stdout.write(self.style.SUCCESS(f"OK         {name} ({used})"))
+
+        if failures:
+            raise CommandError(f"{len(failures)} hot queries regressed: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS(f"All hot queries use indexes ({org.name})"))
@@ -0,0 +1,373 @@
+import random
+from collections import deque
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from core.models import (
+    Organization, Department, User, UserProfile, Agent, Account, Stock, Candle, FxRate, Transaction,
+    Position, TaxLot, LotConsumption, Approval, Message, Post, Follow, InterestStock, PortfolioDisclosure,
+)
+from core.services import PositionService, AccountPositionService
+from core.services_candles import CandleService
+from core.services_ledger import LedgerService
+
+# (country, share of stocks, price range in the listing currency, currency)
+MARKETS = [
+    ('한국', 0.70, (1000, 500000), 'KRW'),
+    ('미국', 0.25, (5, 800), 'USD'),
+    ('일본', 0.05, (300, 30000), 'JPY'),
+]
+FX_BASE = {'USD': 1300.0, 'JPY': 9.0}
+DEPARTMENTS = {
+    '국내투자본부': ['코스피운용실', 'IPO투자실'],
+    '해외투자본부': ['S&P운용실', '나스닥운용실', '배당금융실'],
+    '영업지원본부': ['기획실', '재무실'],
+}
+INSTITUTIONS = ['미래에셋', '키움', '삼성증권', 'NH투자', '한국투자']
+
+
+class Command(BaseCommand):
+    help = ('Generates large synthetic organizations (stocks, years of transactions and snapshots, approvals, '
+            'messages, posts, follows) with bulk_create and a fixed seed, for benchmarks and load tests.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orgs', type=int, default=1, help='Organizations to create')
+        parser.add_argument('--stocks', type=int, default=2000, help='Synthetic stocks (shared by all organizations)')
+        parser.add_argument('--universe', type=int, default=300, help='Stocks traded per organization')
+        parser.add_argument('--transactions', type=int, default=200000, help='Transactions per organization')
+        parser.add_argument('--years', type=int, default=3, help='History length')
+        parser.add_argument('--users', type=int, default=30, help='Users per organization')
+        parser.add_argument('--accounts', type=int, default=5, help='Accounts per organization')
+        parser.add_argument('--approvals', type=int, default=5000, help='Approvals per organization')
+        parser.add_argument('--messages', type=int, default=20000, help='Messages per organization')
+        parser.add_argument('--posts', type=int, default=2000, help='Posts per organization')
+        parser.add_argument('--follows', type=int, default=500, help='Follows per organization')
+        parser.add_argument('--no-snapshots', action='store_true', help='Skip the DailySnapshot backfill')
+        parser.add_argument('--prefix', type=str, default='syn', help='Name prefix (codes, usernames)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch = options['batch_size']
+        self.prefix = options['prefix']
+        self.end = timezone.now().replace(microsecond=0)
+        self.start = self.end - timedelta(days=365 * options['years'])
+
+        stocks = self.create_stocks(options['stocks'])
+        self.create_fx_rates()
+        self.stdout.write(f"Stocks: {len(stocks)}")
+
+        for org_index in range(options['orgs']):
+            org = self.create_organization(org_index, stocks, options)
+            self.stdout.write(self.style.SUCCESS(f"Organization created: {org.name} (id={org.id})"))
+
+        self.stdout.write(self.style.SUCCESS("Completed."))
+
+    # ---- shared market data -------------------------------------------------
+
+    def week_index(self, ts):
+        return min(int((ts - self.start).days // 7), self.weeks - 1)
+
+    def create_stocks(self, count):
+        self.weeks = max(int((self.end - self.start).days // 7) + 1, 1)
+        existing = {s.code: s for s in Stock.objects.filter(code__startswith=self.prefix.upper())}
+        new_stocks, new_bars = [], {}
+        for i in range(count):
+            code = f"{self.prefix.upper()}{i:05d}"
+            if code in existing:
+                continue
+            country, _, (low, high), _ = self.pick_market()
+            price = self.rng.uniform(low, high)
+            bars = []
+            for w in range(self.weeks):
+                open_ = price
+                price = max(price * (1 + self.rng.gauss(0.001, 0.04)), low * 0.2)
+                bars.append((
+                    self.start + timedelta(weeks=w),
+                    round(open_, 2), round(max(open_, price) * 1.01, 2), round(min(open_, price) * 0.99, 2), round(price, 2),
+                ))
+            new_bars[code] = bars
+            new_stocks.append(Stock(
+                code=code,
+                name=f"합성종목 {i:05d}",
+                country=country,
+                current_price=Decimal(str(round(price, 2))),
+                market_cap=self.rng.randint(10**9, 10**13),
+            ))
+        Stock.objects.bulk_create(new_stocks, batch_size=500)
+        stocks = list(Stock.objects.filter(code__startswith=self.prefix.upper()).order_by('code')[:count])
+        Candle.objects.bulk_create([
+            Candle(stock=s, interval='1wk', timestamp=ts, open=o, high=h, low=l, close=c)
+            for s in stocks for ts, o, h, l, c in new_bars.get(s.code, [])
+        ], batch_size=1000)
+        self.closes = {sid: closes for sid, (_, closes) in CandleService.closes([s.id for s in stocks]).items()}
+        self.currencies = {s.id: next((m[3] for m in MARKETS if m[0] == s.country), 'KRW') for s in stocks}
+        return stocks
+
+    def pick_market(self):
+        r = self.rng.random()
+        for market in MARKETS:
+            if r < market[1]:
+                return market
+            r -= market[1]
+        return MARKETS[0]
+
+    def create_fx_rates(self):
+        self.fx = {}
+        rows = []
+        for currency, base in FX_BASE.items():
+            rate = base
+            series = []
+            day = self.start.date()
+            while day <= self.end.date():
+                rate *= 1 + self.rng.gauss(0, 0.004)
+                series.append(rate)
+                rows.append(FxRate(currency=currency, date=day, rate=Decimal(str(round(rate, 6)))))
+                day += timedelta(days=1)
+            self.fx[currency] = series
+        FxRate.objects.bulk_create(rows, batch_size=self.batch, ignore_conflicts=True)
+
+    def krw_price(self, stock_id, ts):
+        close = self.closes[stock_id][self.week_index(ts)]
+        currency = self.currencies[stock_id]
+        if currency == 'KRW':
+            return Decimal(int(close))
+        series = self.fx[currency]
+        return Decimal(int(close * series[min((ts.date() - self.start.date()).days, len(series) - 1)]))
+
+    # ---- organization -------------------------------------------------------
+
+    def create_organization(self, org_index, stocks, options):
+        rng = self.rng
+        tag = f"{self.prefix}{org_index}"
+        org = Organization.objects.create(name=f"{tag} 대형 테스트 회사", description="generate_large_dataset")
+
+        # Departments (hierarchy as in seed_depts.py)
+        departments = []
+        for hq_name, children in DEPARTMENTS.items():
+            hq = Department.objects.create(organization=org, name=hq_name)
+            departments += Department.objects.bulk_create([Department(organization=org, name=n, parent=hq) for n in children])
+
+        # Users (bulk_create skips the signals that would create one organization per user)
+        password = make_password(None)
+        User.objects.bulk_create([
+            User(
+                username=f"{tag}_user{i}", password=password, organization=org,
+                role='ceo' if i == 0 else 'staff', nickname=f"{tag} 직원{i}",
+            ) for i in range(options['users'])
+        ], batch_size=self.batch)
+        users = list(User.objects.filter(organization=org).order_by('id'))
+        UserProfile.objects.bulk_create([UserProfile(user=u, secret_key=f"{tag}-{u.id}-{rng.getrandbits(64):x}") for u in users])
+
+        agents = Agent.objects.bulk_create([
+            Agent(organization=org, name=f"AI 매니저 {i}", department_obj=rng.choice(departments), role='포트폴리오 운용')
+            for i in range(max(len(departments), 3))
+        ])
+        accounts = Account.objects.bulk_create([
+            Account(
+                organization=org, financial_institution=rng.choice(INSTITUTIONS),
+                account_number=f"{rng.randint(10**11, 10**12 - 1)}", account_holder=users[0].nickname,
+                nickname=f"계좌 {i + 1}", is_default=(i == 0),
+            ) for i in range(max(options['accounts'], 1))
+        ])
+        universe = rng.sample(stocks, min(options['universe'], len(stocks)))
+
+        self.stdout.write(f"[{org.name}] transactions...")
+        self.create_transactions(org, universe, accounts, options['transactions'])
+
+        if not options['no_snapshots']:
+            self.stdout.write(f"[{org.name}] snapshots...")
+            LedgerService.backfill_snapshots(org, start=self.start.date(), overwrite=True)
+
+        self.stdout.write(f"[{org.name}] approvals, messages, posts, follows...")
+        self.create_approvals(org, users, agents, universe, accounts, options['approvals'])
+        self.create_social(org, users, agents, universe, options)
+        return org
+
+    def create_transactions(self, org, universe, accounts, count):
+        """
+        Simulates the ledger in time order so balances, profits and lots are consistent,
+        then bulk inserts it. Signals do not run for bulk_create, so derived state
+        (TaxLot, Position, AccountPosition, cash_balance) is written here too.
+        """
+        rng = self.rng
+        step = (self.end - self.start) / max(count, 1)
+        cash = Decimal(0)
+        holdings = {}       # stock_id -> {'quantity', 'cost'} (moving average)
+        account_qty = {}    # (account_id, stock_id) -> quantity
+        open_lots = {}      # stock_id -> deque of [lot_index, remaining, unit_cost]
+        txs, lots, consumptions = [], [], []   # consumptions: (tx_index, lot_index, qty, cost, proceeds)
+
+        ts = self.start
+        for _ in range(count):
+            ts += step * rng.uniform(0.5, 1.5)
+            ts = min(ts, self.end)
+            roll = rng.random()
+            held = [sid for sid, h in holdings.items() if h['quantity'] > 0]
+
+            if cash < 1_000_000 or roll < 0.06:
+                amount = Decimal(rng.choice([1, 2, 5, 10, 20, 50])) * 1_000_000
+                txs.append(Transaction(organization=org, transaction_type='DEPOSIT', amount=amount,
+                                       description="입금", timestamp=ts))
+                cash += amount
+            elif roll < 0.09 and cash > 5_000_000:
+                amount = min(Decimal(rng.choice([1, 2, 5])) * 1_000_000, cash)
+                txs.append(Transaction(organization=org, transaction_type='WITHDRAW', amount=-amount,
+                                       description="출금", timestamp=ts))
+                cash -= amount
+            elif roll < 0.11:
+                amount = Decimal(rng.randint(10, 500) * 1000)
+                txs.append(Transaction(organization=org, transaction_type='EXPENSE', amount=-amount,
+                                       description="운영 비용", timestamp=ts))
+                cash -= amount
+            elif roll < 0.60 or not held:
+                stock = rng.choice(universe)
+                price = self.krw_price(stock.id, ts)
+                quantity = max(int(min(cash * Decimal('0.05'), Decimal(rng.randint(500_000, 20_000_000))) / price), 1) if price > 0 else 0
+                if quantity <= 0 or price * quantity > cash:
+                    continue
+                fee = (price * quantity * Decimal('0.00015')).quantize(Decimal(1))
+                amount = -(price * quantity + fee)
+                account = rng.choice(accounts)
+                txs.append(Transaction(organization=org, account=account, transaction_type='BUY', amount=amount,
+                                       related_asset=stock, quantity=quantity, price=price, fee=fee,
+                                       description=f"매수 {stock.name}", timestamp=ts))
+                cash += amount
+                h = holdings.setdefault(stock.id, {'quantity': 0, 'cost': Decimal(0)})
+                h['quantity'] += quantity
+                h['cost'] += price * quantity
+                account_qty[(account.id, stock.id)] = account_qty.get((account.id, stock.id), 0) + quantity
+                lots.append((len(txs) - 1, stock.id, account.id, quantity, price, ts))
+                open_lots.setdefault(stock.id, deque()).append([len(lots) - 1, quantity, price])
+            else:
+                sid = rng.choice(held)
+                h = holdings[sid]
+                candidates = [(aid, q) for (aid, s), q in account_qty.items() if s == sid and q > 0]
+                account_id, account_held = rng.choice(candidates)
+                quantity = rng.randint(1, account_held)
+                price = self.krw_price(sid, ts)
+                revenue = price * quantity
+                fee = (revenue * Decimal('0.00015')).quantize(Decimal(1))
+                tax = (revenue * Decimal('0.0018')).quantize(Decimal(1)) if self.currencies[sid] == 'KRW' else Decimal(0)
+                avg = h['cost'] / h['quantity']
+                profit = ((price - avg) * quantity).quantize(Decimal(1))
+                amount = revenue - fee - tax
+                txs.append(Transaction(organization=org, account_id=account_id, transaction_type='SELL', amount=amount,
+                                       related_asset_id=sid, quantity=-quantity, price=price, fee=fee, tax=tax,
+                                       profit=profit, description="매도", timestamp=ts))
+                cash += amount
+                h['cost'] -= avg * quantity
+                h['quantity'] -= quantity
+                account_qty[(account_id, sid)] -= quantity
+
+                # FIFO lot consumption (same as LotService.consume)
+                remaining = quantity
+                queue = open_lots[sid]
+                while remaining > 0 and queue:
+                    lot = queue[0]
+                    used = min(lot[1], remaining)
+                    consumptions.append((len(txs) - 1, lot[0], used, lot[2] * used, price * used))
+                    lot[1] -= used
+                    remaining -= used
+                    if lot[1] == 0:
+                        queue.popleft()
+
+            txs[-1].balance_after = cash
+
+        with transaction.atomic():
+            Transaction.objects.bulk_create(txs, batch_size=self.batch)
+
+            lot_remaining = [0] * len(lots)
+            for queue in open_lots.values():
+                for lot_index, remaining, _ in queue:
+                    lot_remaining[lot_index] = remaining
+            tax_lots = TaxLot.objects.bulk_create([
+                TaxLot(
+                    organization=org, stock_id=stock_id, account_id=account_id, buy_transaction=txs[tx_index],
+                    opened_at=ts, quantity=quantity, remaining_quantity=lot_remaining[i],
+                    unit_cost=unit_cost, is_open=lot_remaining[i] > 0,
+                ) for i, (tx_index, stock_id, account_id, quantity, unit_cost, ts) in enumerate(lots)
+            ], batch_size=self.batch)
+            LotConsumption.objects.bulk_create([
+                LotConsumption(
+                    sell_transaction=txs[tx_index], lot=tax_lots[lot_index], quantity=qty,
+                    cost=cost, proceeds=proceeds, realized_pl=proceeds - cost,
+                ) for tx_index, lot_index, qty, cost, proceeds in consumptions
+            ], batch_size=self.batch)
+
+            Organization.objects.filter(id=org.id).update(cash_balance=cash)
+            for stock in universe:
+                PositionService.rebuild(org.id, stock.id)
+                AccountPositionService.rebuild(org.id, stock.id)
+
+    def create_approvals(self, org, users, agents, universe, accounts, count):
+        rng = self.rng
+        approvals = []
+        for i in range(count):
+            report_type = rng.choice(['buy', 'buy', 'sell', 'perf', 'market', 'gen'])
+            stock = rng.choice(universe)
+            quantity = rng.randint(1, 500)
+            approvals.append(Approval(
+                organization=org,
+                drafter=rng.choice(users) if rng.random() < 0.3 else None,
+                agent=rng.choice(agents),
+                report_type=report_type,
+                status=rng.choice(['draft', 'pending', 'approved', 'approved', 'rejected']),
+                title=f"[{report_type}] {stock.name} 보고 #{i}",
+                content=f"{stock.name} 관련 보고서 본문입니다. " * 5,
+                temp_stock_name=stock.name,
+                temp_stock_code=stock.code,
+                temp_quantity=quantity if report_type in ('buy', 'sell') else None,
+                temp_total_amount=self.krw_price(stock.id, self.end) * quantity if report_type in ('buy', 'sell') else None,
+                temp_account=rng.choice(accounts) if report_type == 'buy' else None,
+            ))
+        Approval.objects.bulk_create(approvals, batch_size=self.batch)
+
+        # created_at/updated_at are auto fields; spread them over the history afterwards
+        span = (self.end - self.start).total_seconds()
+        for approval in approvals:
+            approval.created_at = self.start + timedelta(seconds=rng.uniform(0, span))
+            approval.updated_at = approval.created_at + timedelta(hours=rng.uniform(0, 72))
+        Approval.objects.bulk_update(approvals, ['created_at', 'updated_at'], batch_size=self.batch)
+
+    def create_social(self, org, users, agents, universe, options):
+        rng = self.rng
+        Message.objects.bulk_create([
+            Message(
+                agent=rng.choice(agents), user=users[0],
+                role='user' if i % 2 == 0 else 'assistant',
+                content=f"{rng.choice(universe).name} 시황 문의 #{i}" if i % 2 == 0 else f"분석 결과를 보고드립니다. #{i}",
+            ) for i in range(options['messages'])
+        ], batch_size=self.batch)
+
+        Post.objects.bulk_create([
+            Post(
+                author=rng.choice(users), organization=org,
+                category=rng.choice(['market', 'strategy', 'asset']),
+                title=f"{rng.choice(universe).name} 분석 #{i}",
+                content="합성 게시글 본문입니다. " * 10,
+                views=rng.randint(0, 5000),
+            ) for i in range(options['posts'])
+        ], batch_size=self.batch)
+
+        # Follows across every synthetic user (unique pairs)
+        everyone = list(User.objects.filter(username__startswith=f"{self.prefix}").values_list('id', flat=True))
+        pairs = set()
+        while len(everyone) > 1 and len(pairs) < min(options['follows'], len(everyone) * (len(everyone) - 1)):
+            a, b = rng.sample(everyone, 2)
+            pairs.add((a, b))
+        Follow.objects.bulk_create([Follow(follower_id=a, following_id=b) for a, b in pairs],
+                                   batch_size=self.batch, ignore_conflicts=True)
+
+        held = list(Position.objects.filter(organization=org, quantity__gt=0).values_list('stock_id', flat=True))
+        InterestStock.objects.bulk_create([
+            InterestStock(user=u, stock_id=sid) for u in users[:5] for sid in held[:20]
+        ], batch_size=self.batch)
+        PortfolioDisclosure.objects.bulk_create([
+            PortfolioDisclosure(user=users[0], stock_id=sid, is_public=rng.random() < 0.7) for sid in held
+        ], batch_size=self.batch)
+
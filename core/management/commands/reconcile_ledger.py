@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from core.models import Organization
+from core.services_reconciliation import ReconciliationService
+
+
+class Command(BaseCommand):
+    help = 'Verifies cash_balance / balance_after against the ledger from the last good checkpoint, optionally repairing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--org', type=int, action='append', help='Organization id (repeatable). Default: all')
+        parser.add_argument('--repair', action='store_true', help='Rewrite divergent balance_after and cash_balance')
+        parser.add_argument('--full', action='store_true', help='Ignore checkpoints and verify every transaction')
+
+    def handle(self, *args, **options):
+        orgs = Organization.objects.all()
+        if options['org']:
+            orgs = orgs.filter(id__in=options['org'])
+
+        problems = 0
+        for org in orgs:
+            report = ReconciliationService.verify(org, repair=options['repair'], full=options['full'])
+            start = f"checkpoint #{report['from_checkpoint'].tx_count}" if report['from_checkpoint'] else "start"
+            line = f"{org.name}: checked {report['checked']} rows from {start}, ledger {report['ledger_total']:,.0f}"
+
+            divergence = report['first_divergence']
+            if divergence is None and report['cash_ok']:
+                self.stdout.write(self.style.SUCCESS(f"{line} - OK"))
+                continue
+
+            problems += 1
+            if divergence:
+                line += (f" | first divergent tx #{divergence['transaction_id']} ({divergence['timestamp']:%Y-%m-%d %H:%M}):"
+                         f" balance_after {divergence['stored']:,.0f} != {divergence['expected']:,.0f}"
+                         f" ({report['mismatch_count']} rows)")
+            if not report['cash_ok']:
+                line += f" | cash_balance {report['cash_balance']:,.0f} != ledger"
+            if report['repaired']:
+                self.stdout.write(self.style.WARNING(f"{line} - repaired"))
+            else:
+                self.stdout.write(self.style.ERROR(f"{line} - run with --repair to fix"))
+
+        self.stdout.write(self.style.SUCCESS(f"Completed. {problems} organizations with discrepancies"))
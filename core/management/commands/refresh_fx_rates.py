@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.services_fx import FxService
+
+
+class Command(BaseCommand):
+    help = 'Load the latest KRW exchange rates into FxRate (runs daily via Celery beat; requests never fetch rates)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', default='5d', help='yfinance period to load (default: 5d)')
+
+    def handle(self, *args, **options):
+        count = FxService.refresh_rates(period=options['period'])
+        if not count:
+            raise CommandError('No FX rates could be fetched (Yahoo Finance unreachable?)')
+        self.stdout.write(self.style.SUCCESS(f"FX rates updated: {count} rows"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.services_symbols import SymbolMasterService
+
+
+class Command(BaseCommand):
+    help = 'Load the KRX and US (NASDAQ/NYSE) listings into SymbolMaster for local stock search (runs daily via Celery beat)'
+
+    def handle(self, *args, **options):
+        listings, exchanges = SymbolMasterService.fetch_listings()
+        if not listings:
+            raise CommandError('No listings could be fetched (KIND / NASDAQ Trader unreachable?)')
+        count = SymbolMasterService.save_listings(listings, exchanges)
+        self.stdout.write(self.style.SUCCESS(f"Symbol master updated: {count} listings ({', '.join(sorted(exchanges))})"))
@@ -0,0 +1,189 @@
+"""
+Regular trading sessions and holiday calendars per market, used to decide how long a stored
+quote stays fresh and when the scheduled refresh tasks (core.tasks) have anything to do.
+
+Holidays come from exchange_calendars when it is installed (any year it covers); otherwise from
+the HOLIDAYS table below plus settings.MARKET_HOLIDAYS. A market/year with no holiday entries
+from either source raises MarketCalendarUnavailable instead of counting every weekday as a
+session: the scheduled refreshes skip that market and quotes fall back to the short TTL.
+"""
+import logging
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.utils import timezone
+
+from .services_fx import currency_for
+
+logger = logging.getLogger(__name__)
+
+# market: (timezone, open, close) - regular session, local time
+MARKETS = {
+    'KRX': ('Asia/Seoul', time(9, 0), time(15, 30)),
+    'US': ('America/New_York', time(9, 30), time(16, 0)),
+    'JPX': ('Asia/Tokyo', time(9, 0), time(15, 30)),
+    'HKEX': ('Asia/Hong_Kong', time(9, 30), time(16, 0)),
+    'SSE': ('Asia/Shanghai', time(9, 30), time(15, 0)),
+    'TWSE': ('Asia/Taipei', time(9, 0), time(13, 30)),
+}
+# Full-day closures on weekdays (settings.MARKET_HOLIDAYS {market: ['YYYY-MM-DD', ...]} adds to these)
+HOLIDAYS = {
+    'KRX': [
+        '2025-01-01', '2025-01-27', '2025-01-28', '2025-01-29', '2025-01-30', '2025-03-03',
+        '2025-05-01', '2025-05-05', '2025-05-06', '2025-06-03', '2025-06-06', '2025-08-15',
+        '2025-10-03', '2025-10-06', '2025-10-07', '2025-10-08', '2025-10-09', '2025-12-25', '2025-12-31',
+        '2026-01-01', '2026-02-16', '2026-02-17', '2026-02-18', '2026-03-02', '2026-05-01',
+        '2026-05-05', '2026-05-25', '2026-06-03', '2026-08-17', '2026-09-24', '2026-09-25',
+        '2026-10-05', '2026-10-09', '2026-12-25', '2026-12-31',
+    ],
+    'US': [
+        '2025-01-01', '2025-01-09', '2025-01-20', '2025-02-17', '2025-04-18', '2025-05-26',
+        '2025-06-19', '2025-07-04', '2025-09-01', '2025-11-27', '2025-12-25',
+        '2026-01-01', '2026-01-19', '2026-02-16', '2026-04-03', '2026-05-25', '2026-06-19',
+        '2026-07-03', '2026-09-07', '2026-11-26', '2026-12-25',
+    ],
+}
+CURRENCY_MARKET = {'KRW': 'KRX', 'USD': 'US', 'JPY': 'JPX', 'HKD': 'HKEX', 'CNY': 'SSE', 'TWD': 'TWSE'}
+# exchange_calendars calendar per market
+EXCHANGE_CALENDARS = {'KRX': 'XKRX', 'US': 'XNYS', 'JPX': 'XTKS', 'HKEX': 'XHKG', 'SSE': 'XSHG', 'TWSE': 'XTAI'}
+
+QUOTE_TTL_MARKET_OPEN = 60            # seconds
+QUOTE_TTL_MARKET_CLOSED = 60 * 60 * 6
+
+
+_holidays = {}   # (market, year) -> {date}
+
+
+class MarketCalendarUnavailable(Exception):
+    """
+    No holiday calendar covers the market/year (exchange_calendars missing or too old, and no
+    HOLIDAYS / settings.MARKET_HOLIDAYS entries).
+    """
+
+
+def market_for(stock):
+    return market_for_country(stock.country)
+
+
+def market_for_country(country):
+    return CURRENCY_MARKET.get(currency_for(country), 'KRX')
+
+
+def _calendar_holidays(market, year):
+    """
+    Weekday closures of `year` from exchange_calendars, or None when it is not installed or
+    does not cover the year.
+    """
+    try:
+        import exchange_calendars as xcals
+    except ImportError:
+        return None
+    try:
+        calendar = xcals.get_calendar(EXCHANGE_CALENDARS[market])
+        start, end = date(year, 1, 1), date(year, 12, 31)
+        if start < calendar.first_session.date() or end > calendar.last_session.date():
+            return None
+        sessions = {ts.date() for ts in calendar.sessions_in_range(start.isoformat(), end.isoformat())}
+    except Exception as e:
+        logger.warning(f"exchange_calendars lookup failed for {market} {year}: {e}")
+        return None
+    days = (start + timedelta(days=i) for i in range((end - start).days + 1))
+    return {day for day in days if day.weekday() < 5 and day not in sessions}
+
+
+def holidays(market, year):
+    """
+    Weekday closures of `market` in `year`. Raises MarketCalendarUnavailable when no source covers it.
+    """
+    key = (market, year)
+    if key not in _holidays:
+        days = _calendar_holidays(market, year)
+        if days is None:
+            extra = getattr(settings, 'MARKET_HOLIDAYS', {}).get(market, [])
+            days = {d for d in map(date.fromisoformat, [*HOLIDAYS.get(market, []), *extra]) if d.year == year}
+            if not days:
+                # 캐시하지 않음: settings 추가/패키지 설치 후 재시작 없이도 다시 조회
+                raise MarketCalendarUnavailable(
+                    f"No {market} holidays for {year}. "
+                    f"Install/upgrade exchange_calendars or add them to settings.MARKET_HOLIDAYS"
+                )
+        _holidays[key] = days
+    return _holidays[key]
+
+
+def is_trading_day(market, day):
+    return day.weekday() < 5 and day not in holidays(market, day.year)
+
+
+def local_now(market, at=None):
+    return (at or timezone.now()).astimezone(ZoneInfo(MARKETS[market][0]))
+
+
+def is_market_open(market, at=None):
+    _, open_at, close_at = MARKETS[market]
+    local = local_now(market, at)
+    if not is_trading_day(market, local.date()):
+        return False
+    return open_at <= local.time() < close_at
+
+
+def open_markets(at=None):
+    """
+    Markets in session at `at`. Markets without a calendar for the day are logged and left out.
+    """
+    markets = []
+    for market in MARKETS:
+        try:
+            if is_market_open(market, at):
+                markets.append(market)
+        except MarketCalendarUnavailable as e:
+            logger.error(f"{e}: skipping scheduled refresh of {market}")
+    return markets
+
+
+def last_close(market, at=None):
+    """
+    Most recent regular-session close at or before `at` (aware datetime).
+    """
+    tz_name, _, close_at = MARKETS[market]
+    tz = ZoneInfo(tz_name)
+    local = (at or timezone.now()).astimezone(tz)
+    day = local.date()
+    while True:
+        close = datetime.combine(day, close_at, tzinfo=tz)
+        if is_trading_day(market, day) and close <= local:
+            return close
+        day -= timedelta(days=1)
+
+
+def quote_ttl(stock, at=None):
+    """
+    Seconds a stored quote of `stock` stays fresh: short while its market trades (or when its
+    calendar is unavailable), long otherwise.
+    """
+    try:
+        market_open = is_market_open(market_for(stock), at)
+    except MarketCalendarUnavailable as e:
+        logger.error(str(e))
+        market_open = True
+    if market_open:
+        return getattr(settings, 'QUOTE_TTL_MARKET_OPEN', QUOTE_TTL_MARKET_OPEN)
+    return getattr(settings, 'QUOTE_TTL_MARKET_CLOSED', QUOTE_TTL_MARKET_CLOSED)
+
+
+def is_quote_stale(stock, updated_at, at=None):
+    """
+    A quote is stale when older than its TTL, or, while the market is closed, when it was
+    taken before the last close (so the closing price is picked up once).
+    """
+    if updated_at is None:
+        return True
+    now = at or timezone.now()
+    if (now - updated_at).total_seconds() > quote_ttl(stock, now):
+        return True
+    market = market_for(stock)
+    try:
+        return not is_market_open(market, now) and updated_at < last_close(market, now)
+    except MarketCalendarUnavailable:
+        return False  # 달력이 없으면 TTL 만으로 판단 (quote_ttl 이 짧은 TTL 로 처리)
@@ -0,0 +1,230 @@
+"""
+In-process request metrics (Prometheus text exposition) for PerformanceMetricsMiddleware.
+
+Per request: wall time, SQL query count/time, external HTTP call count/time (requests,
+curl_cffi used by yfinance, httpx used by OpenAI) and optionally peak Python memory.
+Values are aggregated per URL name into histograms and served at /metrics.
+"""
+import contextvars
+import hmac
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+MEMORY_BUCKETS = (2 ** 20, 4 * 2 ** 20, 16 * 2 ** 20, 64 * 2 ** 20, 256 * 2 ** 20, 2 ** 30)
+
+# Host suffix -> service label for external calls
+EXTERNAL_SERVICES = [
+    ('yahoo.com', 'yahoo'),
+    ('naver.com', 'naver'),
+    ('openai.com', 'openai'),
+]
+
+# Collector of the request being handled (None outside a request, e.g. Celery workers)
+current_request = contextvars.ContextVar('perf_current_request', default=None)
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}  # labels tuple -> [bucket counts..., sum, count]
+
+    def observe(self, labels, value):
+        data = self.series.setdefault(labels, [0] * (len(self.buckets) + 2))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                data[i] += 1
+        data[-2] += value
+        data[-1] += 1
+
+    def render(self, label_names):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, data in sorted(self.series.items()):
+            base = _labels(label_names, labels)
+            for bound, count in zip(self.buckets, data):
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {data[-1]}')
+            lines.append(f"{self.name}_sum{{{base}}} {data[-2]}")
+            lines.append(f"{self.name}_count{{{base}}} {data[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.series = {}
+
+    def inc(self, labels, value=1):
+        self.series[labels] = self.series.get(labels, 0) + value
+
+    def render(self, label_names):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.series.items()):
+            lines.append(f"{self.name}{{{_labels(label_names, labels)}}} {value}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values):
+    return ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = Counter('django_requests_total', 'Requests by URL name and status code')
+        self.duration = Histogram('django_request_duration_seconds', 'Wall time per request', DURATION_BUCKETS)
+        self.sql_queries = Histogram('django_request_sql_queries', 'SQL queries per request', COUNT_BUCKETS)
+        self.sql_duration = Histogram('django_request_sql_duration_seconds', 'SQL time per request', DURATION_BUCKETS)
+        self.external_calls = Histogram('django_request_external_calls', 'External HTTP calls per request', COUNT_BUCKETS)
+        self.external_duration = Histogram('django_request_external_duration_seconds', 'External HTTP time per request', DURATION_BUCKETS)
+        self.peak_memory = Histogram('django_request_peak_memory_bytes', 'Peak traced Python memory per request (requests not overlapping others)', MEMORY_BUCKETS)
+        self.external_by_service = Counter('external_http_requests_total', 'External HTTP calls by service')
+        self.external_time_by_service = Counter('external_http_duration_seconds_total', 'External HTTP time by service')
+
+    def record(self, view, status, collector):
+        with self.lock:
+            self.requests.inc((view, status))
+            self.duration.observe((view,), collector.duration)
+            self.sql_queries.observe((view,), len(collector.queries))
+            self.sql_duration.observe((view,), collector.sql_time)
+            self.external_calls.observe((view,), len(collector.external))
+            self.external_duration.observe((view,), collector.external_time)
+            if collector.peak_memory is not None:
+                self.peak_memory.observe((view,), collector.peak_memory)
+            for service, elapsed in collector.external:
+                self.external_by_service.inc((service,))
+                self.external_time_by_service.inc((service,), elapsed)
+
+    def render(self):
+        with self.lock:
+            lines = []
+            lines += self.requests.render(('view', 'status'))
+            for histogram in (self.duration, self.sql_queries, self.sql_duration,
+                              self.external_calls, self.external_duration, self.peak_memory):
+                lines += histogram.render(('view',))
+            lines += self.external_by_service.render(('service',))
+            lines += self.external_time_by_service.render(('service',))
+        try:
+            import resource
+            lines += [
+                "# HELP process_max_rss_bytes Peak resident set size of this process",
+                "# TYPE process_max_rss_bytes gauge",
+                f"process_max_rss_bytes {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}",
+            ]
+        except ImportError:
+            pass
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class RequestCollector:
+    """
+    Per-request accumulator; installed as a DB execute wrapper and read by the HTTP patches.
+    """
+    def __init__(self):
+        self.queries = []       # (sql, seconds)
+        self.sql_time = 0.0
+        self.external = []      # (service, seconds)
+        self.external_time = 0.0
+        self.duration = 0.0
+        self.peak_memory = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.sql_time += elapsed
+            self.queries.append((sql, elapsed))
+
+    def add_external(self, url, elapsed):
+        host = urlsplit(str(url)).hostname or ''
+        service = next((label for suffix, label in EXTERNAL_SERVICES if host.endswith(suffix)), 'other')
+        self.external.append((service, elapsed))
+        self.external_time += elapsed
+
+
+def _timed(send, url_of):
+    def wrapper(*args, **kwargs):
+        collector = current_request.get()
+        if collector is None:
+            return send(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return send(*args, **kwargs)
+        finally:
+            collector.add_external(url_of(args, kwargs), time.perf_counter() - start)
+    wrapper._perf_patched = True
+    return wrapper
+
+
+_patched = False
+
+
+def patch_http_clients():
+    """
+    Wraps the send path of requests, curl_cffi (yfinance) and httpx (OpenAI) once per process.
+    Clients that are not installed are skipped.
+    """
+    global _patched
+    if _patched:
+        return
+    _patched = True
+
+    try:
+        import requests
+        if not getattr(requests.Session.send, '_perf_patched', False):
+            # Session.send(self, request, **kwargs)
+            requests.Session.send = _timed(requests.Session.send, lambda a, k: a[1].url)
+    except ImportError:
+        pass
+
+    try:
+        from curl_cffi import requests as curl_requests
+        if not getattr(curl_requests.Session.request, '_perf_patched', False):
+            # Session.request(self, method, url, ...)
+            curl_requests.Session.request = _timed(curl_requests.Session.request, lambda a, k: k.get('url', a[2] if len(a) > 2 else ''))
+    except ImportError:
+        pass
+
+    try:
+        import httpx
+        if not getattr(httpx.Client.send, '_perf_patched', False):
+            # Client.send(self, request, ...)
+            httpx.Client.send = _timed(httpx.Client.send, lambda a, k: a[1].url)
+    except ImportError:
+        pass
+
+
+def metrics_view(request):
+    """
+    Prometheus text endpoint. Allowed for superusers and for requests bearing
+    `Authorization: Bearer <PERF_METRICS_TOKEN>`; PERF_METRICS_ALLOWED_IPS (empty by default)
+    additionally allows direct, non-proxied deployments by REMOTE_ADDR.
+    """
+    user = getattr(request, 'user', None)
+    token = getattr(settings, 'PERF_METRICS_TOKEN', '')
+    auth = request.META.get('HTTP_AUTHORIZATION', '')
+    allowed = (
+        (user and user.is_superuser)
+        or (token and hmac.compare_digest(auth.encode(), f"Bearer {token}".encode()))
+        or request.META.get('REMOTE_ADDR') in getattr(settings, 'PERF_METRICS_ALLOWED_IPS', [])
+    )
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
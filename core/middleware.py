@@ -1,3 +1,5 @@
+import threading
+
 from django.shortcuts import redirect
 from django.core.exceptions import PermissionDenied
 from django.conf import settings
@@ -18,3 +20,84 @@ class AdminAccessRestrictionMiddleware:
                 # 또는 403 에러 발생 시: raise PermissionDenied
             
         return self.get_response(request)
+
+
+class PerformanceMetricsMiddleware:
+    """
+    요청별 성능 계측: 처리 시간, SQL 쿼리 수/시간, 외부 HTTP 호출 수/시간(yfinance, 네이버, OpenAI),
+    (옵션) 최대 메모리를 URL 이름별 히스토그램으로 집계해 /metrics 로 노출합니다.
+    PERF_SLOW_REQUEST_MS 를 넘는 요청은 가장 느린 쿼리 목록과 함께 로그로 남깁니다.
+
+    최대 메모리(PERF_TRACE_MEMORY)는 tracemalloc 의 프로세스 전역 peak 를 쓰므로, 스레드 서버
+    (gthread 등)에서 다른 요청과 겹친 요청은 값이 섞입니다. 그래서 처리 중 다른 요청이 시작되지 않은
+    요청만 기록하고, 겹친 요청은 peak 를 남기지 않습니다 (백그라운드 스레드 할당은 여전히 포함됨).
+    """
+    def __init__(self, get_response):
+        from .metrics import patch_http_clients
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'PERF_METRICS_ENABLED', True)
+        self.slow_ms = getattr(settings, 'PERF_SLOW_REQUEST_MS', 1000)
+        self.trace_memory = getattr(settings, 'PERF_TRACE_MEMORY', False)
+        self.skip_prefixes = ('/metrics', '/' + (settings.STATIC_URL or 'static/').lstrip('/'))
+        # 요청 겹침 판별 (trace_memory): 처리 중인 요청 수, 지금까지 시작된 요청 수
+        self.memory_lock = threading.Lock()
+        self.in_flight = 0
+        self.started = 0
+        if self.enabled:
+            patch_http_clients()
+
+    def __call__(self, request):
+        if not self.enabled or request.path.startswith(self.skip_prefixes):
+            return self.get_response(request)
+
+        import time
+        import tracemalloc
+        from django.db import connection
+        from .metrics import RequestCollector, current_request, registry
+
+        collector = RequestCollector()
+        token = current_request.set(collector)
+        if self.trace_memory:
+            with self.memory_lock:
+                self.in_flight += 1
+                self.started += 1
+                started_at = self.started
+                alone = self.in_flight == 1
+                if alone:
+                    if not tracemalloc.is_tracing():
+                        tracemalloc.start()
+                    tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(collector):
+                response = self.get_response(request)
+        finally:
+            collector.duration = time.perf_counter() - start
+            if self.trace_memory:
+                with self.memory_lock:
+                    # 시작 이후 다른 요청이 없었을 때만 peak 가 이 요청의 것
+                    if alone and self.started == started_at:
+                        collector.peak_memory = tracemalloc.get_traced_memory()[1]
+                    self.in_flight -= 1
+            current_request.reset(token)
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else None) or 'unresolved'
+        registry.record(view, response.status_code, collector)
+
+        if collector.duration * 1000 >= self.slow_ms:
+            self.log_slow_request(request, view, collector)
+        return response
+
+    def log_slow_request(self, request, view, collector):
+        import logging
+        logger = logging.getLogger('core.performance')
+        slowest = sorted(collector.queries, key=lambda q: q[1], reverse=True)[:10]
+        lines = [f"  {elapsed * 1000:8.1f}ms  {sql[:300]}" for sql, elapsed in slowest]
+        logger.warning(
+            "Slow request %s %s (%s): %.0fms, %d queries (%.0fms SQL), %d external calls (%.0fms)\n%s",
+            request.method, request.path, view, collector.duration * 1000,
+            len(collector.queries), collector.sql_time * 1000,
+            len(collector.external), collector.external_time * 1000,
+            "\n".join(lines)
+        )
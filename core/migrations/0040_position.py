@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:17
+
+import django.db.models.deletion
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def build_positions(apps, schema_editor):
+    """Replay existing BUY/SELL transactions once to seed Position rows."""
+    Transaction = apps.get_model('core', 'Transaction')
+    Position = apps.get_model('core', 'Position')
+
+    state = {}
+    txs = Transaction.objects.filter(
+        related_asset__isnull=False,
+        organization__isnull=False,
+        transaction_type__in=['BUY', 'SELL']
+    ).order_by('timestamp', 'id')
+    for tx in txs.iterator():
+        key = (tx.organization_id, tx.related_asset_id)
+        p = state.setdefault(key, {'quantity': 0, 'total_cost': Decimal(0), 'realized_pl': Decimal(0)})
+        if tx.transaction_type == 'BUY':
+            p['quantity'] += tx.quantity
+            p['total_cost'] += abs(tx.amount) - tx.fee
+        else:
+            qty_sold = abs(tx.quantity)
+            avg = p['total_cost'] / p['quantity'] if p['quantity'] > 0 else 0
+            p['quantity'] -= qty_sold
+            p['total_cost'] -= qty_sold * avg
+            p['realized_pl'] += tx.profit
+        if p['quantity'] <= 0:
+            p['quantity'] = max(p['quantity'], 0)
+            p['total_cost'] = Decimal(0)
+
+    Position.objects.bulk_create([
+        Position(organization_id=org_id, stock_id=stock_id, **values)
+        for (org_id, stock_id), values in state.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0039_alter_strategy_options_remove_strategy_target_stock_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Position',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(default=0, verbose_name='보유 수량')),
+                ('total_cost', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='보유 원가 (수수료 제외)')),
+                ('realized_pl', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='누적 실현 손익')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='positions', to='core.organization')),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='positions', to='core.stock', verbose_name='종목')),
+            ],
+            options={
+                'unique_together': {('organization', 'stock')},
+            },
+        ),
+        migrations.RunPython(build_positions, migrations.RunPython.noop),
+    ]
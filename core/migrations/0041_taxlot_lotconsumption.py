@@ -0,0 +1,100 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:19
+
+import django.db.models.deletion
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def build_lots(apps, schema_editor):
+    """Open a lot per existing BUY and consume them FIFO with existing SELLs."""
+    Transaction = apps.get_model('core', 'Transaction')
+    TaxLot = apps.get_model('core', 'TaxLot')
+    LotConsumption = apps.get_model('core', 'LotConsumption')
+
+    open_lots = {}
+    txs = Transaction.objects.filter(
+        related_asset__isnull=False,
+        organization__isnull=False,
+        transaction_type__in=['BUY', 'SELL']
+    ).order_by('timestamp', 'id')
+    for tx in txs.iterator():
+        key = (tx.organization_id, tx.related_asset_id)
+        queue = open_lots.setdefault(key, [])
+        if tx.transaction_type == 'BUY':
+            if tx.quantity <= 0:
+                continue
+            queue.append(TaxLot.objects.create(
+                organization_id=tx.organization_id,
+                stock_id=tx.related_asset_id,
+                account_id=tx.account_id,
+                buy_transaction=tx,
+                opened_at=tx.timestamp,
+                quantity=tx.quantity,
+                remaining_quantity=tx.quantity,
+                unit_cost=(abs(tx.amount) - tx.fee) / tx.quantity,
+                is_open=True
+            ))
+            continue
+
+        remaining = abs(tx.quantity)
+        price = tx.price or Decimal(0)
+        while remaining > 0 and queue:
+            lot = queue[0]
+            take = min(lot.remaining_quantity, remaining)
+            cost = lot.unit_cost * take
+            LotConsumption.objects.create(
+                sell_transaction=tx, lot=lot, quantity=take,
+                cost=cost, proceeds=price * take, realized_pl=price * take - cost
+            )
+            lot.remaining_quantity -= take
+            lot.is_open = lot.remaining_quantity > 0
+            lot.save(update_fields=['remaining_quantity', 'is_open'])
+            remaining -= take
+            if not lot.is_open:
+                queue.pop(0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0040_position'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaxLot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('opened_at', models.DateTimeField(verbose_name='취득 일시')),
+                ('quantity', models.IntegerField(default=0, verbose_name='취득 수량')),
+                ('remaining_quantity', models.IntegerField(default=0, verbose_name='잔여 수량')),
+                ('unit_cost', models.DecimalField(decimal_places=4, default=0, max_digits=20, verbose_name='취득 단가 (수수료 제외)')),
+                ('is_open', models.BooleanField(default=True, verbose_name='보유 중')),
+                ('account', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tax_lots', to='core.account', verbose_name='매수 계좌')),
+                ('buy_transaction', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='tax_lot', to='core.transaction', verbose_name='매수 거래')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tax_lots', to='core.organization')),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tax_lots', to='core.stock', verbose_name='종목')),
+            ],
+            options={
+                'ordering': ['opened_at', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LotConsumption',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(default=0, verbose_name='차감 수량')),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='차감 원가')),
+                ('proceeds', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='매도 금액')),
+                ('realized_pl', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='실현 손익')),
+                ('sell_transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lot_consumptions', to='core.transaction', verbose_name='매도 거래')),
+                ('lot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='consumptions', to='core.taxlot', verbose_name='로트')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='taxlot',
+            index=models.Index(fields=['organization', 'stock', 'is_open', 'opened_at', 'id'], name='taxlot_open_fifo_idx'),
+        ),
+        migrations.RunPython(build_lots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:21
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0041_taxlot_lotconsumption'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='일시'),
+        ),
+        migrations.CreateModel(
+            name='LedgerCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='기준 일자')),
+                ('state', models.JSONField(default=dict, verbose_name='누적 원장 상태')),
+                ('created_at', models.DateTimeField(auto_now=True)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_checkpoints', to='core.organization')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'unique_together': {('organization', 'date')},
+            },
+        ),
+    ]
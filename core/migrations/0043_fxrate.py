@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0042_ledgercheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FxRate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3, verbose_name='통화')),
+                ('date', models.DateField(verbose_name='기준 일자')),
+                ('rate', models.DecimalField(decimal_places=6, max_digits=20, verbose_name='원화 환율')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-date'],
+                'unique_together': {('currency', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:27
+
+import django.db.models.deletion
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def build_account_positions(apps, schema_editor):
+    """Replay existing BUY/SELL transactions once to seed AccountPosition rows."""
+    Transaction = apps.get_model('core', 'Transaction')
+    AccountPosition = apps.get_model('core', 'AccountPosition')
+
+    state = {}
+    txs = Transaction.objects.filter(
+        related_asset__isnull=False,
+        account__isnull=False,
+        organization__isnull=False,
+        transaction_type__in=['BUY', 'SELL']
+    ).order_by('timestamp', 'id')
+    for tx in txs.iterator():
+        key = (tx.organization_id, tx.account_id, tx.related_asset_id)
+        p = state.setdefault(key, {'quantity': 0, 'total_cost': Decimal(0), 'last_traded_at': None})
+        if tx.transaction_type == 'BUY':
+            p['quantity'] += tx.quantity
+            p['total_cost'] += abs(tx.amount) - tx.fee
+        else:
+            qty_sold = abs(tx.quantity)
+            avg = p['total_cost'] / p['quantity'] if p['quantity'] > 0 else 0
+            p['total_cost'] -= qty_sold * avg
+            p['quantity'] -= qty_sold
+        if p['quantity'] <= 0:
+            p['quantity'] = max(p['quantity'], 0)
+            p['total_cost'] = Decimal(0)
+        p['last_traded_at'] = tx.timestamp
+
+    AccountPosition.objects.bulk_create([
+        AccountPosition(organization_id=org_id, account_id=account_id, stock_id=stock_id, **values)
+        for (org_id, account_id, stock_id), values in state.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0043_fxrate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountPosition',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(default=0, verbose_name='보유 수량')),
+                ('total_cost', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='보유 원가 (수수료 제외)')),
+                ('last_traded_at', models.DateTimeField(blank=True, null=True, verbose_name='최근 거래 일시')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='positions', to='core.account', verbose_name='계좌')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='account_positions', to='core.organization')),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='account_positions', to='core.stock', verbose_name='종목')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['organization', 'account'], name='acctpos_org_account_idx')],
+                'unique_together': {('account', 'stock')},
+            },
+        ),
+        migrations.RunPython(build_account_positions, migrations.RunPython.noop),
+    ]
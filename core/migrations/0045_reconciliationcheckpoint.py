@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0044_accountposition'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReconciliationCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_transaction_id', models.IntegerField(verbose_name='마지막 거래 ID')),
+                ('last_timestamp', models.DateTimeField(verbose_name='마지막 거래 일시')),
+                ('tx_count', models.IntegerField(default=0, verbose_name='누적 거래 수')),
+                ('amount_total', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='누적 금액 합계')),
+                ('chain_hash', models.CharField(max_length=64, verbose_name='누적 해시')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reconciliation_checkpoints', to='core.organization')),
+            ],
+            options={
+                'ordering': ['-last_timestamp', '-last_transaction_id'],
+            },
+        ),
+    ]
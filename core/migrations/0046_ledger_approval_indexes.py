@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0045_reconciliationcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='approval',
+            index=models.Index(fields=['organization', 'updated_at'], name='approval_org_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='approval',
+            index=models.Index(fields=['organization', 'status', 'updated_at'], name='approval_org_status_upd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='approval',
+            index=models.Index(fields=['organization', 'report_type', 'status', 'created_at'], name='approval_org_type_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['organization', 'timestamp', 'id'], name='tx_org_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['organization', 'related_asset', 'timestamp'], name='tx_org_asset_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['organization', 'transaction_type', 'timestamp'], name='tx_org_type_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['organization', 'account', 'related_asset'], name='tx_org_account_asset_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0046_ledger_approval_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockRefreshJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock_ids', models.JSONField(blank=True, default=list, verbose_name='대상 종목 ID')),
+                ('status', models.CharField(choices=[('pending', '대기중'), ('running', '진행중'), ('done', '완료'), ('failed', '실패')], default='pending', max_length=10, verbose_name='상태')),
+                ('total', models.IntegerField(default=0, verbose_name='대상 종목 수')),
+                ('processed', models.IntegerField(default=0, verbose_name='처리 수')),
+                ('succeeded', models.IntegerField(default=0, verbose_name='성공 수')),
+                ('failed', models.IntegerField(default=0, verbose_name='실패 수')),
+                ('error', models.TextField(blank=True, default='', verbose_name='오류')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_refresh_jobs', to=settings.AUTH_USER_MODEL, verbose_name='요청자')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:51
+
+import django.db.models.deletion
+from datetime import datetime, timezone
+
+from django.db import migrations, models
+
+
+def copy_candle_data(apps, schema_editor):
+    """Move Stock.candle_data ([{'x': ms, 'y': [o, h, l, c]}], weekly bars) into Candle rows."""
+    Stock = apps.get_model('core', 'Stock')
+    Candle = apps.get_model('core', 'Candle')
+
+    batch = []
+    for stock_id, candles in Stock.objects.values_list('id', 'candle_data').iterator():
+        for c in candles if isinstance(candles, list) else []:
+            y = c.get('y') or []
+            if c.get('x') is None or len(y) < 4 or y[3] is None:
+                continue
+            batch.append(Candle(
+                stock_id=stock_id, interval='1wk',
+                timestamp=datetime.fromtimestamp(c['x'] / 1000, tz=timezone.utc),
+                open=y[0], high=y[1], low=y[2], close=y[3],
+            ))
+        if len(batch) >= 5000:
+            Candle.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    Candle.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def restore_candle_data(apps, schema_editor):
+    Stock = apps.get_model('core', 'Stock')
+    Candle = apps.get_model('core', 'Candle')
+
+    data = {}
+    for stock_id, ts, o, h, l, c in Candle.objects.filter(interval='1wk').order_by('stock_id', 'timestamp').values_list(
+            'stock_id', 'timestamp', 'open', 'high', 'low', 'close'):
+        data.setdefault(stock_id, []).append({'x': int(ts.timestamp() * 1000), 'y': [o, h, l, c]})
+    stocks = list(Stock.objects.filter(id__in=data))
+    for stock in stocks:
+        stock.candle_data = data[stock.id]
+    Stock.objects.bulk_update(stocks, ['candle_data'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0047_stock_refresh_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Candle',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('interval', models.CharField(choices=[('1d', '일봉'), ('1wk', '주봉')], default='1wk', max_length=4, verbose_name='주기')),
+                ('timestamp', models.DateTimeField(verbose_name='봉 시작 시각')),
+                ('open', models.FloatField(verbose_name='시가')),
+                ('high', models.FloatField(verbose_name='고가')),
+                ('low', models.FloatField(verbose_name='저가')),
+                ('close', models.FloatField(verbose_name='종가')),
+                ('volume', models.BigIntegerField(blank=True, null=True, verbose_name='거래량')),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='candles', to='core.stock', verbose_name='종목')),
+            ],
+            options={
+                'ordering': ['timestamp'],
+                'unique_together': {('stock', 'interval', 'timestamp')},
+            },
+        ),
+        migrations.RunPython(copy_candle_data, restore_candle_data),
+        migrations.RemoveField(
+            model_name='stock',
+            name='candle_data',
+        ),
+    ]
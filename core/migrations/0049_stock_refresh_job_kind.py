@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0048_candle'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockrefreshjob',
+            name='kind',
+            field=models.CharField(choices=[('manual', '수동 갱신'), ('quotes', '장중 시세 갱신'), ('eod', '장 마감 갱신')], default='manual', max_length=10, verbose_name='종류'),
+        ),
+        migrations.AddField(
+            model_name='stockrefreshjob',
+            name='market',
+            field=models.CharField(blank=True, default='', max_length=10, verbose_name='시장'),
+        ),
+    ]
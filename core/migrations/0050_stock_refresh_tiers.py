@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:56
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def seed_tier_timestamps(apps, schema_editor):
+    """Stocks refreshed before the split got all tiers at once: start every tier from updated_at."""
+    Stock = apps.get_model('core', 'Stock')
+    Stock.objects.filter(current_price__isnull=False).update(
+        quote_updated_at=F('updated_at'),
+        candles_updated_at=F('updated_at'),
+        fundamentals_updated_at=F('updated_at'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0049_stock_refresh_job_kind'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stock',
+            name='candles_updated_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='캔들 갱신 시각'),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='fundamentals_updated_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='기업정보 갱신 시각'),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='quote_updated_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='시세 갱신 시각'),
+        ),
+        migrations.AlterField(
+            model_name='stockrefreshjob',
+            name='kind',
+            field=models.CharField(choices=[('manual', '수동 갱신'), ('quotes', '장중 시세 갱신'), ('eod', '장 마감 갱신'), ('fundamentals', '기업정보 갱신')], default='manual', max_length=12, verbose_name='종류'),
+        ),
+        migrations.RunPython(seed_tier_timestamps, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0050_stock_refresh_tiers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stock',
+            name='yahoo_suffix',
+            field=models.CharField(blank=True, default='', max_length=5, verbose_name='Yahoo 접미사'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0051_stock_yahoo_suffix'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SymbolMaster',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=20, unique=True, verbose_name='Yahoo 심볼')),
+                ('code', models.CharField(max_length=20, verbose_name='종목코드')),
+                ('name', models.CharField(max_length=200, verbose_name='종목명')),
+                ('exchange', models.CharField(max_length=20, verbose_name='거래소')),
+                ('country', models.CharField(blank=True, default='', max_length=50, verbose_name='국가')),
+                ('is_etf', models.BooleanField(default=False, verbose_name='ETF 여부')),
+                ('is_active', models.BooleanField(default=True, verbose_name='상장 여부')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['symbol'],
+            },
+        ),
+    ]
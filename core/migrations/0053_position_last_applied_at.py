@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:17
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+
+
+def seed_last_applied_at(apps, schema_editor):
+    """Positions built before this field: latest BUY/SELL of the stock in the organization."""
+    Position = apps.get_model('core', 'Position')
+    Transaction = apps.get_model('core', 'Transaction')
+    latest = (
+        Transaction.objects.filter(
+            organization_id=OuterRef('organization_id'), related_asset_id=OuterRef('stock_id'),
+            transaction_type__in=['BUY', 'SELL'],
+        ).values('related_asset_id').annotate(latest=Max('timestamp')).values('latest')
+    )
+    Position.objects.update(last_applied_at=Subquery(latest[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0052_symbol_master'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='position',
+            name='last_applied_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='최근 반영 거래 일시'),
+        ),
+        migrations.RunPython(seed_last_applied_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0053_position_last_applied_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lotconsumption',
+            name='specific',
+            field=models.BooleanField(default=False, verbose_name='지정 로트'),
+        ),
+    ]
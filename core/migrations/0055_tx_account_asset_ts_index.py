@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0054_lotconsumption_specific'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='tx_org_account_asset_idx',
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['organization', 'account', 'related_asset', 'timestamp'], name='tx_org_account_asset_idx'),
+        ),
+        # 새 인덱스 통계가 없으면 planner 가 원장 페이지에서도 이 인덱스를 고름 -> 통계 갱신
+        migrations.RunSQL('ANALYZE core_transaction', migrations.RunSQL.noop),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
+from django.utils import timezone
 from .utils import generate_employee_id
 
 # 1. 회사 (Organization)
@@ -220,6 +221,15 @@ class Approval(models.Model):
     # 최종 승인 후 생성된 로그와 연결
     investment_log = models.OneToOneField(InvestmentLog, on_delete=models.SET_NULL, null=True, blank=True, related_name='approval_doc')
 
+    class Meta:
+        indexes = [
+            # 결재함 목록 (전체/상태별, 최근 수정순)
+            models.Index(fields=['organization', 'updated_at'], name='approval_org_updated_idx'),
+            models.Index(fields=['organization', 'status', 'updated_at'], name='approval_org_status_upd_idx'),
+            # 결재 대기 매매 기안 (report_type + status, 최근 작성순)
+            models.Index(fields=['organization', 'report_type', 'status', 'created_at'], name='approval_org_type_status_idx'),
+        ]
+
     def __str__(self):
         return f"[{self.get_report_type_display()}] {self.title}"
 
@@ -274,10 +284,11 @@ class Message(models.Model):
 class Stock(models.Model):
     name = models.CharField(max_length=100, verbose_name="종목명")
     code = models.CharField(max_length=20, unique=True, verbose_name="종목코드")
+    # [New] Yahoo 거래소 접미사 (.KS / .KQ) - 6자리 국내 코드만 해당, 첫 조회 때 한 번 판별해 저장
+    yahoo_suffix = models.CharField(max_length=5, blank=True, default='', verbose_name="Yahoo 접미사")
     current_price = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True, verbose_name="현재가")
     high_52w = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True, verbose_name="52주 고가")
     low_52w = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True, verbose_name="52주 저가")
-    candle_data = models.JSONField(default=list, verbose_name="캔들 데이터(종가)")
     
     # [New] Metadata
     market_cap = models.BigIntegerField(null=True, blank=True, verbose_name="시가총액")
@@ -291,14 +302,46 @@ class Stock(models.Model):
     agent = models.ForeignKey('Agent', on_delete=models.SET_NULL, null=True, blank=True, related_name='managed_stocks', verbose_name="담당 AI")
 
     updated_at = models.DateTimeField(auto_now=True, verbose_name="최근 업데이트")
+    # [New] 갱신 단계별 신선도 (core.utils QUOTE_FIELDS / CANDLE_FIELDS / FUNDAMENTAL_FIELDS)
+    quote_updated_at = models.DateTimeField(null=True, blank=True, verbose_name="시세 갱신 시각")
+    candles_updated_at = models.DateTimeField(null=True, blank=True, verbose_name="캔들 갱신 시각")
+    fundamentals_updated_at = models.DateTimeField(null=True, blank=True, verbose_name="기업정보 갱신 시각")
 
     @property
     def is_korean(self):
         return self.country in ['한국', 'Korea', 'South Korea', 'KR']
 
+    @property
+    def yahoo_symbol(self):
+        return f"{self.code}{self.yahoo_suffix}"
+
     def __str__(self):
         return f"{self.name} ({self.code})"
 
+# [New] 종목 캔들 (OHLCV) - 기간 조회/증분 upsert 용 전용 테이블 (기존 Stock.candle_data JSON 대체)
+class Candle(models.Model):
+    INTERVAL_CHOICES = [
+        ('1d', '일봉'),
+        ('1wk', '주봉'),
+    ]
+
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='candles', verbose_name="종목")
+    interval = models.CharField(max_length=4, choices=INTERVAL_CHOICES, default='1wk', verbose_name="주기")
+    timestamp = models.DateTimeField(verbose_name="봉 시작 시각")
+    open = models.FloatField(verbose_name="시가")
+    high = models.FloatField(verbose_name="고가")
+    low = models.FloatField(verbose_name="저가")
+    close = models.FloatField(verbose_name="종가")
+    volume = models.BigIntegerField(null=True, blank=True, verbose_name="거래량")
+
+    class Meta:
+        # (stock, interval, timestamp) 유니크 인덱스가 기간 조회와 upsert 충돌 판정을 모두 담당
+        unique_together = ('stock', 'interval', 'timestamp')
+        ordering = ['timestamp']
+
+    def __str__(self):
+        return f"{self.stock_id} {self.interval} {self.timestamp:%Y-%m-%d} {self.close}"
+
 class TradeNotification(models.Model):
     """
     미래에셋증권 등 외부 체결 알림(SMS) 원본 로그 저장
@@ -421,14 +464,102 @@ class Transaction(models.Model):
     tax = models.DecimalField(max_digits=15, decimal_places=0, default=0, verbose_name="세금")   # [K-IFRS]
     balance_after = models.DecimalField(max_digits=15, decimal_places=0, default=0, verbose_name="거래 후 잔액")
     description = models.TextField(blank=True, verbose_name="적요")
-    timestamp = models.DateTimeField(auto_now_add=True, verbose_name="일시")
+    timestamp = models.DateTimeField(default=timezone.now, verbose_name="일시") # 과거 일자 거래(결재일 기준) 기록 허용
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # 원장 조회/커서 페이지네이션, 일자 범위, 정합성 검증: (organization, timestamp, id)
+            models.Index(fields=['organization', 'timestamp', 'id'], name='tx_org_ts_idx'),
+            # 종목별 재계산 (Position/TaxLot/AccountPosition), 포트폴리오 집계
+            models.Index(fields=['organization', 'related_asset', 'timestamp'], name='tx_org_asset_ts_idx'),
+            # 유형별 집계 (입출금 흐름, 매도 합계)
+            models.Index(fields=['organization', 'transaction_type', 'timestamp'], name='tx_org_type_ts_idx'),
+            # 계좌별 포트폴리오: 종목별 재생 순서 (related_asset, timestamp) 까지 인덱스로 해결
+            models.Index(fields=['organization', 'account', 'related_asset', 'timestamp'], name='tx_org_account_asset_idx'),
+        ]
 
     def __str__(self):
         return f"[{self.get_transaction_type_display()}] {self.amount:,.0f}원 ({self.timestamp.strftime('%Y-%m-%d %H:%M')})"
 
+# 11-1. 보유 포지션 (Position) - 종목별 이동평균 원가 상태 (거래마다 O(1) 갱신)
+class Position(models.Model):
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='positions')
+    stock = models.ForeignKey('Stock', on_delete=models.CASCADE, related_name='positions', verbose_name="종목")
+    quantity = models.IntegerField(default=0, verbose_name="보유 수량")
+    total_cost = models.DecimalField(max_digits=20, decimal_places=2, default=0, verbose_name="보유 원가 (수수료 제외)")
+    realized_pl = models.DecimalField(max_digits=20, decimal_places=2, default=0, verbose_name="누적 실현 손익")
+    # 마지막으로 반영된 거래 시각 - 이보다 이른(소급) 거래는 증분 반영 대신 재계산
+    last_applied_at = models.DateTimeField(null=True, blank=True, verbose_name="최근 반영 거래 일시")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('organization', 'stock')
+
+    @property
+    def avg_price(self):
+        return self.total_cost / self.quantity if self.quantity > 0 else 0
+
+    def __str__(self):
+        return f"{self.organization.name} - {self.stock.name}: {self.quantity}주"
+
+# 11-1-1. 계좌별 보유 종목 (AccountPosition) - 계좌 화면용 집계, 거래마다 증분 갱신
+class AccountPosition(models.Model):
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='account_positions')
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='positions', verbose_name="계좌")
+    stock = models.ForeignKey('Stock', on_delete=models.CASCADE, related_name='account_positions', verbose_name="종목")
+    quantity = models.IntegerField(default=0, verbose_name="보유 수량")
+    total_cost = models.DecimalField(max_digits=20, decimal_places=2, default=0, verbose_name="보유 원가 (수수료 제외)")
+    last_traded_at = models.DateTimeField(null=True, blank=True, verbose_name="최근 거래 일시")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('account', 'stock')
+        indexes = [models.Index(fields=['organization', 'account'], name='acctpos_org_account_idx')]
+
+    @property
+    def avg_price(self):
+        return self.total_cost / self.quantity if self.quantity > 0 else 0
+
+    def __str__(self):
+        return f"{self.account} - {self.stock.name}: {self.quantity}주"
+
+# 11-2. 매수 로트 (TaxLot) - 매수 1건 = 로트 1개, 매도 시 FIFO/지정 로트 차감
+class TaxLot(models.Model):
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='tax_lots')
+    stock = models.ForeignKey('Stock', on_delete=models.CASCADE, related_name='tax_lots', verbose_name="종목")
+    account = models.ForeignKey(Account, on_delete=models.SET_NULL, null=True, blank=True, related_name='tax_lots', verbose_name="매수 계좌")
+    buy_transaction = models.OneToOneField(Transaction, on_delete=models.CASCADE, related_name='tax_lot', verbose_name="매수 거래")
+    opened_at = models.DateTimeField(verbose_name="취득 일시")
+    quantity = models.IntegerField(default=0, verbose_name="취득 수량")
+    remaining_quantity = models.IntegerField(default=0, verbose_name="잔여 수량")
+    unit_cost = models.DecimalField(max_digits=20, decimal_places=4, default=0, verbose_name="취득 단가 (수수료 제외)")
+    is_open = models.BooleanField(default=True, verbose_name="보유 중")
+
+    class Meta:
+        ordering = ['opened_at', 'id']
+        indexes = [
+            # 미청산 로트 인덱스: (회사, 종목)별 FIFO 순서로 바로 탐색
+            models.Index(fields=['organization', 'stock', 'is_open', 'opened_at', 'id'], name='taxlot_open_fifo_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.stock.name} {self.remaining_quantity}/{self.quantity}주 @ {self.unit_cost:,.0f}"
+
+# 11-3. 로트 차감 내역 (LotConsumption) - 매도 거래가 어떤 로트를 얼마나 소진했는지
+class LotConsumption(models.Model):
+    sell_transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name='lot_consumptions', verbose_name="매도 거래")
+    lot = models.ForeignKey(TaxLot, on_delete=models.CASCADE, related_name='consumptions', verbose_name="로트")
+    quantity = models.IntegerField(default=0, verbose_name="차감 수량")
+    cost = models.DecimalField(max_digits=20, decimal_places=2, default=0, verbose_name="차감 원가")
+    proceeds = models.DecimalField(max_digits=20, decimal_places=2, default=0, verbose_name="매도 금액")
+    realized_pl = models.DecimalField(max_digits=20, decimal_places=2, default=0, verbose_name="실현 손익")
+    # 매도 시 직접 지정한 로트(Specific-ID)인지 - 재계산 때 지정 로트는 유지, 나머지는 FIFO
+    specific = models.BooleanField(default=False, verbose_name="지정 로트")
+
+    def __str__(self):
+        return f"{self.lot} -{self.quantity}주"
+
 # 12. 일별 재무 스냅샷 (DailySnapshot)
 class DailySnapshot(models.Model):
     organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='daily_snapshots', null=True, blank=True)
@@ -464,6 +595,109 @@ class DailySnapshot(models.Model):
     def __str__(self):
         return f"{self.date} 재무보고 ({self.organization.name})"
 
+# 12-1. 원장 체크포인트 (LedgerCheckpoint) - 특정 일자 종료 시점의 누적 원장 상태
+class LedgerCheckpoint(models.Model):
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='ledger_checkpoints')
+    date = models.DateField(verbose_name="기준 일자")
+    # 현금, 보유 수량/원가, 누적 입출금·수수료·세금·실현손익 (services_ledger.LedgerState)
+    state = models.JSONField(default=dict, verbose_name="누적 원장 상태")
+    created_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('organization', 'date')
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.date} 체크포인트 ({self.organization.name})"
+
+# [New] 원장 정합성 체크포인트 - 검증 완료된 구간의 건수/합계/해시 (이후 거래만 재검증)
+class ReconciliationCheckpoint(models.Model):
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='reconciliation_checkpoints')
+    # 검증 커서: (timestamp, id) 순서상 마지막으로 검증된 거래
+    last_transaction_id = models.IntegerField(verbose_name="마지막 거래 ID")
+    last_timestamp = models.DateTimeField(verbose_name="마지막 거래 일시")
+    tx_count = models.IntegerField(default=0, verbose_name="누적 거래 수")
+    amount_total = models.DecimalField(max_digits=20, decimal_places=2, default=0, verbose_name="누적 금액 합계")
+    chain_hash = models.CharField(max_length=64, verbose_name="누적 해시")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-last_timestamp', '-last_transaction_id']
+
+    def __str__(self):
+        return f"{self.organization.name} 정합성 체크포인트 ({self.tx_count}건)"
+
+# [New] 환율 (통화 1단위당 원화, 일별 종가)
+class FxRate(models.Model):
+    currency = models.CharField(max_length=3, verbose_name="통화")  # USD, JPY, HKD ...
+    date = models.DateField(verbose_name="기준 일자")
+    rate = models.DecimalField(max_digits=20, decimal_places=6, verbose_name="원화 환율")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('currency', 'date')
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.currency}/KRW {self.rate} ({self.date})"
+
+# [New] 상장 종목 마스터 (KRX 전 종목 + 미국 주요 거래소) - 종목 검색 자동완성용 로컬 인덱스 원본
+class SymbolMaster(models.Model):
+    symbol = models.CharField(max_length=20, unique=True, verbose_name="Yahoo 심볼")  # 005930.KS, AAPL, BRK-B
+    code = models.CharField(max_length=20, verbose_name="종목코드")  # 005930, AAPL
+    name = models.CharField(max_length=200, verbose_name="종목명")
+    exchange = models.CharField(max_length=20, verbose_name="거래소")  # KOSPI, KOSDAQ, KONEX, NASDAQ, NYSE ...
+    country = models.CharField(max_length=50, blank=True, default='', verbose_name="국가")
+    is_etf = models.BooleanField(default=False, verbose_name="ETF 여부")
+    is_active = models.BooleanField(default=True, verbose_name="상장 여부")  # 최근 목록에서 빠지면 False
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['symbol']
+
+    def __str__(self):
+        return f"{self.name} ({self.symbol}, {self.exchange})"
+
+# [New] 종목 시세 일괄 갱신 작업 (백그라운드 실행 + 진행률 조회)
+class StockRefreshJob(models.Model):
+    STATUS_CHOICES = [
+        ('pending', '대기중'),
+        ('running', '진행중'),
+        ('done', '완료'),
+        ('failed', '실패'),
+    ]
+
+    KIND_CHOICES = [
+        ('manual', '수동 갱신'),
+        ('quotes', '장중 시세 갱신'),
+        ('eod', '장 마감 갱신'),  # 종가 + 캔들
+        ('fundamentals', '기업정보 갱신'),
+    ]
+
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_refresh_jobs', verbose_name="요청자")
+    kind = models.CharField(max_length=12, choices=KIND_CHOICES, default='manual', verbose_name="종류")
+    market = models.CharField(max_length=10, blank=True, default='', verbose_name="시장")  # 스케줄 작업 대상 시장 (core.market_hours)
+    stock_ids = models.JSONField(default=list, blank=True, verbose_name="대상 종목 ID")  # 비어 있으면 전체 종목
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name="상태")
+    total = models.IntegerField(default=0, verbose_name="대상 종목 수")
+    processed = models.IntegerField(default=0, verbose_name="처리 수")
+    succeeded = models.IntegerField(default=0, verbose_name="성공 수")
+    failed = models.IntegerField(default=0, verbose_name="실패 수")
+    error = models.TextField(blank=True, default='', verbose_name="오류")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    @property
+    def progress(self):
+        return round(self.processed / self.total * 100, 1) if self.total else 0
+
+    def __str__(self):
+        return f"종목 갱신 #{self.id} {self.get_status_display()} ({self.processed}/{self.total})"
+
 # 13. 전략 (Strategy) - 백테스팅 및 실전 매매 로직 저장
 from django.core.exceptions import ValidationError
 from .utils_strategy import StrategyConfig # Import Pydantic model
@@ -0,0 +1,172 @@
+"""
+Shared HTTP client for scraping and public JSON endpoints (Naver Finance pages, Yahoo search).
+
+One keep-alive connection pool per process, default timeouts, retries with exponential backoff
+on connection errors and 429/5xx, a per-host concurrency limit and a per-host token bucket, so a
+full-universe refresh running on many threads is not throttled by the remote side.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from bs4 import BeautifulSoup
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = (3.05, 10)  # (connect, read) seconds
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+}
+
+# Concurrent requests per host (settings.STOCK_REFRESH_HOST_LIMITS overrides)
+DEFAULT_HOST_LIMITS = {'yahoo': 4, 'naver': 2}
+# (requests per second, burst) per host (settings.SCRAPING_RATE_LIMITS overrides)
+DEFAULT_RATE_LIMITS = {'yahoo': (10, 20), 'naver': (5, 10)}
+
+# Host suffix -> label used for the limits above
+HOSTS = [('naver.com', 'naver'), ('naver.net', 'naver'), ('yahoo.com', 'yahoo')]
+
+NAVER_ITEM_URL = "https://finance.naver.com/item/main.naver?code={code}"
+
+
+def host_label(url):
+    host = urlsplit(url).hostname or ''
+    return next((label for suffix, label in HOSTS if host.endswith(suffix)), host)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. acquire() reserves a token and sleeps until it is available,
+    so concurrent callers are spaced at `rate` per second after the initial burst.
+    """
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+_limits_lock = threading.Lock()
+_semaphores = {}
+_buckets = {}
+
+
+def _semaphore(host):
+    with _limits_lock:
+        if host not in _semaphores:
+            limits = {**DEFAULT_HOST_LIMITS, **getattr(settings, 'STOCK_REFRESH_HOST_LIMITS', {})}
+            _semaphores[host] = threading.BoundedSemaphore(limits.get(host, 4))
+        return _semaphores[host]
+
+
+def _bucket(host):
+    with _limits_lock:
+        if host not in _buckets:
+            limits = {**DEFAULT_RATE_LIMITS, **getattr(settings, 'SCRAPING_RATE_LIMITS', {})}
+            _buckets[host] = TokenBucket(*limits[host]) if host in limits else None
+        return _buckets[host]
+
+
+@contextmanager
+def host_slot(host):
+    """
+    with host_slot('naver'): ...  - waits until the host is under its concurrency limit.
+    Also used around yfinance calls, which manage their own HTTP session.
+    """
+    with _semaphore(host):
+        yield
+
+
+class ScrapingClient:
+    def __init__(self, pool_size=16, retries=3, backoff=0.5):
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,  # 0.5s, 1s, 2s ...
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(self, url, timeout=DEFAULT_TIMEOUT, **kwargs):
+        host = host_label(url)
+        with host_slot(host):
+            bucket = _bucket(host)
+            if bucket:
+                bucket.acquire()
+            return self.session.get(url, timeout=timeout, **kwargs)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ScrapingClient()
+    return _client
+
+
+def parse_naver_stock_page(html):
+    """
+    Naver 금융 종목 메인 페이지 -> {'name', 'market_cap', 'description'} (없으면 None)
+    """
+    data = {'name': None, 'market_cap': None, 'description': None}
+    soup = BeautifulSoup(html, 'html.parser')
+
+    name_tag = soup.select_one('.wrap_company h2 a')
+    if name_tag:
+        data['name'] = name_tag.text.strip()
+
+    # 시가총액: <em id="_market_sum">367조 1,416</em> (억 단위)
+    mkt_sum = soup.select_one('#_market_sum')
+    if mkt_sum:
+        txt = mkt_sum.text.strip().replace(',', '').replace('조', '').replace(' ', '')
+        try:
+            data['market_cap'] = int(txt) * 100000000
+        except ValueError:
+            pass
+
+    # 기업개요: <div class="summary_info"> <p> ... </p> </div>
+    summary = soup.select_one('.summary_info p')
+    if summary:
+        data['description'] = summary.text.strip()
+    return data
+
+
+def fetch_naver_stock_page(code):
+    """
+    Fetches the Naver Finance item page once and parses everything the app uses from it.
+    Returns the parse_naver_stock_page dict (all None on failure).
+    """
+    try:
+        res = get_client().get(NAVER_ITEM_URL.format(code=code))
+        res.raise_for_status()
+    except requests.RequestException as e:
+        logger.warning(f"Naver fetch failed ({code}): {e}")
+        return {'name': None, 'market_cap': None, 'description': None}
+    return parse_naver_stock_page(res.text)
@@ -1,13 +1,24 @@
+import logging
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction
 from django.utils import timezone
-from .models import Organization, Transaction, Stock
-from django.db.models import Sum
+from .models import Organization, Transaction, Stock, Position, AccountPosition, TaxLot, LotConsumption, Agent, UserFavorite
+from .services_ledger import LedgerService
+from .services_fx import FxService, currency_for, valuation
+from .cache import org_key, bump_version, SIDEBAR
+from django.db.models import Sum, Q, F, Max
+
+logger = logging.getLogger(__name__)
 
 class TransactionService:
     @staticmethod
-    def create_transaction(organization, transaction_type, amount, related_asset=None, quantity=0, price=0, profit=0, fee=0, tax=0, description="", account=None, timestamp=None, approval=None):
+    def create_transaction(organization, transaction_type, amount, related_asset=None, quantity=0, price=0, profit=0, fee=0, tax=0, description="", account=None, timestamp=None, approval=None, lot_ids=None):
         """
         Creates a Transaction record and updates the Organization's cash balance atomically.
+        lot_ids: (SELL only) specific TaxLots to consume instead of FIFO.
         """
         with transaction.atomic():
             # Refresh organization to prevent race conditions
@@ -18,9 +29,21 @@ class TransactionService:
             # e.g. Buy = negative amount, Sell = positive amount.
             org.cash_balance += amount
             org.save()
-            
+
+            # balance_after 는 (timestamp, id) 순 누적 잔액. 과거 시점 거래는 이후 거래들의 잔액을
+            # amount 만큼 옮기고, 직전 거래의 잔액에서 이어감
+            timestamp = timestamp if timestamp else timezone.now()
+            balance_after = org.cash_balance
+            later = Transaction.objects.filter(organization=org, timestamp__gt=timestamp)
+            if later.update(balance_after=F('balance_after') + amount):
+                previous = (
+                    Transaction.objects.filter(organization=org, timestamp__lte=timestamp)
+                    .order_by('-timestamp', '-id').values_list('balance_after', flat=True).first()
+                )
+                balance_after = (previous or 0) + amount
+
             # Create Transaction Record
-            new_tx = Transaction.objects.create(
+            new_tx = Transaction(
                 organization=org,
                 transaction_type=transaction_type,
                 amount=amount,
@@ -30,12 +53,15 @@ class TransactionService:
                 profit=profit,
                 fee=fee, # [K-IFRS]
                 tax=tax, # [K-IFRS]
-                balance_after=org.cash_balance,
+                balance_after=balance_after,
                 description=description,
-                timestamp=timestamp if timestamp else timezone.now(), # Use provided timestamp
+                timestamp=timestamp, # Use provided timestamp
                 account=account,
                 approval=approval # [New]
             )
+            # Read by the cost-basis signal when consuming lots
+            new_tx._lot_ids = lot_ids
+            new_tx.save()
             
             return new_tx
 
@@ -88,151 +114,547 @@ class TransactionService:
         )
 
     @staticmethod
-    def sell_stock(organization, stock, quantity, price, fee=0, tax=0, profit=0, description="Sell Stock", account=None, timestamp=None, approval=None): # [K-IFRS] fee, tax added
+    def sell_stock(organization, stock, quantity, price, fee=0, tax=0, profit=None, description="Sell Stock", account=None, timestamp=None, approval=None, lot_ids=None): # [K-IFRS] fee, tax added
         # Revenue = (Qty * Price) - Fee - Tax
         revenue_principal = quantity * price
         total_revenue = revenue_principal - fee - tax
-        
-        return TransactionService.create_transaction(
-            organization=organization,
-            transaction_type='SELL',
-            amount=total_revenue, # + (Revenue - Deductions)
-            related_asset=stock,
-            quantity=-quantity, # - (Asset decreases)
-            price=price,
-            profit=profit,
-            fee=fee,
-            tax=tax,
-            description=description,
-            account=account,
-            timestamp=timestamp,
-            approval=approval
+
+        with transaction.atomic():
+            # Serialize sells per organization so the lots priced here are the lots consumed
+            Organization.objects.select_for_update().get(id=organization.id)
+
+            # A backdated sell is priced by the replay its save triggers (average / open lots as of
+            # its timestamp), not against today's cost basis
+            backdated = bool(stock and timestamp and PositionService.is_backdated_at(organization.id, stock.id, timestamp))
+
+            # Realized Profit from the maintained cost-basis state (unless given explicitly)
+            if profit is None and not backdated:
+                if stock and (lot_ids or LotService.method() == 'fifo'):
+                    plan = LotService.plan(organization.id, stock.id, quantity, lot_ids=lot_ids)
+                    profit = LotService.realized_profit(plan, price)
+                else:
+                    profit = PositionService.realized_profit(organization, stock, quantity, price)
+            elif backdated:
+                profit = 0  # set by the replay below
+
+            new_tx = TransactionService.create_transaction(
+                organization=organization,
+                transaction_type='SELL',
+                amount=total_revenue, # + (Revenue - Deductions)
+                related_asset=stock,
+                quantity=-quantity, # - (Asset decreases)
+                price=price,
+                profit=profit,
+                fee=fee,
+                tax=tax,
+                description=description,
+                account=account,
+                timestamp=timestamp,
+                approval=approval,
+                lot_ids=lot_ids
+            )
+            if backdated:
+                new_tx.refresh_from_db(fields=['profit'])
+            return new_tx
+
+class PositionService:
+    """
+    Maintains Position (per-stock moving-average cost basis) incrementally.
+    Each BUY/SELL updates a single row, so realized profit never rescans past trades.
+    """
+    @staticmethod
+    def realized_profit(organization, stock, quantity, price):
+        """
+        Realized profit of selling `quantity` at `price`, against the current average cost.
+        """
+        if not stock:
+            return 0
+        position = Position.objects.filter(organization=organization, stock=stock).first()
+        if not position or position.quantity <= 0:
+            return 0
+        return (Decimal(str(price)) - position.avg_price) * quantity
+
+    @staticmethod
+    def _apply(position, tx, cost_removed=None):
+        # Values of a freshly created instance may still be float/int
+        amount = Decimal(str(tx.amount or 0))
+        fee = Decimal(str(tx.fee or 0))
+        profit = Decimal(str(tx.profit or 0))
+
+        if tx.transaction_type == 'BUY':
+            # Principal only (fee excluded), same as the portfolio weighted average
+            position.quantity += tx.quantity
+            position.total_cost += abs(amount) - fee
+        elif tx.transaction_type == 'SELL':
+            qty_sold = abs(tx.quantity)
+            if cost_removed is None:
+                cost_removed = qty_sold * position.avg_price
+            position.quantity -= qty_sold
+            position.total_cost -= cost_removed
+            position.realized_pl += profit
+
+        if position.quantity <= 0:
+            position.quantity = max(position.quantity, 0)
+            position.total_cost = 0
+        position.last_applied_at = tx.timestamp
+
+    @staticmethod
+    def is_backdated(tx):
+        """
+        True when `tx` is earlier than the last trade already applied to its Position.
+        Cost basis depends on trade order, so such a trade has to be replayed (rebuild), not appended.
+        """
+        return PositionService.is_backdated_at(tx.organization_id, tx.related_asset_id, tx.timestamp)
+
+    @staticmethod
+    def is_backdated_at(organization_id, stock_id, timestamp):
+        return Position.objects.filter(
+            organization_id=organization_id, stock_id=stock_id, last_applied_at__gt=timestamp
+        ).exists()
+
+    @staticmethod
+    def apply_transaction(tx, cost_removed=None):
+        """
+        O(1) update of the Position affected by a newly created transaction.
+        cost_removed: cost of the lots consumed by a SELL (lot-based methods).
+        """
+        if not tx.related_asset_id or tx.transaction_type not in ('BUY', 'SELL'):
+            return None
+        with transaction.atomic():
+            position, _ = Position.objects.select_for_update().get_or_create(
+                organization_id=tx.organization_id,
+                stock_id=tx.related_asset_id
+            )
+            PositionService._apply(position, tx, cost_removed=cost_removed)
+            position.save()
+            return position
+
+    @staticmethod
+    def rebuild(organization_id, stock_id, lot_results=None):
+        """
+        Replays one stock's ledger to rebuild its Position.
+        Only needed after edits/deletes of past transactions and for backdated trades.
+
+        Every SELL is re-priced at its place in the replay, the same way sell_stock prices a new one:
+        by its consumed lots (FIFO method or specific lots) or else by the average cost just before it.
+        Changed profits are written back to Transaction.profit, so the ledger, Position.realized_pl
+        and the lot records agree. lot_results: {sell_id: (realized_pl, specific)} from
+        LotService.refresh (read from LotConsumption when omitted).
+        """
+        if not organization_id or not stock_id:
+            return None
+        if lot_results is None:
+            lot_results = LotService.sell_results(organization_id, stock_id)
+        lot_based = LotService.method() == 'fifo'
+        with transaction.atomic():
+            position, _ = Position.objects.select_for_update().get_or_create(
+                organization_id=organization_id,
+                stock_id=stock_id
+            )
+            position.quantity = 0
+            position.total_cost = 0
+            position.realized_pl = 0
+            position.last_applied_at = None
+
+            txs = Transaction.objects.filter(
+                organization_id=organization_id,
+                related_asset_id=stock_id,
+                transaction_type__in=['BUY', 'SELL']
+            ).order_by('timestamp', 'id')
+            repriced = []
+            for tx in txs:
+                if tx.transaction_type == 'SELL':
+                    qty_sold = abs(tx.quantity)
+                    lot_pl, specific = lot_results.get(tx.id, (Decimal(0), False))
+                    if lot_based or specific:
+                        profit = lot_pl
+                    elif position.quantity > 0:
+                        profit = (Decimal(str(tx.price or 0)) - position.avg_price) * qty_sold
+                    else:
+                        profit = Decimal(0)
+                    if Decimal(str(tx.profit or 0)) != profit:
+                        tx.profit = profit
+                        repriced.append(tx)
+                PositionService._apply(position, tx)
+
+            if repriced:
+                Transaction.objects.bulk_update(repriced, ['profit'], batch_size=500)
+                # 실현손익이 바뀐 매도 이후의 원장 체크포인트는 무효
+                LedgerService.invalidate_checkpoints(organization_id, min(tx.timestamp for tx in repriced))
+
+            # Lot-based cost: remaining cost is exactly what the open lots still hold
+            if LotService.method() == 'fifo' and position.quantity > 0:
+                position.total_cost = TaxLot.objects.filter(
+                    organization_id=organization_id, stock_id=stock_id, is_open=True
+                ).aggregate(total=Sum(F('remaining_quantity') * F('unit_cost')))['total'] or 0
+
+            position.save()
+            return position
+
+class AccountPositionService:
+    """
+    Maintains AccountPosition (per-account, per-stock weighted-average holdings) incrementally,
+    so the account screen reads one table instead of replaying each account's ledger.
+    """
+    @staticmethod
+    def _apply(position, tx):
+        amount = Decimal(str(tx.amount or 0))
+        fee = Decimal(str(tx.fee or 0))
+
+        if tx.transaction_type == 'BUY':
+            position.quantity += tx.quantity
+            position.total_cost += abs(amount) - fee
+        elif tx.transaction_type == 'SELL':
+            qty_sold = abs(tx.quantity)
+            position.total_cost -= qty_sold * position.avg_price
+            position.quantity -= qty_sold
+
+        if position.quantity <= 0:
+            position.quantity = max(position.quantity, 0)
+            position.total_cost = 0
+        position.last_traded_at = tx.timestamp
+
+    @staticmethod
+    def apply_transaction(tx):
+        """
+        O(1) update of the row affected by a newly created BUY/SELL.
+        """
+        if not tx.account_id or not tx.related_asset_id or tx.transaction_type not in ('BUY', 'SELL'):
+            return None
+        with transaction.atomic():
+            position, _ = AccountPosition.objects.select_for_update().get_or_create(
+                account_id=tx.account_id,
+                stock_id=tx.related_asset_id,
+                defaults={'organization_id': tx.organization_id}
+            )
+            AccountPositionService._apply(position, tx)
+            position.save()
+            return position
+
+    @staticmethod
+    def rebuild(organization_id, stock_id):
+        """
+        Replays one stock's ledger for every account of the organization.
+        Only needed after edits/deletes (an edit may also move a trade between accounts).
+        """
+        if not organization_id or not stock_id:
+            return
+        with transaction.atomic():
+            existing = {
+                p.account_id: p for p in AccountPosition.objects.select_for_update().filter(
+                    organization_id=organization_id, stock_id=stock_id
+                )
+            }
+            for position in existing.values():
+                position.quantity = 0
+                position.total_cost = 0
+                position.last_traded_at = None
+
+            txs = Transaction.objects.filter(
+                organization_id=organization_id,
+                related_asset_id=stock_id,
+                account__isnull=False,
+                transaction_type__in=['BUY', 'SELL']
+            ).order_by('timestamp', 'id')
+            for tx in txs:
+                if tx.account_id not in existing:
+                    existing[tx.account_id] = AccountPosition(
+                        organization_id=organization_id, account_id=tx.account_id, stock_id=stock_id
+                    )
+                AccountPositionService._apply(existing[tx.account_id], tx)
+
+            for position in existing.values():
+                position.save()
+
+    @staticmethod
+    def get_portfolios(organization, account=None):
+        """
+        {account_id: [holding, ...]} for every account (or only `account`) in one query.
+        Holdings have the same keys as FinancialService.get_portfolio_data.
+        """
+        positions = AccountPosition.objects.filter(
+            organization=organization, quantity__gt=0
+        ).select_related('stock').order_by('account_id', 'stock__name')
+        if account:
+            positions = positions.filter(account=account)
+        positions = list(positions)
+
+        currencies = {p.stock_id: currency_for(p.stock.country) for p in positions}
+        krw_prices = FxService.to_krw({p.stock_id: p.stock.current_price for p in positions}, currencies)
+
+        portfolios = {}
+        for p in positions:
+            eval_amount, yield_pct = valuation(krw_prices[p.stock_id], p.quantity, p.total_cost)
+            portfolios.setdefault(p.account_id, []).append({
+                'stock': p.stock,
+                'stock_name': p.stock.name,
+                'stock_code': p.stock.code,
+                'quantity': p.quantity,
+                'total_amount': p.total_cost,
+                'avg_price': p.avg_price,
+                'current_price': p.stock.current_price or 0,
+                'currency': currencies[p.stock_id],
+                'eval_amount': eval_amount,
+                'yield': yield_pct,
+                'approved_at': p.last_traded_at,
+            })
+        return portfolios
+
+class LotService:
+    """
+    Tax-lot cost basis. Every BUY opens a TaxLot and every SELL consumes open lots,
+    oldest first (FIFO) or by specific lot ids. Open lots are looked up through the
+    (organization, stock, is_open, opened_at) index, so a sell only reads the lots it consumes.
+    The weighted-average method (settings.COST_BASIS_METHOD = 'average') stays the default;
+    lots are still tracked so the method can be switched and lots shown either way.
+    """
+    @staticmethod
+    def method():
+        return getattr(settings, 'COST_BASIS_METHOD', 'average')
+
+    @staticmethod
+    def plan(organization_id, stock_id, quantity, lot_ids=None, lock=False):
+        """
+        Returns [(lot, qty)] to consume when selling `quantity` shares now, from the currently
+        open lots. Specific lots are used first; any shortfall falls back to FIFO.
+        A backdated sell is not planned here: refresh() replays it against the lots open at its timestamp.
+        """
+        open_lots = TaxLot.objects.filter(organization_id=organization_id, stock_id=stock_id, is_open=True)
+        if lock:
+            open_lots = open_lots.select_for_update()
+
+        plan = []
+        remaining = quantity
+        used_ids = set()
+
+        sources = []
+        if lot_ids:
+            sources.append(open_lots.filter(id__in=lot_ids).order_by('opened_at', 'id'))
+        sources.append(open_lots.order_by('opened_at', 'id'))
+
+        for qs in sources:
+            for lot in qs.iterator(chunk_size=20):
+                if remaining <= 0:
+                    break
+                if lot.id in used_ids:
+                    continue
+                take = min(lot.remaining_quantity, remaining)
+                if take > 0:
+                    plan.append((lot, take))
+                    used_ids.add(lot.id)
+                    remaining -= take
+            if remaining <= 0:
+                break
+        return plan
+
+    @staticmethod
+    def realized_profit(plan, price):
+        price = Decimal(str(price))
+        return sum(((price - lot.unit_cost) * qty for lot, qty in plan), Decimal(0))
+
+    @staticmethod
+    def open_lot(tx):
+        amount = Decimal(str(tx.amount or 0))
+        fee = Decimal(str(tx.fee or 0))
+        principal = abs(amount) - fee
+        return TaxLot.objects.create(
+            organization_id=tx.organization_id,
+            stock_id=tx.related_asset_id,
+            account_id=tx.account_id,
+            buy_transaction=tx,
+            opened_at=tx.timestamp,
+            quantity=tx.quantity,
+            remaining_quantity=tx.quantity,
+            unit_cost=principal / tx.quantity,
+            is_open=True
         )
 
-class FinancialService:
     @staticmethod
-    def calculate_financials(organization):
+    def consume(tx, lot_ids=None):
         """
-        Calculates current financial statements based on the Transaction ledger.
-        Returns a dictionary.
+        Consumes lots for a SELL transaction and records LotConsumption rows.
+        Returns the total cost of the consumed lots.
         """
-        # 1. Cash (Source of Truth: Transaction Ledger)
-        # We calculate cash strictly from transactions to ensure integrity.
-        cash_aggregation = Transaction.objects.filter(organization=organization).aggregate(Sum('amount'))
-        cash = cash_aggregation['amount__sum'] or 0
+        plan = LotService.plan(tx.organization_id, tx.related_asset_id, abs(tx.quantity), lot_ids=lot_ids, lock=True)
+        price = Decimal(str(tx.price or 0))
 
-        # 2. Stock Holdings & Value
-        holdings = {} # {stock_id: quantity}
-        txs = Transaction.objects.filter(organization=organization)
-        
-        # Aggregates for K-IFRS
-        total_buy_cost = 0 
-        total_sell_revenue = 0
-        total_realized_profit = 0
-        
-        total_deposit = 0
-        total_withdraw = 0
-        total_fees = 0
-        total_taxes = 0
+        total_cost = Decimal(0)
+        consumptions = []
+        for lot, qty in plan:
+            cost = lot.unit_cost * qty
+            proceeds = price * qty
+            consumptions.append(LotConsumption(
+                sell_transaction=tx,
+                lot=lot,
+                quantity=qty,
+                cost=cost,
+                proceeds=proceeds,
+                realized_pl=proceeds - cost,
+                specific=bool(lot_ids) and lot.id in lot_ids
+            ))
+            lot.remaining_quantity -= qty
+            lot.is_open = lot.remaining_quantity > 0
+            total_cost += cost
 
-        for tx in txs:
-             if tx.related_asset:
-                 sid = tx.related_asset.id
-                 holdings[sid] = holdings.get(sid, 0) + tx.quantity
-             
-             # Fee & Tax Accumulation (All transaction types)
-             total_fees += tx.fee
-             total_taxes += tx.tax
-
-             if tx.transaction_type == 'BUY':
-                 # Amount is negative for BUY. Principal part is abs(amount) - fee.
-                 principal = abs(tx.amount) - tx.fee
-                 total_buy_cost += principal
-             
-             elif tx.transaction_type == 'SELL':
-                 # Amount is positive. Revenue principal = amount + fee + tax
-                 principal = tx.amount + tx.fee + tx.tax
-                 total_sell_revenue += principal
-                 total_realized_profit += tx.profit
-                 
-             elif tx.transaction_type == 'DEPOSIT':
-                 total_deposit += tx.amount
-             elif tx.transaction_type == 'WITHDRAW':
-                 total_withdraw += abs(tx.amount)
-        
-        total_stock_value = 0
-        for sid, qty in holdings.items():
-            if qty > 0:
-                try:
-                    stock = Stock.objects.get(id=sid)
-                    price = stock.current_price if stock.current_price else 0
-                    total_stock_value += qty * price
-                except Stock.DoesNotExist:
+        TaxLot.objects.bulk_update([lot for lot, _ in plan], ['remaining_quantity', 'is_open'])
+        LotConsumption.objects.bulk_create(consumptions)
+        return total_cost
+
+    @staticmethod
+    def apply_transaction(tx):
+        """
+        Opens/consumes lots for a newly created transaction.
+        Returns the consumed lot cost for SELLs priced by lots, otherwise None.
+        """
+        if not tx.related_asset_id:
+            return None
+        lot_ids = getattr(tx, '_lot_ids', None)
+        if tx.transaction_type == 'BUY' and tx.quantity > 0:
+            LotService.open_lot(tx)
+        elif tx.transaction_type == 'SELL':
+            consumed_cost = LotService.consume(tx, lot_ids=lot_ids)
+            if lot_ids or LotService.method() == 'fifo':
+                return consumed_cost
+        return None
+
+    @staticmethod
+    def sell_results(organization_id, stock_id):
+        """
+        {sell_id: (realized_pl, specific)} from the stored consumptions of one stock.
+        """
+        rows = LotConsumption.objects.filter(
+            lot__organization_id=organization_id, lot__stock_id=stock_id
+        ).values('sell_transaction_id').annotate(pl=Sum('realized_pl'), specific=Max('specific'))
+        return {r['sell_transaction_id']: (r['pl'], bool(r['specific'])) for r in rows}
+
+    @staticmethod
+    def refresh(organization_id, stock_id, lot_ids=None):
+        """
+        Replays one stock's BUY/SELL rows in (timestamp, id) order and rewrites its lots and
+        consumption records. Needed after edits/deletes of past trades (a SELL whose quantity or
+        price changed consumes different lots) and for backdated trades, which thereby consume
+        the lots open at their own timestamp.
+        Lots a SELL picked explicitly (specific-ID) are consumed first again, the rest is FIFO as in plan().
+        lot_ids: {sell_id: [lot ids]} for sells that have no consumption rows yet (just created).
+        Returns {sell_id: (realized_pl, specific)} for PositionService.rebuild.
+        """
+        with transaction.atomic():
+            lots = {
+                lot.buy_transaction_id: lot
+                for lot in TaxLot.objects.select_for_update().filter(organization_id=organization_id, stock_id=stock_id)
+            }
+            txs = list(Transaction.objects.filter(
+                organization_id=organization_id, related_asset_id=stock_id, transaction_type__in=['BUY', 'SELL']
+            ).order_by('timestamp', 'id'))
+            preferred = {}
+            for sell_id, lot_id in LotConsumption.objects.filter(
+                lot__organization_id=organization_id, lot__stock_id=stock_id,
+                specific=True
+            ).order_by('id').values_list('sell_transaction_id', 'lot_id'):
+                preferred.setdefault(sell_id, []).append(lot_id)
+            for sell_id, ids in (lot_ids or {}).items():
+                preferred.setdefault(sell_id, []).extend(ids or [])
+            LotConsumption.objects.filter(lot__organization_id=organization_id, lot__stock_id=stock_id).delete()
+
+            open_lots = []  # opened order == FIFO order
+            replayed = []
+            consumptions = []
+            results = {}
+            for tx in txs:
+                if tx.transaction_type == 'BUY':
+                    if tx.quantity <= 0:
+                        continue
+                    lot = lots.get(tx.id) or TaxLot(
+                        organization_id=organization_id, stock_id=stock_id, buy_transaction=tx
+                    )
+                    lot.account_id = tx.account_id
+                    lot.opened_at = tx.timestamp
+                    lot.quantity = lot.remaining_quantity = tx.quantity
+                    lot.unit_cost = (abs(Decimal(str(tx.amount))) - Decimal(str(tx.fee or 0))) / tx.quantity
+                    if lot.pk is None:
+                        lot.save()  # backdated BUY that never opened a lot
+                    replayed.append(lot)
+                    open_lots.append(lot)
                     continue
 
-        # 3. Income Statement (First, to get Net Income)
-        # Cost of Goods Sold (approx) = Revenue - Realized Profit
-        # Note: This implies 'profit' on transaction was calculated correctly (Revenue - Cost Basis).
-        cogs = total_sell_revenue - total_realized_profit
-        
-        # Remaining Cost Basis = Total Buy Cost - COGS
-        remaining_cost_basis = total_buy_cost - cogs
-        
-        # Unrealized P/L = Current Value - Remaining Cost Basis
-        unrealized_pl = total_stock_value - remaining_cost_basis
-        
-        realized_pl = total_realized_profit
-        
-        # [K-IFRS Logic]
-        # Net Income (Performance) = (Realized + Unrealized) - (Fees + Taxes)
-        gross_profit = realized_pl + unrealized_pl
-        raw_net_income = gross_profit - total_fees - total_taxes
+                remaining = abs(tx.quantity)
+                price = Decimal(str(tx.price or 0))
+                first = set(preferred.get(tx.id, ()))
+                realized = Decimal(0)
+                for lot in sorted(open_lots, key=lambda l: l.id not in first):
+                    if remaining <= 0:
+                        break
+                    take = min(lot.remaining_quantity, remaining)
+                    if take <= 0:
+                        continue
+                    cost, proceeds = lot.unit_cost * take, price * take
+                    consumptions.append(LotConsumption(
+                        sell_transaction=tx, lot=lot, quantity=take,
+                        cost=cost, proceeds=proceeds, realized_pl=proceeds - cost, specific=lot.id in first
+                    ))
+                    lot.remaining_quantity -= take
+                    remaining -= take
+                    realized += proceeds - cost
+                results[tx.id] = (realized, bool(first))
+                open_lots = [lot for lot in open_lots if lot.remaining_quantity > 0]
 
-        # 4. K-IFRS Balance Sheet
-        
-        # Priority Logic: 
-        # 1. Withdrawals are taken from Retained Earnings (if positive).
-        # 2. Remaining Withdrawals are taken from Capital Stock.
-        
-        remaining_withdrawals = total_withdraw
-        
-        # Calculate Retained Earnings (Bucket available for withdrawal)
-        # We start with the full Net Income.
-        if raw_net_income > 0:
-            deduction_from_re = min(raw_net_income, remaining_withdrawals)
-            final_retained_earnings = raw_net_income - deduction_from_re
-            remaining_withdrawals -= deduction_from_re
-        else:
-            final_retained_earnings = raw_net_income
-            # If Net Income is negative, we don't increase the loss with withdrawals.
-            # All withdrawals must come from Capital.
-        
-        # Calculate Capital Stock
-        # Capital Stock = Total Deposits - (Allocated Withdrawals)
-        final_capital_stock = total_deposit - remaining_withdrawals
-        
-        # Total Equity Check
-        total_assets = cash + total_stock_value
-        total_liabilities = 0 
-        total_equity = total_assets - total_liabilities
+            for lot in replayed:
+                lot.is_open = lot.remaining_quantity > 0
+            TaxLot.objects.bulk_update(
+                replayed, ['account', 'opened_at', 'quantity', 'remaining_quantity', 'unit_cost', 'is_open'], batch_size=500
+            )
+            # Lots whose BUY no longer opens one (quantity edited to 0)
+            TaxLot.objects.filter(organization_id=organization_id, stock_id=stock_id).exclude(
+                id__in=[lot.id for lot in replayed]
+            ).delete()
+            LotConsumption.objects.bulk_create(consumptions, batch_size=500)
+            return results
 
-        return {
-            'date': timezone.now().date(),
-            'total_cash': cash,
-            'total_stock_value': total_stock_value,
-            'total_assets': total_assets,
-            'total_liabilities': total_liabilities,
-            'total_equity': total_equity,
-            
-            'capital_stock': final_capital_stock,
-            'retained_earnings': final_retained_earnings,
-            
-            'realized_pl': realized_pl,
-            'unrealized_pl': unrealized_pl,
-            'total_fees': total_fees,
-            'total_taxes': total_taxes,
-            'net_income': raw_net_income # Income Statement shows 'Performance' regardless of withdrawals
-        }
+    @staticmethod
+    def get_open_lots(organization, stock_ids=None, account=None):
+        """
+        Open lots with per-lot unrealized P/L, grouped by stock id.
+        """
+        lots = TaxLot.objects.filter(organization=organization, is_open=True).select_related('stock')
+        if stock_ids is not None:
+            lots = lots.filter(stock_id__in=stock_ids)
+        if account:
+            lots = lots.filter(account=account)
+
+        lots = list(lots.order_by('opened_at', 'id'))
+        krw_prices = FxService.to_krw(
+            {lot.stock_id: lot.stock.current_price for lot in lots},
+            {lot.stock_id: currency_for(lot.stock.country) for lot in lots}
+        )
+
+        lot_map = {}
+        for lot in lots:
+            cost = lot.unit_cost * lot.remaining_quantity
+            eval_amount, yield_pct = valuation(krw_prices[lot.stock_id], lot.remaining_quantity, cost)
+            lot_map.setdefault(lot.stock_id, []).append({
+                'id': lot.id,
+                'opened_at': lot.opened_at,
+                'quantity': lot.quantity,
+                'remaining_quantity': lot.remaining_quantity,
+                'unit_cost': lot.unit_cost,
+                'cost': cost,
+                'eval_amount': eval_amount,
+                'unrealized_pl': eval_amount - cost if eval_amount is not None else None,
+                'yield': yield_pct,
+            })
+        return lot_map
+
+class FinancialService:
+    @staticmethod
+    def calculate_financials(organization):
+        """
+        Calculates current financial statements based on the Transaction ledger.
+        Returns a dictionary.
+        Starts from the latest LedgerCheckpoint and applies only newer transactions.
+        """
+        state = LedgerService.state_as_of(organization)
+        prices = LedgerService.current_prices(state.held_stock_ids())
+        return state.financials(prices, timezone.now().date())
 
     @staticmethod
     def get_portfolio_data(organization, account=None):
@@ -250,7 +672,8 @@ class FinancialService:
         if account:
             txs = txs.filter(account=account)
             
-        txs = txs.select_related('related_asset').order_by('timestamp')
+        # 평균단가 재생은 종목 내 순서만 필요 -> (종목, 일시) 순으로 읽어 인덱스 정렬 사용
+        txs = txs.select_related('related_asset').order_by('related_asset', 'timestamp')
 
         for tx in txs:
             sid = tx.related_asset.id
@@ -297,26 +720,186 @@ class FinancialService:
                 cost_removed = qty_sold * p['avg_price']
                 p['total_amount'] -= cost_removed
 
+        # Current prices in KRW (one FX lookup per currency)
+        held = {sid: p['stock'] for sid, p in portfolio_map.items() if p['quantity'] > 0}
+        currencies = {sid: currency_for(stock.country) for sid, stock in held.items()}
+        krw_prices = FxService.to_krw({sid: stock.current_price for sid, stock in held.items()}, currencies)
+
         # Convert to list and filter zero holdings
         portfolio_list = []
         for sid, p in portfolio_map.items():
             if p['quantity'] > 0:
                 stock = p['stock']
-                # Fetch Current Price
-                cur_price = stock.current_price
-                if not cur_price:
-                        cur_price = 0
-                
-                p['current_price'] = cur_price
-                p['eval_amount'] = cur_price * p['quantity']
-                # Adding formatted currency for display if needed purely in backend, but keep raw for template template tags
-                
-                # Yield
-                if p['total_amount'] > 0:
-                        p['yield'] = ((p['eval_amount'] - p['total_amount']) / p['total_amount']) * 100
-                else:
-                        p['yield'] = 0
-                        
+                # Current price stays in the listing currency; valuation is in KRW
+                p['current_price'] = stock.current_price or 0
+                p['currency'] = currencies[sid]
+                # Eval amount / yield (None when the currency has no FX rate)
+                p['eval_amount'], p['yield'] = valuation(krw_prices[sid], p['quantity'], p['total_amount'])
+
                 portfolio_list.append(p)
+
+        # Same order as AccountPositionService.get_portfolios
+        portfolio_list.sort(key=lambda p: p['stock_name'])
+
+        # Per-lot breakdown (open lots only, one query)
+        lot_map = LotService.get_open_lots(organization, stock_ids=[p['stock'].id for p in portfolio_list], account=account)
+        for p in portfolio_list:
+            p['lots'] = lot_map.get(p['stock'].id, [])
         
         return portfolio_list
+
+    @staticmethod
+    def get_ledger_page(organization, date=None, before=None, after=None, page_size=15):
+        """
+        Returns one page of the cash ledger (newest first) with running balances.
+
+        Pages are addressed by keyset cursors (transaction ids) instead of offsets, so only the
+        rows of the requested page are loaded. The balance below the page comes from one Sum of
+        the older rows (none on the last page of an unfiltered ledger) and is carried through
+        the page in Python, oldest first.
+        - before: show rows older than this transaction id (next page)
+        - after: show rows newer than this transaction id (previous page)
+        """
+        ledger = Transaction.objects.filter(organization=organization)
+        base = ledger
+
+        # Single-day view: the balance carried from earlier days is part of the opening Sum below
+        if date:
+            day_start = timezone.make_aware(datetime.combine(date, time.min))
+            day_end = day_start + timedelta(days=1)
+            base = base.filter(timestamp__gte=day_start, timestamp__lt=day_end)
+
+        def newer_than(ts, pk):
+            return Q(timestamp__gt=ts) | Q(timestamp=ts, id__gt=pk)
+
+        def older_than(ts, pk):
+            return Q(timestamp__lt=ts) | Q(timestamp=ts, id__lt=pk)
+
+        # Restrict to rows at or below the page's upper bound
+        page_qs = base
+        if before:
+            cursor = base.filter(id=before).values('timestamp', 'id').first()
+            if cursor:
+                page_qs = page_qs.filter(older_than(cursor['timestamp'], cursor['id']))
+        elif after:
+            cursor = base.filter(id=after).values('timestamp', 'id').first()
+            if cursor:
+                newer = base.filter(newer_than(cursor['timestamp'], cursor['id'])).order_by('timestamp', 'id')
+                window_keys = list(newer.values('timestamp', 'id')[:page_size])
+                if window_keys:
+                    upper = window_keys[-1]
+                    page_qs = page_qs.exclude(newer_than(upper['timestamp'], upper['id']))
+
+        rows = list(page_qs.select_related('related_asset').order_by('-timestamp', '-id')[:page_size + 1])
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+
+        if rows:
+            oldest = rows[-1]
+            balance = 0
+            if has_next or date:
+                balance = ledger.filter(older_than(oldest.timestamp, oldest.id)).aggregate(Sum('amount'))['amount__sum'] or 0
+            for tx in reversed(rows):
+                balance += tx.amount
+                tx.dynamic_balance = balance
+
+        has_previous = False
+        if rows:
+            has_previous = base.filter(newer_than(rows[0].timestamp, rows[0].id)).exists()
+
+        return {
+            'transactions': rows,
+            'has_next': has_next,
+            'has_previous': has_previous,
+            'next_cursor': rows[-1].id if (rows and has_next) else None,
+            'previous_cursor': rows[0].id if (rows and has_previous) else None,
+        }
+
+
+class SidebarService:
+    """
+    사이드바 데이터 캐시: AI 직원 목록은 조직별(core.cache SIDEBAR 버전), 즐겨찾기는 사용자별로 캐시합니다.
+    Agent / Department / UserFavorite 저장·삭제 시그널에서 무효화됩니다.
+    """
+    CACHE_TIMEOUT = 60 * 60
+
+    @staticmethod
+    def _favorites_key(user_id):
+        return f"sidebar:favorites:{user_id}"
+
+    @staticmethod
+    def get_agents(organization_id):
+        key = org_key(organization_id, 'agents', scope=SIDEBAR)
+        agents = cache.get(key)
+        if agents is None:
+            # 템플릿에서 agent.department_obj.name 을 쓰므로 함께 캐시
+            agents = list(Agent.objects.filter(organization_id=organization_id).select_related('department_obj'))
+            cache.set(key, agents, SidebarService.CACHE_TIMEOUT)
+        return agents
+
+    @staticmethod
+    def get_favorites(user_id):
+        key = SidebarService._favorites_key(user_id)
+        favorites = cache.get(key)
+        if favorites is None:
+            favorites = list(UserFavorite.objects.filter(user_id=user_id).order_by('display_order', 'id'))
+            cache.set(key, favorites, SidebarService.CACHE_TIMEOUT)
+        return favorites
+
+    @staticmethod
+    def invalidate_agents(organization_id):
+        bump_version(organization_id, scope=SIDEBAR)
+
+    @staticmethod
+    def invalidate_favorites(user_id):
+        cache.delete(SidebarService._favorites_key(user_id))
+
+
+class QuoteService:
+    """
+    Stale-while-revalidate for stored quotes: callers always get the stored Stock row immediately;
+    when it is older than its market-hours TTL (core.market_hours) a background refresh is queued,
+    at most one per stock at a time.
+    """
+    REFRESH_LOCK_TIMEOUT = 120
+
+    @staticmethod
+    def _lock_key(stock_id):
+        return f"quote:refreshing:{stock_id}"
+
+    @staticmethod
+    def is_stale(stock, at=None):
+        from .market_hours import is_quote_stale
+        return is_quote_stale(stock, stock.quote_updated_at, at)
+
+    @staticmethod
+    def schedule_refresh(stock):
+        """
+        Queues refresh_stock_quote unless one is already in flight. Returns True if a refresh is pending.
+        Publishing happens on a daemon thread so the request never waits on the broker.
+        """
+        if not QuoteService.acquire(stock.id):
+            return True
+        import threading
+        threading.Thread(target=QuoteService._dispatch, args=(stock.id, stock.code), daemon=True).start()
+        return True
+
+    @staticmethod
+    def _dispatch(stock_id, code):
+        try:
+            from .tasks import refresh_stock_quote
+            refresh_stock_quote.apply_async((stock_id,), retry=False)
+        except Exception as e:
+            logger.warning(f"Quote refresh dispatch failed for {code}: {e}")
+            QuoteService.release(stock_id)
+
+    @staticmethod
+    def acquire(stock_id):
+        """
+        Takes the per-stock refresh lock; False when a refresh is already in flight.
+        """
+        return cache.add(QuoteService._lock_key(stock_id), 1, QuoteService.REFRESH_LOCK_TIMEOUT)
+
+    @staticmethod
+    def release(stock_id):
+        cache.delete(QuoteService._lock_key(stock_id))
@@ -9,26 +9,57 @@ from django.utils import timezone
 # Configure Logger
 logger = logging.getLogger(__name__)
 
+# period 문자열 -> 기간 (yfinance period 표기)
+PERIOD_DAYS = {'d': 1, 'wk': 7, 'mo': 31, 'y': 366}
+
+
+def period_start(period: str) -> Optional[datetime]:
+    """
+    "1y" / "6mo" / "30d" -> start datetime (None for "max" or unknown formats).
+    """
+    for unit, days in PERIOD_DAYS.items():
+        if period.endswith(unit) and period[:-len(unit)].isdigit():
+            return timezone.now() - timedelta(days=int(period[:-len(unit)]) * days)
+    return None
+
+
 class MarketDataService:
+    @staticmethod
+    def stock_for(ticker: str):
+        from .models import Stock
+        code = ticker.split('.')[0] if ticker.endswith(('.KS', '.KQ')) else ticker
+        return Stock.objects.filter(code=code).first()
+
     @staticmethod
     def fetch_ohlcv(ticker: str, period: str = "1y", interval: str = "1d") -> pd.DataFrame:
         """
-        Fetches OHLCV data using yfinance.
+        Daily OHLCV for `ticker`. Read from the Candle table when the stored bars cover the
+        period and are current; otherwise downloaded with yfinance and upserted for next time.
         """
+        from .services_candles import CandleService
+
+        stock = MarketDataService.stock_for(ticker)
+        start = period_start(period)
+        if stock and start:
+            first, last = CandleService.coverage(stock.id, interval)
+            # 주말/휴장 여유: 시작은 7일, 마지막 봉은 4일 이내면 저장분 사용
+            if first and first <= start + timedelta(days=7) and last >= timezone.now() - timedelta(days=4):
+                return CandleService.dataframe(stock.id, interval, start=start)
+
         try:
             # yfinance download
-            df = yf.download(ticker, period=period, interval=interval, progress=False, multi_level_index=False)
+            # Candle 과 같은 기준 (수정주가 미적용, 'Adj Close' 열은 별도로 포함)
+            df = yf.download(ticker, period=period, interval=interval, auto_adjust=False, progress=False, multi_level_index=False)
             if df.empty:
                 raise ValueError(f"No data found for {ticker}")
-            
-            # Ensure standard column names
-            # yfinance usually returns: Open, High, Low, Close, Adj Close, Volume
-            # Verify and rename if needed
-            return df
         except Exception as e:
             logger.error(f"Error fetching data for {ticker}: {e}")
             raise
 
+        if stock:
+            CandleService.upsert({stock.id: CandleService.rows_from_history(df)}, interval, only_new=False)
+        return df
+
 class TechnicalAnalysis:
     @staticmethod
     def add_indicators(df: pd.DataFrame, indicators: List[Dict]) -> pd.DataFrame:
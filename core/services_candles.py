@@ -0,0 +1,223 @@
+import logging
+import math
+from datetime import timedelta, timezone as dt_timezone
+
+import pandas as pd
+from django.db.models import Max, Min
+from django.utils import timezone
+from .cache import CANDLES, bump_version, get_or_set, org_key
+from .models import Candle
+
+logger = logging.getLogger(__name__)
+
+CANDLE_FIELDS = ['open', 'high', 'low', 'close', 'volume']
+
+# Default chart window per interval (the old candle_data blob held 3y of weekly bars)
+CHART_WINDOWS = {'1d': timedelta(days=365), '1wk': timedelta(days=365 * 3), '1mo': timedelta(days=365 * 10)}
+CHART_WINDOW = CHART_WINDOWS['1wk']
+CHART_CACHE_TIMEOUT = 60 * 60 * 24
+
+# pandas resample rules: weekly bars start on Monday, monthly bars on the 1st
+RESAMPLE_RULES = {'1wk': 'W-MON', '1mo': 'MS'}
+OHLCV_AGG = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
+
+
+def _aware(ts):
+    """
+    pandas / python timestamp -> aware datetime. yfinance returns exchange-local aware
+    indexes for Ticker.history and naive dates for yf.download; naive is taken as UTC.
+    """
+    if isinstance(ts, pd.Timestamp):
+        ts = ts.to_pydatetime()
+    if timezone.is_naive(ts):
+        ts = ts.replace(tzinfo=dt_timezone.utc)
+    return ts
+
+
+def _ms(ts):
+    return int(ts.timestamp() * 1000)
+
+
+class CandleService:
+    """
+    Reads and writes the Candle table: (stock, interval, timestamp) is unique, so writes are
+    upserts of the newest bars only and reads are index range scans.
+    Bars are stored unadjusted (actual traded prices, yfinance auto_adjust=False): the ledger
+    values holdings at these closes, and every writer must download them the same way.
+    """
+
+    @staticmethod
+    def rows_from_history(df):
+        """
+        yfinance history/download DataFrame -> [{'timestamp', 'open', 'high', 'low', 'close', 'volume'}]
+        Bars without a close (holidays, partial rows) are skipped.
+        """
+        rows = []
+        if df is None or df.empty:
+            return rows
+        for ts, row in df.iterrows():
+            close = row.get('Close')
+            if close is None or (isinstance(close, float) and math.isnan(close)):
+                continue
+            volume = row.get('Volume')
+            rows.append({
+                'timestamp': _aware(ts),
+                'open': float(row.get('Open', close)),
+                'high': float(row.get('High', close)),
+                'low': float(row.get('Low', close)),
+                'close': float(close),
+                'volume': None if volume is None or pd.isna(volume) else int(volume),
+            })
+        return rows
+
+    @staticmethod
+    def latest_timestamps(stock_ids, interval='1wk'):
+        """
+        {stock_id: timestamp of the newest stored bar} in one aggregate query.
+        Stocks without bars are absent.
+        """
+        return dict(
+            Candle.objects.filter(stock_id__in=stock_ids, interval=interval)
+            .values('stock_id').annotate(latest=Max('timestamp')).values_list('stock_id', 'latest')
+        )
+
+    @staticmethod
+    def upsert(rows_by_stock, interval='1wk', only_new=True):
+        """
+        Writes {stock_id: rows} (rows_from_history format). With only_new, bars older than the
+        newest stored bar are dropped before writing; the newest one itself is rewritten because
+        the current week/day is still forming. Returns the number of rows written.
+        """
+        rows_by_stock = {sid: rows for sid, rows in rows_by_stock.items() if rows}
+        if not rows_by_stock:
+            return 0
+        latest = CandleService.latest_timestamps(rows_by_stock.keys(), interval) if only_new else {}
+
+        candles = []
+        for stock_id, rows in rows_by_stock.items():
+            since = latest.get(stock_id)
+            for row in rows:
+                if since is None or row['timestamp'] >= since:
+                    candles.append(Candle(stock_id=stock_id, interval=interval, **row))
+
+        Candle.objects.bulk_create(
+            candles, batch_size=500,
+            update_conflicts=True,
+            unique_fields=['stock', 'interval', 'timestamp'],
+            update_fields=CANDLE_FIELDS,
+        )
+        # 차트 캐시 무효화 (종목별 버전)
+        for stock_id in {c.stock_id for c in candles}:
+            bump_version(stock_id, CANDLES)
+        return len(candles)
+
+    @staticmethod
+    def chart_data(stock_id, interval='1wk', start=None, end=None):
+        """
+        ApexCharts candlestick series [{'x': ms, 'y': [open, high, low, close]}] for a time range.
+        """
+        qs = Candle.objects.filter(stock_id=stock_id, interval=interval)
+        if start:
+            qs = qs.filter(timestamp__gte=start)
+        if end:
+            qs = qs.filter(timestamp__lte=end)
+        return [
+            {'x': _ms(ts), 'y': [o, h, l, c]}
+            for ts, o, h, l, c in qs.order_by('timestamp').values_list('timestamp', 'open', 'high', 'low', 'close')
+        ]
+
+    @staticmethod
+    def closes(stock_ids, interval='1wk'):
+        """
+        {stock_id: ([bar_ms, ...], [close, ...])} ascending, one query.
+        """
+        series = {}
+        rows = (
+            Candle.objects.filter(stock_id__in=stock_ids, interval=interval)
+            .order_by('stock_id', 'timestamp').values_list('stock_id', 'timestamp', 'close')
+        )
+        for stock_id, ts, close in rows:
+            times, closes = series.setdefault(stock_id, ([], []))
+            times.append(_ms(ts))
+            closes.append(close)
+        return series
+
+    @staticmethod
+    def dataframe(stock_id, interval='1d', start=None, end=None):
+        """
+        Stored bars as a yfinance-shaped DataFrame (Open/High/Low/Close/Volume, naive date index).
+        """
+        qs = Candle.objects.filter(stock_id=stock_id, interval=interval)
+        if start:
+            qs = qs.filter(timestamp__gte=start)
+        if end:
+            qs = qs.filter(timestamp__lte=end)
+        rows = list(qs.order_by('timestamp').values_list('timestamp', *CANDLE_FIELDS))
+        df = pd.DataFrame(rows, columns=['Date', 'Open', 'High', 'Low', 'Close', 'Volume'])
+        if df.empty:
+            return df.set_index('Date')
+        df['Date'] = pd.to_datetime(df['Date'], utc=True).dt.tz_localize(None)
+        return df.set_index('Date')
+
+    @staticmethod
+    def coverage(stock_id, interval='1d'):
+        """
+        (first, last) stored bar timestamps, or (None, None).
+        """
+        agg = Candle.objects.filter(stock_id=stock_id, interval=interval).aggregate(
+            first=Min('timestamp'), last=Max('timestamp')
+        )
+        return agg['first'], agg['last']
+
+    @staticmethod
+    def resample(df, interval):
+        """
+        Daily (or weekly) bars -> weekly / monthly bars, labelled with the period start.
+        """
+        if df.empty or interval not in RESAMPLE_RULES:
+            return df
+        return (
+            df.resample(RESAMPLE_RULES[interval], label='left', closed='left')
+            .agg(OHLCV_AGG).dropna(subset=['Close'])
+        )
+
+    @staticmethod
+    def series(df):
+        """
+        DataFrame -> ApexCharts candlestick series [{'x': ms, 'y': [o, h, l, c]}].
+        """
+        if df.empty:
+            return []
+        ms = (df.index.values.astype('datetime64[ms]').astype('int64')).tolist()
+        ohlc = df[['Open', 'High', 'Low', 'Close']].round(4).values.tolist()
+        return [{'x': x, 'y': y} for x, y in zip(ms, ohlc)]
+
+    @staticmethod
+    def chart(stock_id, interval='1wk', start=None, end=None):
+        """
+        {'interval', 'candles'} for a chart window, cached per (stock, interval, range, candle version).
+
+        - 1d: stored daily bars
+        - 1wk / 1mo: resampled from daily bars when they cover the window, otherwise stored
+          weekly bars (resampled to months for 1mo)
+        The window is widened to whole days so zooming reuses cached ranges.
+        """
+        end = (end or timezone.now()).replace(hour=23, minute=59, second=59, microsecond=0)
+        start = (start or end - CHART_WINDOWS[interval]).replace(hour=0, minute=0, second=0, microsecond=0)
+        key = org_key(stock_id, 'chart', interval, start.date(), end.date(), scope=CANDLES)
+        return get_or_set(key, lambda: CandleService._chart(stock_id, interval, start, end), CHART_CACHE_TIMEOUT)
+
+    @staticmethod
+    def _chart(stock_id, interval, start, end):
+        first, _ = CandleService.coverage(stock_id, '1d')
+        daily_covers = first is not None and first <= start + timedelta(days=7)
+        if interval == '1d' or daily_covers:
+            df = CandleService.dataframe(stock_id, '1d', start, end)
+            if not df.empty:
+                return {'interval': interval, 'candles': CandleService.series(CandleService.resample(df, interval))}
+        # 일봉이 없거나 기간을 덮지 못하면 저장된 주봉 사용
+        weekly = CandleService.dataframe(stock_id, '1wk', start, end)
+        served = '1mo' if interval == '1mo' else '1wk'
+        if served == '1mo':
+            weekly = CandleService.resample(weekly, '1mo')
+        return {'interval': served, 'candles': CandleService.series(weekly)}
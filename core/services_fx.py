@@ -0,0 +1,175 @@
+import logging
+import threading
+from bisect import bisect_right
+from datetime import timedelta
+from decimal import Decimal
+from django.utils import timezone
+from .models import FxRate, Stock
+
+logger = logging.getLogger(__name__)
+
+# Stock.country -> 가격 통화
+COUNTRY_CURRENCY = {
+    '한국': 'KRW', 'Korea': 'KRW', 'South Korea': 'KRW', 'KR': 'KRW',
+    '미국': 'USD', 'USA': 'USD', 'United States': 'USD',
+    '일본': 'JPY', 'Japan': 'JPY',
+    '홍콩': 'HKD', 'Hong Kong': 'HKD',
+    '중국': 'CNY', 'China': 'CNY',
+    '대만': 'TWD', 'Taiwan': 'TWD',
+}
+# Yahoo FX tickers (KRW per 1 unit)
+FX_TICKERS = {currency: f"{currency}KRW=X" for currency in set(COUNTRY_CURRENCY.values()) if currency != 'KRW'}
+
+
+def currency_for(country):
+    return COUNTRY_CURRENCY.get(country or '', 'KRW')
+
+
+def valuation(krw_price, quantity, cost):
+    """
+    (eval_amount, yield %) of a holding; (None, None) when its KRW price is unavailable (no FX rate).
+    """
+    if krw_price is None:
+        return None, None
+    eval_amount = krw_price * quantity
+    return eval_amount, ((eval_amount - cost) / cost * 100) if cost > 0 else 0
+
+
+class FxService:
+    """
+    Latest KRW rates held in memory per process.
+    Filled from the FxRate table (one query) and reloaded once per local day. The network is only
+    touched by refresh_rates (daily beat task / refresh_fx_rates command), never on a request:
+    a currency without a stored rate is reported as unavailable (None), not valued 1:1.
+    """
+    _lock = threading.Lock()
+    _rates = None       # {currency: Decimal}
+    _loaded_on = None   # local date the cache was loaded
+
+    @classmethod
+    def rates(cls):
+        today = timezone.localdate()
+        if cls._rates is None or cls._loaded_on != today:
+            with cls._lock:
+                if cls._rates is None or cls._loaded_on != today:
+                    rates = cls._load_latest()
+                    if len(rates) == 1:
+                        logger.error("FxRate table is empty; run `manage.py refresh_fx_rates` (foreign holdings are unvalued)")
+                    cls._rates = rates
+                    cls._loaded_on = today
+        return cls._rates
+
+    @staticmethod
+    def _load_latest():
+        rates = {'KRW': Decimal(1)}
+        # Newest row per currency (ordering is -date, first one wins)
+        for currency, rate in FxRate.objects.order_by('currency', '-date').values_list('currency', 'rate'):
+            rates.setdefault(currency, rate)
+        return rates
+
+    @classmethod
+    def rate(cls, currency):
+        """
+        KRW per 1 unit of `currency`, or None when no rate is stored.
+        """
+        rate = cls.rates().get(currency)
+        if rate is None:
+            logger.warning(f"No FX rate for {currency}; value unavailable")
+        return rate
+
+    @classmethod
+    def unavailable(cls, currencies):
+        """
+        Currencies (of `currencies`) without a stored rate, sorted.
+        """
+        return sorted({c for c in currencies if cls.rates().get(c) is None})
+
+    @classmethod
+    def invalidate(cls):
+        with cls._lock:
+            cls._rates = None
+            cls._loaded_on = None
+
+    @classmethod
+    def refresh_rates(cls, period='5d'):
+        """
+        One batched yf.download for every currency; upserts a row per (currency, trading day).
+        Returns the number of rows written.
+        """
+        import yfinance as yf
+        tickers = sorted(FX_TICKERS.values())
+        try:
+            df = yf.download(tickers, period=period, interval='1d', progress=False, group_by='column')
+        except Exception as e:
+            logger.error(f"FX download failed: {e}")
+            return 0
+        if df is None or df.empty:
+            return 0
+
+        closes = df['Close']
+        rows = []
+        for currency, ticker in FX_TICKERS.items():
+            if ticker not in closes:
+                continue
+            for ts, value in closes[ticker].dropna().items():
+                rows.append(FxRate(currency=currency, date=ts.date(), rate=Decimal(str(round(float(value), 6)))))
+
+        FxRate.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['currency', 'date'], update_fields=['rate', 'updated_at']
+        )
+        cls._rates = None
+        return len(rows)
+
+    @staticmethod
+    def stock_currencies(stock_ids):
+        """
+        {stock_id: currency} in one query.
+        """
+        return {
+            sid: currency_for(country)
+            for sid, country in Stock.objects.filter(id__in=stock_ids).values_list('id', 'country')
+        }
+
+    @classmethod
+    def to_krw(cls, prices, currencies=None):
+        """
+        Converts {stock_id: native price} to KRW. One rate lookup per currency, not per stock.
+        `currencies` ({stock_id: currency}) may be passed to skip the Stock query.
+        Stocks whose currency has no rate map to None.
+        """
+        if currencies is None:
+            currencies = cls.stock_currencies(prices.keys())
+        factors = {currency: cls.rate(currency) for currency in set(currencies.values())}
+        converted = {}
+        for sid, price in prices.items():
+            factor = factors.get(currencies.get(sid, 'KRW'))
+            converted[sid] = Decimal(str(price or 0)) * factor if factor is not None else None
+        return converted
+
+    @staticmethod
+    def rate_history(currencies, start=None):
+        """
+        {currency: ([date, ...], [rate, ...])} ascending, for valuing a range of past days.
+        """
+        history = {}
+        rows = FxRate.objects.filter(currency__in=[c for c in currencies if c != 'KRW'])
+        if start:
+            # Keep the last rate before `start` as well (weekends/holidays)
+            rows = rows.filter(date__gte=start - timedelta(days=14))
+        for currency, date, rate in rows.order_by('currency', 'date').values_list('currency', 'date', 'rate'):
+            dates, rates = history.setdefault(currency, ([], []))
+            dates.append(date)
+            rates.append(rate)
+        return history
+
+    @classmethod
+    def rate_on(cls, history, currency, date):
+        """
+        Rate of the last trading day at or before `date`; falls back to the latest cached rate
+        (None when there is none).
+        """
+        if currency == 'KRW':
+            return Decimal(1)
+        dates, rates = history.get(currency, ([], []))
+        idx = bisect_right(dates, date)
+        return rates[idx - 1] if idx > 0 else cls.rates().get(currency)
@@ -0,0 +1,385 @@
+import logging
+from bisect import bisect_left
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.utils import timezone
+from .models import Transaction, Stock, LedgerCheckpoint, DailySnapshot
+from .services_fx import FxService, currency_for, valuation
+from .services_candles import CandleService
+
+logger = logging.getLogger(__name__)
+
+# DailySnapshot columns filled from LedgerState.financials()
+SNAPSHOT_FIELDS = [
+    'total_cash', 'total_stock_value', 'total_assets', 'total_liabilities', 'total_equity',
+    'capital_stock', 'retained_earnings', 'realized_pl', 'unrealized_pl',
+    'total_fees', 'total_taxes', 'net_income',
+]
+
+# Weekly bars are stored under their week start (Monday 00:00); their close is Friday's close,
+# known from the end of Friday (bar time + 5 days - 1s)
+WEEK_CLOSE_OFFSET_MS = (5 * 24 * 60 * 60 - 1) * 1000
+
+
+def _dec(value):
+    return Decimal(str(value or 0))
+
+
+def day_end(date):
+    """
+    Exclusive upper bound (local midnight of the next day) for an as-of date.
+    """
+    return timezone.make_aware(datetime.combine(date + timedelta(days=1), time.min))
+
+
+class LedgerState:
+    """
+    Cumulative ledger state (cash, holdings and K-IFRS aggregates) at a point in time.
+    Built by applying transactions in timestamp order; serializable into a LedgerCheckpoint
+    so later queries only need to apply the transactions after the checkpoint.
+    """
+    TOTAL_FIELDS = [
+        'cash', 'total_deposit', 'total_withdraw', 'total_fees', 'total_taxes',
+        'total_buy_cost', 'total_sell_revenue', 'total_realized_profit',
+    ]
+
+    def __init__(self):
+        for field in self.TOTAL_FIELDS:
+            setattr(self, field, Decimal(0))
+        self.holdings = {}  # {stock_id: {'quantity': int, 'cost': Decimal}}
+
+    def apply(self, tx):
+        amount = _dec(tx.amount)
+        fee = _dec(tx.fee)
+        tax = _dec(tx.tax)
+
+        self.cash += amount
+        self.total_fees += fee
+        self.total_taxes += tax
+
+        if tx.related_asset_id:
+            h = self.holdings.setdefault(tx.related_asset_id, {'quantity': 0, 'cost': Decimal(0)})
+            if tx.transaction_type == 'BUY':
+                h['cost'] += abs(amount) - fee
+            elif tx.transaction_type == 'SELL' and h['quantity'] > 0:
+                # Moving average cost leaves with the sold shares
+                h['cost'] -= h['cost'] / h['quantity'] * min(abs(tx.quantity), h['quantity'])
+            h['quantity'] += tx.quantity
+            if h['quantity'] <= 0:
+                h['cost'] = Decimal(0)
+
+        if tx.transaction_type == 'BUY':
+            # Amount is negative for BUY. Principal part is abs(amount) - fee.
+            self.total_buy_cost += abs(amount) - fee
+        elif tx.transaction_type == 'SELL':
+            # Amount is positive. Revenue principal = amount + fee + tax
+            self.total_sell_revenue += amount + fee + tax
+            self.total_realized_profit += _dec(tx.profit)
+        elif tx.transaction_type == 'DEPOSIT':
+            self.total_deposit += amount
+        elif tx.transaction_type == 'WITHDRAW':
+            self.total_withdraw += abs(amount)
+
+    def held_stock_ids(self):
+        return [sid for sid, h in self.holdings.items() if h['quantity'] > 0]
+
+    def to_dict(self):
+        data = {field: str(getattr(self, field)) for field in self.TOTAL_FIELDS}
+        data['holdings'] = {
+            str(sid): {'quantity': h['quantity'], 'cost': str(h['cost'])}
+            for sid, h in self.holdings.items() if h['quantity'] != 0
+        }
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls()
+        for field in cls.TOTAL_FIELDS:
+            setattr(state, field, Decimal(data.get(field, '0')))
+        state.holdings = {
+            int(sid): {'quantity': h['quantity'], 'cost': Decimal(h['cost'])}
+            for sid, h in data.get('holdings', {}).items()
+        }
+        return state
+
+    def financials(self, prices, date):
+        """
+        Financial statements for this state, valuing holdings with `prices` ({stock_id: price}).
+        Same structure as FinancialService.calculate_financials. Holdings whose price is None
+        (no FX rate) are left out of the stock value and counted in 'unvalued_stocks'.
+        """
+        total_stock_value = Decimal(0)
+        unvalued, unvalued_cost = 0, Decimal(0)
+        for sid, h in self.holdings.items():
+            if h['quantity'] > 0:
+                if sid in prices and prices[sid] is None:
+                    unvalued += 1
+                    unvalued_cost += _dec(h['cost'])
+                    continue
+                total_stock_value += h['quantity'] * _dec(prices.get(sid))
+
+        # Income Statement: COGS = Revenue - Realized Profit
+        cogs = self.total_sell_revenue - self.total_realized_profit
+        # 평가 불가 종목은 원가도 제외 (미실현 손익은 평가된 종목만)
+        remaining_cost_basis = self.total_buy_cost - cogs - unvalued_cost
+        unrealized_pl = total_stock_value - remaining_cost_basis
+        realized_pl = self.total_realized_profit
+
+        # [K-IFRS Logic] Net Income (Performance) = (Realized + Unrealized) - (Fees + Taxes)
+        raw_net_income = realized_pl + unrealized_pl - self.total_fees - self.total_taxes
+
+        # Withdrawals come out of Retained Earnings first (if positive), then Capital Stock.
+        remaining_withdrawals = self.total_withdraw
+        if raw_net_income > 0:
+            deduction_from_re = min(raw_net_income, remaining_withdrawals)
+            final_retained_earnings = raw_net_income - deduction_from_re
+            remaining_withdrawals -= deduction_from_re
+        else:
+            final_retained_earnings = raw_net_income
+        final_capital_stock = self.total_deposit - remaining_withdrawals
+
+        total_assets = self.cash + total_stock_value
+        total_liabilities = 0
+        total_equity = total_assets - total_liabilities
+
+        return {
+            'date': date,
+            'total_cash': self.cash,
+            'total_stock_value': total_stock_value,
+            'total_assets': total_assets,
+            'total_liabilities': total_liabilities,
+            'total_equity': total_equity,
+
+            'capital_stock': final_capital_stock,
+            'retained_earnings': final_retained_earnings,
+
+            'realized_pl': realized_pl,
+            'unrealized_pl': unrealized_pl,
+            'total_fees': self.total_fees,
+            'total_taxes': self.total_taxes,
+            'net_income': raw_net_income,
+            'unvalued_stocks': unvalued,
+        }
+
+
+class LedgerService:
+    @staticmethod
+    def state_as_of(organization, date=None, save_checkpoint=False):
+        """
+        Ledger state at the end of `date` (local time), or including every transaction if None.
+        Starts from the nearest earlier LedgerCheckpoint and applies only the transactions after it.
+        """
+        checkpoints = LedgerCheckpoint.objects.filter(organization=organization)
+        if date:
+            checkpoints = checkpoints.filter(date__lte=date)
+        checkpoint = checkpoints.order_by('-date').first()
+
+        txs = Transaction.objects.filter(organization=organization)
+        if checkpoint:
+            state = LedgerState.from_dict(checkpoint.state)
+            if date and checkpoint.date == date:
+                return state
+            txs = txs.filter(timestamp__gte=day_end(checkpoint.date))
+        else:
+            state = LedgerState()
+        if date:
+            txs = txs.filter(timestamp__lt=day_end(date))
+
+        fields = ['transaction_type', 'amount', 'fee', 'tax', 'profit', 'quantity', 'related_asset_id']
+        for tx in txs.order_by('timestamp', 'id').only(*fields).iterator():
+            state.apply(tx)
+
+        # Completed past days never change again (backdated edits drop the checkpoint)
+        if save_checkpoint and date and date < timezone.localdate():
+            LedgerService.save_checkpoint(organization, date, state)
+        return state
+
+    @staticmethod
+    def save_checkpoint(organization, date, state):
+        LedgerCheckpoint.objects.update_or_create(
+            organization=organization,
+            date=date,
+            defaults={'state': state.to_dict()}
+        )
+
+    @staticmethod
+    def invalidate_checkpoints(organization_id, timestamp):
+        """
+        Drops checkpoints that include a changed transaction (same day or later).
+        """
+        if not organization_id or not timestamp:
+            return
+        LedgerCheckpoint.objects.filter(
+            organization_id=organization_id,
+            date__gte=timezone.localtime(timestamp).date()
+        ).delete()
+
+    @staticmethod
+    def close_series(stock_ids):
+        """
+        {stock_id: ([known_ms, ...], [close, ...], fallback_price, currency)} from stored candles (ascending).
+        Closes are in the stock's own currency and keyed by when they are known, so a lookup never
+        sees a later price:
+        - daily bars: the bar's own day
+        - weekly bars (only before the daily history starts): the end of the week (Friday's close),
+          not the week start they are stored under
+        """
+        daily = CandleService.closes(stock_ids, '1d')
+        weekly = CandleService.closes(stock_ids, '1wk')
+        series = {}
+        for sid, price, country in Stock.objects.filter(id__in=stock_ids).values_list('id', 'current_price', 'country'):
+            day_times, day_values = daily.get(sid, ([], []))
+            first_day = day_times[0] if day_times else None
+            times, values = [], []
+            for week_start, close in zip(*weekly.get(sid, ([], []))):
+                known = week_start + WEEK_CLOSE_OFFSET_MS
+                if first_day is not None and known >= first_day:
+                    break
+                times.append(known)
+                values.append(close)
+            series[sid] = (times + day_times, values + day_values, price or 0, currency_for(country))
+        return series
+
+    @staticmethod
+    def close_on(series, stock_id, date):
+        """
+        Last close known by the end of `date`; current_price when no bar is that old.
+        """
+        times, closes, fallback, _ = series.get(stock_id, ([], [], 0, 'KRW'))
+        idx = bisect_left(times, int(day_end(date).timestamp() * 1000))
+        return closes[idx - 1] if idx > 0 else fallback
+
+    @staticmethod
+    def krw_close_on(series, fx_history, stock_id, date):
+        """
+        close_on converted to KRW with the FX rate of the same day (None without any rate).
+        """
+        currency = series[stock_id][3] if stock_id in series else 'KRW'
+        rate = FxService.rate_on(fx_history, currency, date)
+        return _dec(LedgerService.close_on(series, stock_id, date)) * rate if rate is not None else None
+
+    @staticmethod
+    def fx_history_for(series, start=None):
+        return FxService.rate_history({s[3] for s in series.values()}, start=start)
+
+    @staticmethod
+    def current_prices(stock_ids):
+        """
+        {stock_id: current price in KRW} (one query + cached FX rates).
+        """
+        prices, currencies = {}, {}
+        for sid, price, country in Stock.objects.filter(id__in=stock_ids).values_list('id', 'current_price', 'country'):
+            prices[sid] = price or 0
+            currencies[sid] = currency_for(country)
+        return FxService.to_krw(prices, currencies)
+
+    @staticmethod
+    def as_of(organization, date):
+        """
+        As-of query API: financial statements and holdings at the end of `date`,
+        valued with stored candle closes (converted to KRW at that day's FX rate).
+        """
+        state = LedgerService.state_as_of(organization, date, save_checkpoint=True)
+        held_ids = state.held_stock_ids()
+        series = LedgerService.close_series(held_ids)
+        fx_history = LedgerService.fx_history_for(series, start=date)
+        prices = {sid: LedgerService.krw_close_on(series, fx_history, sid, date) for sid in held_ids}
+        stocks = Stock.objects.in_bulk(held_ids)
+
+        holdings = []
+        for sid in held_ids:
+            h = state.holdings[sid]
+            eval_amount, yield_pct = valuation(prices[sid], h['quantity'], h['cost'])
+            holdings.append({
+                'stock': stocks.get(sid),
+                'quantity': h['quantity'],
+                'avg_price': h['cost'] / h['quantity'],
+                'total_amount': h['cost'],
+                'close_price': _dec(LedgerService.close_on(series, sid, date)),
+                'currency': series[sid][3] if sid in series else 'KRW',
+                'eval_amount': eval_amount,
+                'yield': yield_pct,
+            })
+        holdings.sort(key=lambda x: x['eval_amount'] or 0, reverse=True)
+
+        return {
+            'financials': state.financials(prices, date),
+            'holdings': holdings,
+        }
+
+    @staticmethod
+    def backfill_snapshots(organization, start=None, end=None, overwrite=False):
+        """
+        Fills missing DailySnapshot rows from `start` to `end` (default: first transaction day ~ yesterday)
+        in a single pass over the ledger, valuing holdings with stored daily closes.
+        Month-end checkpoints are written along the way. Returns the number of rows written.
+        """
+        end = end or timezone.localdate() - timedelta(days=1)
+        if not start:
+            first_tx = Transaction.objects.filter(organization=organization).order_by('timestamp').values_list('timestamp', flat=True).first()
+            if not first_tx:
+                return 0
+            start = timezone.localtime(first_tx).date()
+        if start > end:
+            return 0
+
+        existing = set()
+        if not overwrite:
+            existing = set(DailySnapshot.objects.filter(
+                organization=organization, date__gte=start, date__lte=end
+            ).values_list('date', flat=True))
+
+        # Opening state = end of the day before `start` (from the nearest checkpoint)
+        state = LedgerService.state_as_of(organization, start - timedelta(days=1))
+
+        txs = Transaction.objects.filter(
+            organization=organization,
+            timestamp__gte=day_end(start - timedelta(days=1)),
+            timestamp__lt=day_end(end)
+        ).order_by('timestamp', 'id').only(
+            'transaction_type', 'amount', 'fee', 'tax', 'profit', 'quantity', 'related_asset_id', 'timestamp'
+        )
+        stock_ids = set(state.holdings) | set(txs.exclude(related_asset__isnull=True).values_list('related_asset_id', flat=True))
+        series = LedgerService.close_series(stock_ids)
+        fx_history = LedgerService.fx_history_for(series, start=start)
+
+        snapshots = []
+        checkpoints = []
+        tx_iter = txs.iterator()
+        pending = next(tx_iter, None)
+        day = start
+        while day <= end:
+            boundary = day_end(day)
+            while pending is not None and pending.timestamp < boundary:
+                state.apply(pending)
+                pending = next(tx_iter, None)
+
+            if day not in existing:
+                prices = {sid: LedgerService.krw_close_on(series, fx_history, sid, day) for sid in state.held_stock_ids()}
+                financials = state.financials(prices, day)
+                if financials['unvalued_stocks']:
+                    # 환율 없는 종목이 있으면 스냅샷을 남기지 않음 (환율 적재 후 다시 backfill)
+                    logger.warning(f"Skipping snapshot {organization.id}/{day}: {financials['unvalued_stocks']} holdings without FX rate")
+                else:
+                    snapshots.append(DailySnapshot(
+                        organization=organization,
+                        date=day,
+                        **{field: financials[field] for field in SNAPSHOT_FIELDS}
+                    ))
+            if day == end or (day + timedelta(days=1)).day == 1:
+                checkpoints.append(LedgerCheckpoint(organization=organization, date=day, state=state.to_dict()))
+            day += timedelta(days=1)
+
+        DailySnapshot.objects.bulk_create(
+            snapshots, batch_size=500,
+            update_conflicts=True, unique_fields=['organization', 'date'], update_fields=SNAPSHOT_FIELDS
+        )
+        LedgerCheckpoint.objects.bulk_create(
+            checkpoints, batch_size=500,
+            update_conflicts=True, unique_fields=['organization', 'date'], update_fields=['state', 'created_at']
+        )
+        # bulk_create skips post_save, so bump the ledger cache version here
+        from .cache import bump_version
+        bump_version(organization.id)
+        return len(snapshots)
+
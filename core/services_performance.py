@@ -0,0 +1,197 @@
+import numpy as np
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import DailySnapshot, Transaction, Stock
+from .services_ledger import LedgerService, day_end
+from .cache import org_key, get_or_set, bump_version
+
+PERFORMANCE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+class PerformanceService:
+    """
+    Time-weighted (TWR) and money-weighted (MWR / IRR) returns over the DailySnapshot equity series,
+    adjusted for DEPOSIT/WITHDRAW flows, plus per-stock contribution for the same range.
+    Results are cached per organization and range under the organization's ledger cache version
+    (core.cache); writing a snapshot or transaction bumps it.
+    """
+
+    @staticmethod
+    def invalidate(organization_id):
+        bump_version(organization_id)
+
+    @staticmethod
+    def get_performance(organization, start=None, end=None):
+        """
+        Returns {'start', 'end', 'days', 'start_equity', 'end_equity', 'net_flow',
+                 'twr', 'twr_annualized', 'mwr', 'mwr_annualized', 'contributions': [...]}
+        (rates as fractions), or None when the range has fewer than two snapshots.
+        """
+        return get_or_set(
+            org_key(organization.id, 'perf', start, end),
+            lambda: PerformanceService.compute(organization, start, end),
+            PERFORMANCE_CACHE_TIMEOUT,
+        )
+
+    @staticmethod
+    def compute(organization, start=None, end=None):
+        snapshots = DailySnapshot.objects.filter(organization=organization)
+        if start:
+            snapshots = snapshots.filter(date__gte=start)
+        if end:
+            snapshots = snapshots.filter(date__lte=end)
+        rows = list(snapshots.order_by('date').values_list('date', 'total_equity'))
+        if len(rows) < 2:
+            return None
+
+        dates = [d for d, _ in rows]
+        start, end = dates[0], dates[-1]
+        equity = np.array([float(e) for _, e in rows])
+        day_index = np.array([(d - start).days for d in dates])
+
+        # External flows per local day within (start, end]; deposits positive, withdrawals negative
+        flow_rows = (
+            Transaction.objects.filter(
+                organization=organization,
+                transaction_type__in=['DEPOSIT', 'WITHDRAW'],
+                timestamp__gte=day_end(start),
+                timestamp__lt=day_end(end),
+            )
+            .annotate(day=TruncDate('timestamp', tzinfo=timezone.get_current_timezone()))
+            .values('day')
+            .annotate(total=Sum('amount'))
+            .order_by('day')
+        )
+        flow_days = np.array([(r['day'] - start).days for r in flow_rows], dtype=int)
+        flow_amounts = np.array([float(r['total']) for r in flow_rows])
+
+        # Flows between two snapshots are assigned to the later snapshot
+        period_flows = np.zeros(len(equity))
+        if len(flow_days):
+            np.add.at(period_flows, np.searchsorted(day_index, flow_days, side='left'), flow_amounts)
+
+        twr = PerformanceService._twr(equity, period_flows)
+        total_days = int(day_index[-1])
+        twr_annualized = (1 + twr) ** (365.0 / total_days) - 1 if total_days >= 365 and twr > -1 else None
+        irr = PerformanceService._irr(equity[0], equity[-1], flow_days, flow_amounts, total_days)
+        # Same convention as TWR: period return, annualized only for ranges of a year or more
+        mwr = (1 + irr) ** (total_days / 365.0) - 1 if irr is not None else None
+        mwr_annualized = irr if irr is not None and total_days >= 365 else None
+
+        return {
+            'start': start,
+            'end': end,
+            'days': total_days,
+            'start_equity': float(equity[0]),
+            'end_equity': float(equity[-1]),
+            'net_flow': float(flow_amounts.sum()) if len(flow_amounts) else 0.0,
+            'twr': twr,
+            'twr_annualized': twr_annualized,
+            'mwr': mwr,
+            'mwr_annualized': mwr_annualized,
+            'contributions': PerformanceService._contributions(
+                organization, start, end, equity[0], flow_days, flow_amounts, total_days
+            ),
+        }
+
+    @staticmethod
+    def _twr(equity, period_flows):
+        """
+        Chain-linked daily returns: r_t = (E_t - F_t) / E_{t-1} - 1, periods with no capital skipped.
+        """
+        prev = equity[:-1]
+        valid = prev > 0
+        returns = np.zeros(len(prev))
+        returns[valid] = (equity[1:][valid] - period_flows[1:][valid]) / prev[valid] - 1
+        return float(np.prod(1 + returns) - 1)
+
+    @staticmethod
+    def _irr(start_equity, end_equity, flow_days, flow_amounts, total_days, iterations=100):
+        """
+        Annualized money-weighted return: rate r solving
+        -E_0 - sum(F_k (1+r)^(-t_k/365)) + E_T (1+r)^(-T/365) = 0  (Newton, bisection fallback).
+        """
+        if total_days <= 0 or (start_equity <= 0 and not len(flow_amounts)):
+            return None
+        times = np.concatenate(([0], flow_days, [total_days])) / 365.0
+        cashflows = np.concatenate(([-start_equity], -flow_amounts, [end_equity]))
+
+        def npv(rate):
+            return float(np.sum(cashflows / (1 + rate) ** times))
+
+        def d_npv(rate):
+            return float(np.sum(-times * cashflows / (1 + rate) ** (times + 1)))
+
+        rate = 0.1
+        for _ in range(iterations):
+            value, slope = npv(rate), d_npv(rate)
+            if slope == 0:
+                break
+            new_rate = rate - value / slope
+            if new_rate <= -0.9999:
+                break
+            if abs(new_rate - rate) < 1e-10:
+                return float(new_rate)
+            rate = new_rate
+
+        low, high = -0.9999, 10.0
+        if npv(low) * npv(high) > 0:
+            return None
+        for _ in range(200):
+            mid = (low + high) / 2
+            if npv(low) * npv(mid) <= 0:
+                high = mid
+            else:
+                low = mid
+        return float((low + high) / 2)
+
+    @staticmethod
+    def _contributions(organization, start, end, start_equity, flow_days, flow_amounts, total_days):
+        """
+        Per-stock P/L over the range (end value - start value + net trade cash) divided by the
+        Modified Dietz average capital, so the contributions add up to the portfolio return.
+        Stocks held at either end without a KRW value (no FX rate) are returned with
+        'unavailable': True and pnl / contribution None.
+        """
+        opening = {h['stock'].id: h for h in LedgerService.as_of(organization, start)['holdings'] if h['stock']}
+        closing = {h['stock'].id: h for h in LedgerService.as_of(organization, end)['holdings'] if h['stock']}
+        trade_cash = dict(
+            Transaction.objects.filter(
+                organization=organization,
+                related_asset__isnull=False,
+                timestamp__gte=day_end(start),
+                timestamp__lt=day_end(end),
+            ).values('related_asset').annotate(total=Sum('amount')).values_list('related_asset', 'total')
+        )
+
+        weights = (total_days - flow_days) / total_days if total_days else np.zeros(len(flow_days))
+        average_capital = start_equity + float(np.sum(weights * flow_amounts)) if len(flow_amounts) else start_equity
+
+        stock_ids = set(opening) | set(closing) | set(trade_cash)
+        stocks = {h['stock'].id: h['stock'] for h in list(opening.values()) + list(closing.values())}
+        missing = stock_ids - set(stocks)
+        if missing:
+            stocks.update(Stock.objects.in_bulk(missing))
+
+        contributions = []
+        for sid in stock_ids:
+            values = [h[sid]['eval_amount'] for h in (opening, closing) if sid in h]
+            unavailable = any(value is None for value in values)
+            pnl = None
+            if not unavailable:
+                start_value = float(opening[sid]['eval_amount']) if sid in opening else 0.0
+                end_value = float(closing[sid]['eval_amount']) if sid in closing else 0.0
+                pnl = end_value - start_value + float(trade_cash.get(sid) or 0)
+            stock = stocks.get(sid)
+            contributions.append({
+                'stock_id': sid,
+                'stock_name': stock.name if stock else '',
+                'stock_code': stock.code if stock else '',
+                'pnl': pnl,
+                'contribution': pnl / average_capital if pnl is not None and average_capital > 0 else None,
+                'unavailable': unavailable,
+            })
+        # 평가 불가 종목은 맨 뒤
+        contributions.sort(key=lambda c: (c['pnl'] is not None, c['pnl'] or 0), reverse=True)
+        return contributions
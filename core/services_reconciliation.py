@@ -0,0 +1,150 @@
+import hashlib
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Q
+from .models import Organization, Transaction, ReconciliationCheckpoint
+
+# Checkpoints kept per organization (older ones are pruned)
+KEEP_CHECKPOINTS = 10
+
+
+def _chain(prev_hash, tx):
+    row = f"{tx.id}|{tx.timestamp.isoformat()}|{tx.transaction_type}|{Decimal(tx.amount):.2f}"
+    return hashlib.sha256(f"{prev_hash}|{row}".encode()).hexdigest()
+
+
+class ReconciliationService:
+    """
+    Cash integrity checks between Organization.cash_balance, Transaction.balance_after
+    (running balance in (timestamp, id) order) and the Sum of amounts.
+
+    Each successful run stores a ReconciliationCheckpoint (count, amount total, rolling hash)
+    at the last verified transaction. The next run resumes from the newest checkpoint whose
+    anchor row is unchanged and only walks the rows after it, so a check costs O(new rows).
+    """
+
+    @staticmethod
+    def _up_to(checkpoint):
+        return Q(timestamp__lt=checkpoint.last_timestamp) | Q(
+            timestamp=checkpoint.last_timestamp, id__lte=checkpoint.last_transaction_id
+        )
+
+    @staticmethod
+    def last_good_checkpoint(organization):
+        """
+        Newest checkpoint whose anchor row (its last verified transaction) is unchanged.
+
+        Only the anchor is looked up (one primary-key query per candidate), never the prefix:
+        edits and deletes inside the prefix already drop the covering checkpoints through
+        invalidate() (post_save / post_delete), and --full re-verifies the whole ledger.
+        A checkpoint whose anchor is gone, moved, or no longer carries the stored running total
+        as balance_after is dropped and the next older one is tried.
+        """
+        for checkpoint in ReconciliationCheckpoint.objects.filter(organization=organization):
+            anchor = Transaction.objects.filter(
+                organization=organization, id=checkpoint.last_transaction_id
+            ).values('timestamp', 'balance_after').first()
+            if (anchor and anchor['timestamp'] == checkpoint.last_timestamp
+                    and abs(anchor['balance_after'] - checkpoint.amount_total) < 1):
+                return checkpoint
+            checkpoint.delete()
+        return None
+
+    @staticmethod
+    def invalidate(organization_id, timestamp):
+        """
+        Drops checkpoints that cover a changed transaction.
+        """
+        if not organization_id or not timestamp:
+            return
+        ReconciliationCheckpoint.objects.filter(organization_id=organization_id, last_timestamp__gte=timestamp).delete()
+
+    @staticmethod
+    def verify(organization, repair=False, full=False):
+        """
+        Verifies the ledger after the last good checkpoint (or from the start if `full`).
+        Returns a report dict; with `repair`, rewrites balance_after from the first divergent row
+        and resets Organization.cash_balance to the ledger total.
+        """
+        checkpoint = None if full else ReconciliationService.last_good_checkpoint(organization)
+
+        txs = Transaction.objects.filter(organization=organization)
+        if checkpoint:
+            txs = txs.exclude(ReconciliationService._up_to(checkpoint))
+            count = checkpoint.tx_count
+            running = checkpoint.amount_total
+            chain_hash = checkpoint.chain_hash
+        else:
+            count, running, chain_hash = 0, Decimal(0), ''
+
+        # Full mode: recomputed hashes are compared with what existing checkpoints recorded,
+        # catching rows edited in place with an unchanged count/total
+        recorded = {}
+        if full:
+            recorded = {c.last_transaction_id: c for c in ReconciliationCheckpoint.objects.filter(organization=organization)}
+
+        first_divergence = None
+        mismatches = []
+        last_tx = None
+        checked = 0
+        for tx in txs.order_by('timestamp', 'id').only('id', 'timestamp', 'transaction_type', 'amount', 'balance_after').iterator():
+            running += tx.amount
+            count += 1
+            checked += 1
+            chain_hash = _chain(chain_hash, tx)
+            last_tx = tx
+            if tx.id in recorded and recorded[tx.id].chain_hash != chain_hash:
+                recorded.pop(tx.id).delete()
+            # balance_after is stored without decimals
+            if abs(tx.balance_after - running) >= 1:
+                if first_divergence is None:
+                    first_divergence = {
+                        'transaction_id': tx.id,
+                        'timestamp': tx.timestamp,
+                        'stored': tx.balance_after,
+                        'expected': running,
+                    }
+                if repair:
+                    tx.balance_after = running
+                    mismatches.append(tx)
+                else:
+                    mismatches.append(tx.id)
+
+        cash_balance = Organization.objects.filter(id=organization.id).values_list('cash_balance', flat=True).first() or 0
+        cash_ok = abs(cash_balance - running) < 1
+
+        repaired = False
+        if repair and (mismatches or not cash_ok):
+            with transaction.atomic():
+                Transaction.objects.bulk_update(mismatches, ['balance_after'], batch_size=500)
+                Organization.objects.filter(id=organization.id).update(cash_balance=running)
+            repaired = True
+
+        if last_tx and (repaired or (first_divergence is None and cash_ok)):
+            ReconciliationService._save_checkpoint(organization, last_tx, count, running, chain_hash)
+
+        return {
+            'organization': organization,
+            'from_checkpoint': checkpoint,
+            'checked': checked,
+            'tx_count': count,
+            'ledger_total': running,
+            'cash_balance': cash_balance,
+            'cash_ok': cash_ok,
+            'first_divergence': first_divergence,
+            'mismatch_count': len(mismatches),
+            'repaired': repaired,
+        }
+
+    @staticmethod
+    def _save_checkpoint(organization, last_tx, count, total, chain_hash):
+        ReconciliationCheckpoint.objects.create(
+            organization=organization,
+            last_transaction_id=last_tx.id,
+            last_timestamp=last_tx.timestamp,
+            tx_count=count,
+            amount_total=total,
+            chain_hash=chain_hash,
+        )
+        stale = ReconciliationCheckpoint.objects.filter(organization=organization).values_list('id', flat=True)[KEEP_CHECKPOINTS:]
+        ReconciliationCheckpoint.objects.filter(id__in=list(stale)).delete()
@@ -0,0 +1,207 @@
+"""
+Live price push over Server-Sent Events (GET /api/stream/prices/?ids=...).
+
+One PriceBroadcaster per process runs a daemon thread while at least one stream is open. Every
+PRICE_STREAM_INTERVAL seconds it takes the union of the stock ids watched by all open streams and
+
+- refreshes, in one batch download (core.utils.batch_fetch_quotes), the watched stocks whose stored
+  quote is stale by core.market_hours (so at most one upstream fetch per ticker per quote TTL,
+  however many tabs watch it; a refresh already in flight elsewhere holds the QuoteService lock)
+- re-reads the stored quotes in one query, which also picks up the Celery beat refreshes and
+  other processes, and hands the changed ones to every stream watching those stocks
+
+Each stream only waits on its own Subscriber, so a hundred tabs cost one query per tick.
+"""
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+from .models import Stock
+from .services_fx import FxService, currency_for
+
+logger = logging.getLogger(__name__)
+
+PRICE_STREAM_INTERVAL = 5      # seconds between broadcaster ticks
+PRICE_STREAM_HEARTBEAT = 15    # seconds between keep-alive comments on an idle stream
+PRICE_STREAM_MAX_IDS = 200     # stock ids per stream
+PRICE_STREAM_RETRY_MS = 5000   # EventSource reconnect delay
+
+
+def quotes_for(stocks):
+    """
+    {stock_id: {'price', 'krw_price', 'currency', 'high_52w', 'low_52w', 'updated_at'}} for Stock rows
+    (prices as float for JSON; krw_price is None while the currency has no FX rate).
+    """
+    currencies = {s.id: currency_for(s.country) for s in stocks}
+    krw = FxService.to_krw({s.id: s.current_price for s in stocks}, currencies)
+    return {
+        s.id: {
+            'price': float(s.current_price or 0),
+            'krw_price': float(krw[s.id]) if krw[s.id] is not None else None,  # 환율 없음
+            'currency': currencies[s.id],
+            'high_52w': float(s.high_52w) if s.high_52w is not None else None,
+            'low_52w': float(s.low_52w) if s.low_52w is not None else None,
+            'updated_at': s.quote_updated_at.isoformat() if s.quote_updated_at else None,
+        }
+        for s in stocks
+    }
+
+
+def _moved(old, new):
+    # updated_at 만 바뀐 갱신(가격 동일)은 푸시하지 않음
+    return old is None or any(old[k] != new[k] for k in ('price', 'high_52w', 'low_52w'))
+
+
+class Subscriber:
+    """
+    One open stream. Pending changes are merged per stock, so a slow client gets the latest
+    quote of each stock instead of a growing backlog.
+    """
+    def __init__(self, stock_ids):
+        self.stock_ids = frozenset(stock_ids)
+        self.pending = {}
+        self.condition = threading.Condition()
+
+    def push(self, quotes):
+        with self.condition:
+            self.pending.update(quotes)
+            self.condition.notify()
+
+    def wait(self, timeout):
+        """
+        Changed quotes since the last call, or {} after `timeout` seconds without any.
+        """
+        with self.condition:
+            if not self.pending:
+                self.condition.wait(timeout)
+            quotes, self.pending = self.pending, {}
+        return quotes
+
+
+class PriceBroadcaster:
+    """
+    Process-wide fan-out of stored quotes to open streams. Use PriceBroadcaster.current().
+    """
+    _lock = threading.Lock()
+    _current = None
+
+    def __init__(self, interval=None):
+        self.interval = interval or getattr(settings, 'PRICE_STREAM_INTERVAL', PRICE_STREAM_INTERVAL)
+        self.subscribers = set()
+        self.published = {}  # stock_id -> last quote handed out
+        self.lock = threading.Lock()
+        self.thread = None
+
+    @classmethod
+    def current(cls):
+        if cls._current is None:
+            with cls._lock:
+                if cls._current is None:
+                    cls._current = cls()
+        return cls._current
+
+    def subscribe(self, stock_ids):
+        subscriber = Subscriber(stock_ids)
+        with self.lock:
+            self.subscribers.add(subscriber)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='price-broadcaster', daemon=True)
+                self.thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def watched(self):
+        with self.lock:
+            return set().union(*(s.stock_ids for s in self.subscribers))
+
+    def _run(self):
+        stop = threading.Event()
+        while not stop.wait(self.interval):
+            with self.lock:
+                if not self.subscribers:
+                    # 구독자가 없으면 스레드 종료 (다음 subscribe 가 다시 시작)
+                    self.thread = None
+                    self.published.clear()
+                    return
+            try:
+                self.tick()
+            except Exception:
+                logger.exception("Price broadcaster tick failed")
+            finally:
+                close_old_connections()
+
+    def tick(self):
+        """
+        One round: refresh stale watched quotes upstream, then publish the stored quotes that changed.
+        """
+        stock_ids = self.watched()
+        if not stock_ids:
+            return
+        stocks = list(Stock.objects.filter(id__in=stock_ids))
+        self.refresh_stale(stocks)
+        self.publish(quotes_for(stocks))
+
+    @staticmethod
+    def refresh_stale(stocks):
+        """
+        Batch quote refresh for the stale stocks no other worker is already refreshing.
+        Updates the given Stock instances in place.
+        """
+        from .services import QuoteService
+        from .utils import QUOTE_FIELDS, batch_fetch_quotes
+        stale = [s for s in stocks if QuoteService.is_stale(s) and QuoteService.acquire(s.id)]
+        if not stale:
+            return []
+        try:
+            updated = batch_fetch_quotes(stale)
+            if updated:
+                Stock.objects.bulk_update(updated, QUOTE_FIELDS, batch_size=100)
+            return updated
+        finally:
+            for stock in stale:
+                QuoteService.release(stock.id)
+
+    def publish(self, quotes):
+        changed = {
+            sid: quote for sid, quote in quotes.items()
+            if _moved(self.published.get(sid), quote)
+        }
+        if not changed:
+            return
+        self.published.update(changed)
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            mine = {sid: quote for sid, quote in changed.items() if sid in subscriber.stock_ids}
+            if mine:
+                subscriber.push(mine)
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def price_events(stock_ids):
+    """
+    text/event-stream body for a stream watching `stock_ids`: the stored quotes first, then a
+    'prices' event per batch of changes and a keep-alive comment while idle. Closing the
+    response (client gone) unsubscribes.
+    """
+    heartbeat = getattr(settings, 'PRICE_STREAM_HEARTBEAT', PRICE_STREAM_HEARTBEAT)
+    snapshot = quotes_for(list(Stock.objects.filter(id__in=stock_ids)))
+    # 스트림이 열려 있는 동안 DB 연결을 붙잡지 않음
+    close_old_connections()
+    broadcaster = PriceBroadcaster.current()
+    subscriber = broadcaster.subscribe(stock_ids)
+    try:
+        yield f"retry: {PRICE_STREAM_RETRY_MS}\n\n" + sse_event('prices', snapshot)
+        while True:
+            quotes = subscriber.wait(heartbeat)
+            yield sse_event('prices', quotes) if quotes else ": keep-alive\n\n"
+    finally:
+        broadcaster.unsubscribe(subscriber)
@@ -0,0 +1,295 @@
+"""
+Local symbol master for stock search autocomplete.
+
+SymbolMasterService.refresh() loads the full KRX listing (KIND corp list) and the NASDAQ / NYSE
+listings (NASDAQ Trader symbol directory) into SymbolMaster once a day. SymbolIndex keeps an
+in-memory index of the active rows per process:
+
+- prefix: one sorted list of (key, entry) for codes, names and Korean initial consonants
+  (chosung, e.g. "ㅅㅅㅈㅈ" for 삼성전자), searched with bisect
+- infix: bigram postings over the same keys, intersected and verified
+
+so a keystroke is answered from memory; search_stock_api only calls Yahoo on a miss.
+"""
+import threading
+from bisect import bisect_left
+
+from bs4 import BeautifulSoup
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from .models import SymbolMaster
+from .scraping import get_client
+
+KRX_LIST_URL = "https://kind.krx.co.kr/corpgeneral/corpList.do?method=download&searchType=13&marketType={market}"
+KRX_MARKETS = [('stockMkt', 'KOSPI', '.KS'), ('kosdaqMkt', 'KOSDAQ', '.KQ')]  # KONEX 는 Yahoo 시세가 없어 제외
+
+NASDAQ_LISTED_URL = "https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt"
+OTHER_LISTED_URL = "https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt"
+US_EXCHANGES = {'N': 'NYSE', 'A': 'NYSE American', 'P': 'NYSE Arca'}  # otherlisted.txt Exchange
+
+# Ranking among equally good matches
+EXCHANGE_RANK = {'KOSPI': 0, 'KOSDAQ': 1, 'NASDAQ': 2, 'NYSE': 3, 'NYSE American': 4, 'NYSE Arca': 5}
+
+VERSION_KEY = "symbols:version"
+
+CHOSUNG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+HANGUL_START, HANGUL_END = 0xAC00, 0xD7A3
+
+
+def normalize(text):
+    """
+    Lower-case, spaces/punctuation removed: "Samsung Electronics Co., Ltd." -> "samsungelectronicscoltd"
+    """
+    return "".join(ch for ch in (text or "").lower() if ch.isalnum())
+
+
+def chosung(text):
+    """
+    Initial consonants of Hangul syllables ("삼성전자" -> "ㅅㅅㅈㅈ"); other characters are dropped.
+    """
+    return "".join(
+        CHOSUNG[(ord(ch) - HANGUL_START) // 588]
+        for ch in text or "" if HANGUL_START <= ord(ch) <= HANGUL_END
+    )
+
+
+def is_chosung_query(text):
+    return bool(text) and all(ch in CHOSUNG for ch in text)
+
+
+def _bigrams(text):
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class SymbolIndex:
+    """
+    Immutable index over (symbol, code, name, exchange) entries. Use SymbolIndex.current()
+    for the process-wide instance built from SymbolMaster.
+    """
+    _lock = threading.Lock()
+    _current = None
+    _version = None
+    _loaded_on = None  # 버전 키가 공유되지 않는 캐시(locmem)에서도 하루 한 번은 다시 읽음
+
+    def __init__(self, entries):
+        self.entries = entries
+        prefix = []
+        postings = {}
+        self.keys = []
+        for i, (symbol, code, name, exchange) in enumerate(entries):
+            keys = tuple({normalize(code), normalize(symbol), normalize(name), chosung(name)} - {""})
+            self.keys.append(keys)
+            for key in keys:
+                prefix.append((key, i))
+                for gram in _bigrams(key):
+                    postings.setdefault(gram, []).append(i)
+        prefix.sort()
+        self.prefix_keys = [key for key, _ in prefix]
+        self.prefix_ids = [i for _, i in prefix]
+        self.postings = postings
+
+    @classmethod
+    def current(cls):
+        """
+        Process-wide index, rebuilt when SymbolMasterService.refresh() bumped the version
+        (or on the first search of a new day).
+        """
+        version = cache.get(VERSION_KEY, 0)
+        today = timezone.localdate()
+        if cls._current is None or cls._version != version or cls._loaded_on != today:
+            with cls._lock:
+                if cls._current is None or cls._version != version or cls._loaded_on != today:
+                    rows = SymbolMaster.objects.filter(is_active=True).values_list('symbol', 'code', 'name', 'exchange')
+                    cls._current = cls(list(rows))
+                    cls._version = version
+                    cls._loaded_on = today
+        return cls._current
+
+    def _prefix(self, q, limit):
+        found = []
+        pos = bisect_left(self.prefix_keys, q)
+        while pos < len(self.prefix_keys) and self.prefix_keys[pos].startswith(q) and len(found) < limit:
+            found.append((self.prefix_keys[pos] == q, self.prefix_ids[pos]))
+            pos += 1
+        return found
+
+    def _infix(self, q, limit):
+        grams = sorted(_bigrams(q), key=lambda g: len(self.postings.get(g, ())))
+        if not grams or grams[0] not in self.postings:
+            return []
+        # 가장 짧은 posting 을 돌며 나머지 bigram 포함 여부를 확인, limit 개를 찾으면 중단
+        others = [set(self.postings.get(gram, ())) for gram in grams[1:4]]
+        found = []
+        for i in self.postings[grams[0]]:
+            if all(i in other for other in others) and any(q in key for key in self.keys[i]):
+                found.append(i)
+                if len(found) >= limit:
+                    break
+        return found
+
+    def search(self, query, limit=10):
+        """
+        [{'symbol', 'code', 'name', 'exchange'}] best first: exact code/name, then prefix, then infix
+        matches; ties by exchange (KOSPI, KOSDAQ, NASDAQ, NYSE ...) and shorter name.
+        """
+        q = query.strip() if is_chosung_query(query.strip()) else normalize(query)
+        if not q or not self.entries:
+            return []
+        scored = {}
+        for exact, i in self._prefix(q, limit * 20):
+            scored[i] = min(scored.get(i, 2), 0 if exact else 1)
+        if len(scored) < limit and len(q) >= 2:
+            for i in self._infix(q, limit * 20):
+                scored.setdefault(i, 2)
+
+        def rank(i):
+            symbol, code, name, exchange = self.entries[i]
+            return (scored[i], EXCHANGE_RANK.get(exchange, 9), len(name), symbol)
+
+        return [
+            dict(zip(('symbol', 'code', 'name', 'exchange'), self.entries[i]))
+            for i in sorted(scored, key=rank)[:limit]
+        ]
+
+
+class SymbolMasterService:
+    @staticmethod
+    def search(query, limit=10):
+        return SymbolIndex.current().search(query, limit)
+
+    @staticmethod
+    def lookup(symbol_or_code):
+        """
+        Exact SymbolMaster row for "005930.KS" / "005930" / "AAPL" (KOSPI first for bare codes), or None.
+        """
+        rows = SymbolMaster.objects.filter(is_active=True)
+        return rows.filter(symbol=symbol_or_code).first() or rows.filter(code=symbol_or_code).order_by('symbol').first()
+
+    @staticmethod
+    def resolve(keyword):
+        """
+        Yahoo symbol for a typed keyword (symbol, code or name) from the local master, or None.
+        """
+        row = SymbolMasterService.lookup(keyword)
+        if row:
+            return row.symbol
+        hits = SymbolMasterService.search(keyword, limit=1)
+        return hits[0]['symbol'] if hits else None
+
+    @staticmethod
+    def parse_krx_list(html, exchange, suffix):
+        """
+        KIND corp list download (HTML table: 회사명, 종목코드, ...) -> SymbolMaster kwargs.
+        """
+        soup = BeautifulSoup(html, 'html.parser')
+        rows = soup.find_all('tr')
+        if not rows:
+            return []
+        header = [th.get_text(strip=True) for th in rows[0].find_all(['th', 'td'])]
+        try:
+            name_col, code_col = header.index('회사명'), header.index('종목코드')
+        except ValueError:
+            return []
+        listings = []
+        for row in rows[1:]:
+            cells = [td.get_text(strip=True) for td in row.find_all('td')]
+            if len(cells) <= max(name_col, code_col):
+                continue
+            code = cells[code_col].zfill(6)
+            listings.append({
+                'symbol': f"{code}{suffix}", 'code': code, 'name': cells[name_col],
+                'exchange': exchange, 'country': '한국', 'is_etf': False,
+            })
+        return listings
+
+    @staticmethod
+    def parse_us_list(text, nasdaq=True):
+        """
+        NASDAQ Trader symbol directory (pipe-delimited) -> SymbolMaster kwargs.
+        Test issues and symbols Yahoo writes differently (preferreds, '$') are skipped.
+        """
+        lines = [line for line in text.splitlines() if line and not line.startswith('File Creation Time')]
+        if not lines:
+            return []
+        header = lines[0].split('|')
+        listings = []
+        for line in lines[1:]:
+            row = dict(zip(header, line.split('|')))
+            if row.get('Test Issue') == 'Y':
+                continue
+            raw = row.get('Symbol') if nasdaq else row.get('ACT Symbol')
+            exchange = 'NASDAQ' if nasdaq else US_EXCHANGES.get(row.get('Exchange'))
+            if not raw or not exchange or '$' in raw:
+                continue
+            name = row.get('Security Name', '')
+            if ' - ' in name and ('Common Stock' in name or 'Ordinary Share' in name):
+                name = name.split(' - ')[0]
+            symbol = raw.replace('.', '-')  # BRK.B -> BRK-B (Yahoo)
+            listings.append({
+                'symbol': symbol, 'code': symbol, 'name': name,
+                'exchange': exchange, 'country': '미국', 'is_etf': row.get('ETF') == 'Y',
+            })
+        return listings
+
+    @staticmethod
+    def fetch_listings():
+        """
+        All listings from KIND and NASDAQ Trader. A source that fails is left out (its rows stay as they are).
+        Returns (listings, exchanges that were fetched).
+        """
+        client = get_client()
+        listings, fetched = [], set()
+        for market, exchange, suffix in KRX_MARKETS:
+            try:
+                res = client.get(KRX_LIST_URL.format(market=market))
+                res.raise_for_status()
+                res.encoding = 'euc-kr'
+                rows = SymbolMasterService.parse_krx_list(res.text, exchange, suffix)
+            except Exception as e:
+                print(f"KRX listing fetch failed ({exchange}): {e}")
+                continue
+            if rows:
+                listings += rows
+                fetched.add(exchange)
+        for url, nasdaq in ((NASDAQ_LISTED_URL, True), (OTHER_LISTED_URL, False)):
+            try:
+                res = client.get(url)
+                res.raise_for_status()
+                rows = SymbolMasterService.parse_us_list(res.text, nasdaq=nasdaq)
+            except Exception as e:
+                print(f"US listing fetch failed ({url}): {e}")
+                continue
+            listings += rows
+            fetched.update(row['exchange'] for row in rows)
+        return listings, fetched
+
+    @staticmethod
+    def save_listings(listings, exchanges):
+        """
+        Upserts `listings`; rows of `exchanges` missing from them are marked delisted.
+        Bumps the index version so every process rebuilds its SymbolIndex. Returns the row count.
+        """
+        fields = ['code', 'name', 'exchange', 'country', 'is_etf', 'is_active']
+        rows = {item['symbol']: SymbolMaster(is_active=True, **item) for item in listings}
+        with transaction.atomic():
+            SymbolMaster.objects.bulk_create(
+                list(rows.values()), batch_size=1000,
+                update_conflicts=True, unique_fields=['symbol'], update_fields=fields + ['updated_at'],
+            )
+            listed = SymbolMaster.objects.filter(exchange__in=exchanges, is_active=True).values_list('symbol', flat=True)
+            delisted = [symbol for symbol in listed if symbol not in rows]
+            for i in range(0, len(delisted), 500):
+                SymbolMaster.objects.filter(symbol__in=delisted[i:i + 500]).update(is_active=False)
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.set(VERSION_KEY, 1, None)
+        return len(rows)
+
+    @staticmethod
+    def refresh():
+        listings, exchanges = SymbolMasterService.fetch_listings()
+        if not listings:
+            return 0
+        return SymbolMasterService.save_listings(listings, exchanges)
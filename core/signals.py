@@ -1,7 +1,7 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.db.models import Sum
-from .models import User, UserProfile, Transaction, Organization
+from .models import User, UserProfile, Transaction, Organization, Stock, DailySnapshot, Agent, Department, UserFavorite
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -25,6 +25,80 @@ def recalculate_cash_balance(sender, instance, **kwargs):
     Organization.objects.filter(id=org.id).update(cash_balance=total_cash)
 
 
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+def sync_cost_basis(sender, instance, created=False, **kwargs):
+    """
+    Keeps TaxLots, Position (per-stock cost basis) and AccountPosition in sync with the ledger.
+    New trades are applied in O(1); edits/deletes of past trades and backdated new trades
+    (earlier than the last applied one) refresh that stock only.
+    """
+    if not instance.related_asset_id:
+        return
+    # Cascades from the organization/stock itself delete the lots and Position too
+    origin = kwargs.get('origin')
+    origin_model = getattr(origin, 'model', type(origin))
+    if origin_model in (Organization, Stock):
+        return
+    from .services import PositionService, LotService, AccountPositionService
+    if created and not PositionService.is_backdated(instance):
+        cost_removed = LotService.apply_transaction(instance)
+        PositionService.apply_transaction(instance, cost_removed=cost_removed)
+        AccountPositionService.apply_transaction(instance)
+    else:
+        # A just-created (backdated) sell has no consumption rows yet: pass its explicit lots
+        lot_ids = getattr(instance, '_lot_ids', None)
+        lot_results = LotService.refresh(
+            instance.organization_id, instance.related_asset_id,
+            lot_ids={instance.id: lot_ids} if created and lot_ids else None
+        )
+        PositionService.rebuild(instance.organization_id, instance.related_asset_id, lot_results=lot_results)
+        AccountPositionService.rebuild(instance.organization_id, instance.related_asset_id)
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+def invalidate_ledger_checkpoints(sender, instance, **kwargs):
+    """
+    Checkpoints on or after a changed transaction's date no longer match the ledger.
+    """
+    from .services_ledger import LedgerService
+    from .services_reconciliation import ReconciliationService
+    LedgerService.invalidate_checkpoints(instance.organization_id, instance.timestamp)
+    ReconciliationService.invalidate(instance.organization_id, instance.timestamp)
+
+@receiver(post_save, sender=DailySnapshot)
+@receiver(post_delete, sender=DailySnapshot)
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+def bump_ledger_cache_version(sender, instance, **kwargs):
+    """
+    Ledger writes invalidate every portfolio / financial / performance cache of the organization
+    (one version bump, see core.cache).
+    """
+    if instance.organization_id:
+        from .cache import bump_version
+        bump_version(instance.organization_id)
+
+
+@receiver(post_save, sender=Agent)
+@receiver(post_delete, sender=Agent)
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+def invalidate_sidebar_agents(sender, instance, **kwargs):
+    """
+    사이드바 AI 직원 목록 캐시 무효화 (부서명도 함께 표시되므로 Department 변경 포함)
+    """
+    if instance.organization_id:
+        from .services import SidebarService
+        SidebarService.invalidate_agents(instance.organization_id)
+
+@receiver(post_save, sender=UserFavorite)
+@receiver(post_delete, sender=UserFavorite)
+def invalidate_sidebar_favorites(sender, instance, **kwargs):
+    from .services import SidebarService
+    SidebarService.invalidate_favorites(instance.user_id)
+
+
 @receiver(post_save, sender=User)
 def create_organization_for_new_user(sender, instance, created, **kwargs):
     """
@@ -1,11 +1,15 @@
 from celery import shared_task
 from openai import OpenAI
+import logging
 import os
 import re
+from datetime import timedelta
 from django.utils import timezone
-from .models import Agent, Approval, Organization, User, Message, DailySnapshot, Transaction, Stock
+from .models import Agent, Approval, Organization, User, Message, DailySnapshot, Transaction, Stock, StockRefreshJob
 from django.db.models import Sum
 
+logger = logging.getLogger(__name__)
+
 # OpenAI 클라이언트 설정
 api_key = os.getenv("OPENAI_API_KEY")
 client = OpenAI(api_key=api_key)
@@ -164,9 +168,16 @@ def create_daily_snapshot(org_id):
         today = timezone.now().date()
         
         from .services import FinancialService
+        from .services_ledger import LedgerService
         
+        # 0. 전일 체크포인트 갱신 (이후 계산은 체크포인트 이후 거래만 반영)
+        LedgerService.state_as_of(org, today - timedelta(days=1), save_checkpoint=True)
+
         # 1. 재무 데이터 계산 (FinancialService 사용)
         financials = FinancialService.calculate_financials(org)
+        if financials['unvalued_stocks']:
+            # 환율 없는 종목이 있으면 과소평가된 스냅샷을 남기지 않음
+            return f"Snapshot skipped for {org.name} on {today}: {financials['unvalued_stocks']} holdings without FX rate"
         
         # 2. 스냅샷 저장
         snapshot, created = DailySnapshot.objects.update_or_create(
@@ -195,4 +206,217 @@ def create_daily_snapshot(org_id):
         )
         return f"Snapshot created for {org.name} on {today}"
     except Exception as e:
-        return f"Snapshot failed: {str(e)}"
\ No newline at end of file
+        return f"Snapshot failed: {str(e)}"
+# [New] 과거 스냅샷 백필 - 원장을 한 번만 순회하며 누락된 일자의 DailySnapshot 일괄 생성
+@shared_task
+def backfill_daily_snapshots(org_id, start=None, end=None, overwrite=False):
+    try:
+        from datetime import date
+        from .services_ledger import LedgerService
+
+        org = Organization.objects.get(id=org_id)
+        written = LedgerService.backfill_snapshots(
+            org,
+            start=date.fromisoformat(start) if start else None,
+            end=date.fromisoformat(end) if end else None,
+            overwrite=overwrite
+        )
+        return f"Backfilled {written} snapshots for {org.name}"
+    except Exception as e:
+        return f"Backfill failed: {str(e)}"
+
+# [New] 전체 조직 백필 - 조직별 태스크를 group 으로 병렬 실행
+@shared_task
+def backfill_all_daily_snapshots(start=None, end=None, overwrite=False):
+    from celery import group
+    org_ids = list(Organization.objects.values_list('id', flat=True))
+    group(backfill_daily_snapshots.s(org_id, start, end, overwrite) for org_id in org_ids).apply_async()
+    return f"Dispatched backfill for {len(org_ids)} organizations"
+
+# [New] 환율 갱신 - 하루 1회 전체 통화를 한 번에 받아 FxRate 테이블에 저장
+@shared_task
+def refresh_fx_rates():
+    from .services_fx import FxService
+    written = FxService.refresh_rates()
+    return f"FX rates updated ({written} rows)"
+
+def _one_by_one(fetch, with_history):
+    """
+    Adapts a single-stock fetch(stock[, full_history]) to the chunk signature of refresh_stocks.
+    """
+    def run(chunk, full_history_ids):
+        if with_history:
+            return [stock for stock in chunk if fetch(stock, stock.id in full_history_ids)]
+        return [stock for stock in chunk if fetch(stock)]
+    return run
+
+# [New] 종목 검색용 상장 종목 마스터 - 하루 1회 KRX/미국 상장 목록을 받아 SymbolMaster 갱신
+@shared_task
+def refresh_symbol_master():
+    from .services_symbols import SymbolMasterService
+    count = SymbolMasterService.refresh()
+    return f"Symbol master updated ({count} listings)"
+
+# [New] 종목 시세 일괄 갱신 - 스레드 풀에서 병렬 조회 (호스트별 동시 요청 제한), bulk_update 한 번으로 저장
+@shared_task
+def refresh_stocks(job_id):
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from django.conf import settings
+    from .services_candles import CandleService
+    from . import utils
+
+    # job.kind -> (fetch(묶음, 3년치 받을 id) -> 갱신된 종목, 묶음 크기, 저장 필드, 캔들 포함 여부)
+    # 시세/장 마감 단계는 yf.download 한 번에 여러 종목, 나머지는 종목별 호출
+    tiers = {
+        'manual': (_one_by_one(utils.fetch_stock_update, True), 1, utils.STOCK_UPDATE_FIELDS, True),
+        'quotes': (lambda chunk, _: utils.batch_fetch_quotes(chunk), utils.DOWNLOAD_BATCH_SIZE, utils.QUOTE_FIELDS, False),
+        'eod': (utils.batch_fetch_end_of_day, utils.DOWNLOAD_BATCH_SIZE, utils.QUOTE_FIELDS + utils.CANDLE_FIELDS, True),
+        'fundamentals': (_one_by_one(utils.fetch_fundamentals, False), 1, utils.FUNDAMENTAL_FIELDS, False),
+    }
+
+    job = StockRefreshJob.objects.get(id=job_id)
+    fetch, chunk_size, fields, with_candles = tiers[job.kind]
+    try:
+        stocks = Stock.objects.all()
+        if job.stock_ids:
+            stocks = stocks.filter(id__in=job.stock_ids)
+        stocks = list(stocks)
+
+        job.status = 'running'
+        job.total = len(stocks)
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'total', 'started_at'])
+
+        # 봉이 하나도 없는 종목만 3년치를 받음 (나머지는 최근 1개월)
+        full_history_ids = set()
+        if with_candles:
+            has_candles = CandleService.latest_timestamps([s.id for s in stocks])
+            full_history_ids = {s.id for s in stocks if s.id not in has_candles}
+
+        chunks = [stocks[i:i + chunk_size] for i in range(0, len(stocks), chunk_size)]
+        updated = []
+        processed = failed = 0
+        report_every = max(1, len(chunks) // 50)  # 진행률은 약 2% 단위로 기록
+        workers = getattr(settings, 'STOCK_REFRESH_WORKERS', 8)
+        # 워커 스레드는 네트워크 조회만 하고 DB 접근은 이 스레드에서만
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(fetch, chunk, full_history_ids): chunk for chunk in chunks}
+            for done, future in enumerate(as_completed(futures), 1):
+                chunk = futures[future]
+                try:
+                    ok = future.result()
+                except Exception as e:
+                    logger.exception(f"Stock refresh chunk failed ({len(chunk)} stocks): {e}")
+                    ok = []
+                processed += len(chunk)
+                updated.extend(ok)
+                failed += len(chunk) - len(ok)
+                if done % report_every == 0:
+                    StockRefreshJob.objects.filter(id=job.id).update(
+                        processed=processed, succeeded=len(updated), failed=failed
+                    )
+
+        Stock.objects.bulk_update(updated, list(dict.fromkeys(fields)), batch_size=100)
+        if with_candles:
+            utils.save_fetched_candles(updated)
+
+        job.status = 'done'
+        job.processed, job.succeeded, job.failed = processed, len(updated), failed
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'processed', 'succeeded', 'failed', 'finished_at'])
+        return f"Refreshed {len(updated)}/{len(stocks)} stocks"
+    except Exception as e:
+        StockRefreshJob.objects.filter(id=job.id).update(status='failed', error=str(e), finished_at=timezone.now())
+        return f"Stock refresh failed: {str(e)}"
+
+# [New] 장 운영 시간 기반 정기 갱신 (Celery beat, settings.CELERY_BEAT_SCHEDULE)
+STALE_JOB_AFTER = timedelta(hours=1)  # 이보다 오래 running 인 작업은 죽은 워커로 보고 무시
+
+def _stock_ids_for_market(market):
+    from .market_hours import market_for_country
+    return [sid for sid, country in Stock.objects.values_list('id', 'country') if market_for_country(country) == market]
+
+def _run_scheduled_refresh(kind, market, stock_ids=None):
+    """
+    Runs refresh_stocks inline (already on a worker) for the stocks of `market` (or `stock_ids`),
+    unless a job of the same kind/market is still running.
+    """
+    busy = StockRefreshJob.objects.filter(
+        kind=kind, market=market, status__in=['pending', 'running'],
+        created_at__gte=timezone.now() - STALE_JOB_AFTER,
+    ).exists()
+    if busy:
+        return f"{kind} refresh for {market} still running, skipped"
+    if stock_ids is None:
+        stock_ids = _stock_ids_for_market(market)
+    if not stock_ids:
+        return f"No stocks for {market or kind}"
+    job = StockRefreshJob.objects.create(kind=kind, market=market, stock_ids=stock_ids, total=len(stock_ids))
+    return refresh_stocks(job.id)
+
+@shared_task
+def refresh_open_market_quotes():
+    """
+    Beat: every QUOTE_REFRESH_INTERVAL seconds. Refreshes the quotes (one fast_info call per stock)
+    of stocks whose market is in session (weekends and holidays of core.market_hours are skipped),
+    so stored prices stay fresh without request-time network calls.
+    """
+    from .market_hours import open_markets
+    markets = open_markets()
+    if not markets:
+        return "No market open"
+    return [_run_scheduled_refresh('quotes', market) for market in markets]
+
+@shared_task
+def refresh_end_of_day():
+    """
+    Beat: every EOD_REFRESH_CHECK_INTERVAL seconds. Once per trading session, after the close
+    (plus EOD_REFRESH_DELAY for the closing auction / data vendor), stores the closing quote and
+    the candles of that market's stocks.
+    """
+    from django.conf import settings
+    from .market_hours import MARKETS, MarketCalendarUnavailable, last_close
+    now = timezone.now()
+    delay = timedelta(seconds=getattr(settings, 'EOD_REFRESH_DELAY', 30 * 60))
+    results = []
+    for market in MARKETS:
+        try:
+            session_close = last_close(market, now - delay)
+        except MarketCalendarUnavailable as e:
+            logger.error(f"{e}: skipping end-of-day refresh of {market}")
+            continue
+        if now - session_close > timedelta(hours=12):
+            continue  # 오래된 세션은 다음 세션 마감 때 처리
+        done = StockRefreshJob.objects.filter(kind='eod', market=market, created_at__gte=session_close).exists()
+        if not done:
+            results.append(_run_scheduled_refresh('eod', market))
+    return results or "Nothing to do"
+
+@shared_task
+def refresh_fundamentals():
+    """
+    Beat: daily. Refreshes PER/PBR/market cap/description of stocks whose fundamentals are older
+    than FUNDAMENTALS_MAX_AGE (weekly by default), spreading the heavy calls over the week.
+    """
+    from django.conf import settings
+    from django.db.models import Q
+    max_age = timedelta(seconds=getattr(settings, 'FUNDAMENTALS_MAX_AGE', 60 * 60 * 24 * 7))
+    stock_ids = list(
+        Stock.objects.filter(Q(fundamentals_updated_at__isnull=True) | Q(fundamentals_updated_at__lt=timezone.now() - max_age))
+        .values_list('id', flat=True)
+    )
+    return _run_scheduled_refresh('fundamentals', '', stock_ids)
+
+# [New] 단일 종목 시세 갱신 (get_stock_detail 의 stale-while-revalidate)
+@shared_task
+def refresh_stock_quote(stock_id):
+    from .services import QuoteService
+    from .utils import fetch_quote, QUOTE_FIELDS
+    try:
+        stock = Stock.objects.get(id=stock_id)
+        if not fetch_quote(stock):
+            return f"Quote refresh failed for {stock.code}"
+        stock.save(update_fields=QUOTE_FIELDS)
+        return f"Quote refreshed for {stock.code}"
+    finally:
+        QuoteService.release(stock_id)
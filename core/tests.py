@@ -0,0 +1,46 @@
+from datetime import datetime
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from core import market_hours
+from core.market_hours import MarketCalendarUnavailable
+
+
+@mock.patch('core.market_hours._calendar_holidays', return_value=None)  # exchange_calendars 미설치 상황
+class MarketHoursUncoveredYearTests(SimpleTestCase):
+    """
+    A year that neither exchange_calendars nor the HOLIDAYS table covers must not count as open.
+    """
+    # 2030-01-02 (Wed) 10:00 KST: a regular session time, in a year HOLIDAYS does not list
+    UNCOVERED = datetime(2030, 1, 2, 10, 0, tzinfo=ZoneInfo('Asia/Seoul'))
+
+    def setUp(self):
+        market_hours._holidays.clear()
+
+    def test_holidays_raise(self, _):
+        with self.assertRaises(MarketCalendarUnavailable):
+            market_hours.holidays('KRX', 2030)
+        with self.assertRaises(MarketCalendarUnavailable):
+            market_hours.is_market_open('KRX', self.UNCOVERED)
+
+    def test_scheduled_refresh_skips_market(self, _):
+        with self.assertLogs('core.market_hours', level='ERROR'):
+            self.assertNotIn('KRX', market_hours.open_markets(self.UNCOVERED))
+
+    def test_quote_uses_short_ttl(self, _):
+        stock = mock.Mock(country='KR')
+        with self.assertLogs('core.market_hours', level='ERROR'):
+            ttl = market_hours.quote_ttl(stock, self.UNCOVERED)
+        self.assertEqual(ttl, settings.QUOTE_TTL_MARKET_OPEN)
+
+    @override_settings(MARKET_HOLIDAYS={'KRX': ['2030-01-01']})
+    def test_settings_cover_year(self, _):
+        self.assertTrue(market_hours.is_market_open('KRX', self.UNCOVERED))
+
+    def test_covered_year_unchanged(self, _):
+        # 2026-10-09 (Fri) 한글날: HOLIDAYS 에 있음
+        self.assertFalse(market_hours.is_market_open('KRX', datetime(2026, 10, 9, 10, 0, tzinfo=ZoneInfo('Asia/Seoul'))))
+        self.assertTrue(market_hours.is_market_open('KRX', datetime(2026, 10, 8, 10, 0, tzinfo=ZoneInfo('Asia/Seoul'))))
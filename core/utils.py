@@ -234,198 +234,293 @@ def get_agent_by_stock(stock_name, stock_code):
     return None
 
 
+from decimal import Decimal
 import yfinance as yf
+from .scraping import host_slot, fetch_naver_stock_page
+
+# 갱신 단계(tier)별로 바뀌는 필드 - 각 단계는 자기 필드만 bulk_update
+# - quote: 종목당 fast_info 한 번, 또는 batch_fetch_quotes 로 묶음당 yf.download 한 번 (장중 수 분 간격)
+# - candles: 주봉 history, 하루 한 번 (장 마감 후)
+# - fundamentals: ticker.info + Naver 페이지, 주 1회
+# 어느 단계든 .KS/.KQ 를 처음 판별하면 yahoo_suffix 도 함께 저장
+QUOTE_FIELDS = ['current_price', 'high_52w', 'low_52w', 'quote_updated_at', 'yahoo_suffix', 'updated_at']
+CANDLE_FIELDS = ['candles_updated_at', 'yahoo_suffix', 'updated_at']
+FUNDAMENTAL_FIELDS = ['name', 'market_cap', 'per', 'pbr', 'description', 'country', 'fundamentals_updated_at', 'yahoo_suffix', 'updated_at']
+KOREAN_SUFFIXES = ['.KS', '.KQ']
+DOWNLOAD_BATCH_SIZE = 100  # yf.download 한 번에 넣는 티커 수
+STOCK_UPDATE_FIELDS = list(dict.fromkeys(QUOTE_FIELDS + CANDLE_FIELDS + FUNDAMENTAL_FIELDS))
 
 def update_stock(stock_obj):
     """
     Updates a single Stock object with data from Yahoo Finance.
     Returns True if successful, False otherwise.
     """
-    try:
-        # 1. Resolve Symbol
-        symbol = stock_obj.code
-        
-        # Check if Korean stock (6 digits) without suffix
-        if symbol.isdigit() and len(symbol) == 6:
-            # Try .KS first (KOSPI), then .KQ (KOSDAQ) - Naive approach
-            # Or assume .KS for now, or check metadata. 
-            # Better strategy: Try .KS, if error/empty, try .KQ
-            try_symbols = [f"{symbol}.KS", f"{symbol}.KQ"]
-        else:
-            try_symbols = [symbol]
+    from .services_candles import CandleService  # models -> utils 순환 import 회피
+    full_history = not CandleService.latest_timestamps([stock_obj.id])
+    if not fetch_stock_update(stock_obj, full_history=full_history):
+        return False
+    stock_obj.save()
+    save_fetched_candles([stock_obj])
+    return True
 
-        ticker = None
-        info = None
-        
-        for sym in try_symbols:
-            t = yf.Ticker(sym)
-            try:
-                # fast_info is faster and often sufficient for price
-                i = t.fast_info
-                if i.last_price is not None:
-                    ticker = t
-                    info = i
-                    break
-            except Exception:
-                continue
-        
-        if not ticker:
-            print(f"Failed to find ticker for {stock_obj.name} ({stock_obj.code})")
-            return False
+def save_fetched_candles(stocks):
+    """
+    Upserts the weekly (and end-of-day daily) bars collected by the fetch functions
+    (one query for the latest bars + bulk upsert per interval).
+    """
+    from .services_candles import CandleService
+    written = CandleService.upsert({s.id: getattr(s, 'fetched_candles', None) for s in stocks}, interval='1wk')
+    written += CandleService.upsert({s.id: getattr(s, 'fetched_daily_candles', None) for s in stocks}, interval='1d')
+    return written
 
-        # 2. Update Basic Info
-        stock_obj.current_price = info.last_price
-        
-        # Extended Info (Regular info dict for some fields)
+def yahoo_symbols(stock_obj):
+    """
+    Yahoo symbols to try for the stock. 6-digit Korean codes have no suffix: the stored
+    yahoo_suffix is used when known, otherwise .KS (KOSPI) is tried before .KQ (KOSDAQ).
+    """
+    symbol = stock_obj.code
+    if symbol.isdigit() and len(symbol) == 6:
+        if stock_obj.yahoo_suffix:
+            return [stock_obj.yahoo_symbol]
+        return [f"{symbol}{suffix}" for suffix in KOREAN_SUFFIXES]
+    return [symbol]
+
+def _resolved(stock_obj, symbol):
+    """
+    Remembers which candidate symbol answered (persisted with the tier's fields).
+    """
+    if symbol != stock_obj.code:
+        stock_obj.yahoo_suffix = symbol[len(stock_obj.code):]
+
+def download_history(symbols, period, interval='1d'):
+    """
+    One yf.download call for many symbols -> {symbol: DataFrame} (symbols without data are absent).
+    Weekly bars keep their instant (UTC) so they match the ones stored from Ticker.history;
+    daily bars are exchange-local dates (stored as UTC midnight, like the backtest downloads).
+    """
+    if not symbols:
+        return {}
+    with host_slot('yahoo'):
+        data = yf.download(
+            symbols, period=period, interval=interval, group_by='ticker', auto_adjust=False,
+            ignore_tz=(interval == '1d'), threads=False, progress=False,
+        )
+    frames = {}
+    if data is None or data.empty:
+        return frames
+    for symbol in symbols:
+        if symbol not in data.columns.get_level_values(0):
+            continue
+        df = data[symbol].dropna(subset=['Close'])
+        if not df.empty:
+            frames[symbol] = df
+    return frames
+
+def _download_for(stocks, period, interval):
+    """
+    {stock_id: (symbol, DataFrame)} for `stocks`; unresolved Korean codes go in with both
+    suffixes and the one that returns data is kept.
+    """
+    candidates = {}
+    for stock in stocks:
+        for symbol in yahoo_symbols(stock):
+            candidates.setdefault(symbol, stock)
+    frames = {}
+    symbols = list(candidates)
+    for i in range(0, len(symbols), DOWNLOAD_BATCH_SIZE):
         try:
-            full_info = ticker.info
-            stock_obj.high_52w = full_info.get('fiftyTwoWeekHigh')
-            stock_obj.low_52w = full_info.get('fiftyTwoWeekLow')
-            stock_obj.market_cap = full_info.get('marketCap')
-            stock_obj.per = full_info.get('trailingPE')
-            stock_obj.pbr = full_info.get('priceToBook')
-            stock_obj.description = full_info.get('longBusinessSummary') or ""
-            
-            # Country Check (if empty)
-            if not stock_obj.country:
-                ctry = full_info.get('country', '')
-                if ctry == 'South Korea': stock_obj.country = '한국'
-                elif ctry == 'United States': stock_obj.country = '미국'
-                else: stock_obj.country = ctry
-            
-            # [Naver Integration] 
-            # Prioritize Naver for Korean stocks or general description
-            # This logic was migrated from views.py
-            if stock_obj.code.isdigit() and len(stock_obj.code) == 6:
-                naver_data = get_naver_stock_extra_info(stock_obj.code)
-                if naver_data.get('market_cap'):
-                    stock_obj.market_cap = naver_data['market_cap']
-                
-                # Naver Description
-                if naver_data.get('description'):
-                    stock_obj.description = naver_data['description']
-                
-                # Naver Name Check
-                naver_name = get_naver_stock_name(stock_obj.code)
-                if naver_name and naver_name != stock_obj.name:
-                    stock_obj.name = naver_name
-                    
+            frames.update(download_history(symbols[i:i + DOWNLOAD_BATCH_SIZE], period, interval))
         except Exception as e:
-            print(f"Error fetching full info for {stock_obj.name}: {e}")
+            print(f"Batch download failed ({period}/{interval}): {e}")
+    found = {}
+    for symbol, stock in candidates.items():
+        if symbol in frames and stock.id not in found:
+            found[stock.id] = (symbol, frames[symbol])
+    return found
+
+def batch_fetch_quotes(stocks, period='5d'):
+    """
+    Quote tier for many stocks with yf.download (one call per DOWNLOAD_BATCH_SIZE tickers).
+    With period='1y' the 52-week range is recomputed from the year of daily bars, which are also
+    kept in stock.fetched_daily_candles; shorter periods only widen the range.
+    Returns the stocks that got a price.
+    """
+    from .services_candles import CandleService
+    found = _download_for(stocks, period, '1d')
+    now = timezone.now()
+    updated = []
+    for stock in stocks:
+        if stock.id not in found:
+            continue
+        symbol, df = found[stock.id]
+        _resolved(stock, symbol)
+        stock.current_price = round(float(df['Close'].iloc[-1]), 2)
+        high, low = float(df['High'].max()), float(df['Low'].min())
+        if period == '1y':
+            stock.fetched_daily_candles = CandleService.rows_from_history(df)
+        if period == '1y' or stock.high_52w is None or stock.low_52w is None:
+            stock.high_52w, stock.low_52w = round(high, 2), round(low, 2)
+        else:
+            stock.high_52w = max(Decimal(stock.high_52w), round(Decimal(high), 2))
+            stock.low_52w = min(Decimal(stock.low_52w), round(Decimal(low), 2))
+        stock.quote_updated_at = now
+        stock.updated_at = now
+        updated.append(stock)
+    return updated
+
+def batch_fetch_candles(stocks, full_history_ids=()):
+    """
+    Candle tier for many stocks: weekly bars into stock.fetched_candles, 3y for `full_history_ids`
+    and the last month for the rest. Returns the stocks that got bars.
+    """
+    from .services_candles import CandleService
+    now = timezone.now()
+    updated = []
+    for period, group in (('3y', [s for s in stocks if s.id in full_history_ids]),
+                          ('1mo', [s for s in stocks if s.id not in full_history_ids])):
+        found = _download_for(group, period, '1wk')
+        for stock in group:
+            if stock.id not in found:
+                continue
+            symbol, df = found[stock.id]
+            _resolved(stock, symbol)
+            stock.fetched_candles = CandleService.rows_from_history(df)
+            stock.candles_updated_at = now
+            stock.updated_at = now
+            updated.append(stock)
+    return updated
+
+def batch_fetch_end_of_day(stocks, full_history_ids=()):
+    """
+    End-of-day tier for many stocks: closing quote with the exact 52-week range + weekly candles.
+    Returns the stocks that got a price.
+    """
+    updated = batch_fetch_quotes(stocks, period='1y')
+    batch_fetch_candles(updated, full_history_ids)
+    return updated
+
+def fetch_stock_update(stock_obj, full_history=False):
+    """
+    All tiers (quote + fundamentals + candles) into `stock_obj` without saving (no DB access),
+    so it can run in worker threads and be persisted with one bulk_update of STOCK_UPDATE_FIELDS.
+    Returns True if the quote was fetched.
+    """
+    if not fetch_quote(stock_obj):
+        return False
+    fetch_fundamentals(stock_obj)
+    fetch_candles(stock_obj, full_history=full_history)
+    return True
 
-        # 3. Update Candle Data (Optimize: Fetch 1mo and merge)
+def fetch_quote(stock_obj):
+    """
+    Quote tier: one fast_info lookup per stock (last price and 52-week range come from the same
+    cached 1y price series). Returns True if successful.
+    """
+    for sym in yahoo_symbols(stock_obj):
         try:
-            # Fetch recent 1 month data
-            hist = ticker.history(period="1mo", interval="1wk")
-            
-            new_data = []
-            for date, row in hist.iterrows():
-                # ApexCharts expects timestamp in ms
-                ts = int(date.timestamp() * 1000)
-                new_data.append({
-                    'x': ts,
-                    'y': [row['Open'], row['High'], row['Low'], row['Close']]
-                })
-            
-            # Load existing data
-            existing_data = stock_obj.candle_data if isinstance(stock_obj.candle_data, list) else []
-            
-            if not existing_data:
-                # If no existing data, maybe fetch 3y for initialization (first time)
-                # But user said "update ... recent 1 month", implying optimization for existing.
-                # If truly empty, we might want to fetch more. 
-                # Let's check if we should fallback to 3y if empty.
-                # For safety, if empty, let's just fetch 3y once.
-                hist_full = ticker.history(period="3y", interval="1wk")
-                full_data = []
-                for date, row in hist_full.iterrows():
-                    ts = int(date.timestamp() * 1000)
-                    full_data.append({
-                        'x': ts,
-                        'y': [row['Open'], row['High'], row['Low'], row['Close']]
-                    })
-                stock_obj.candle_data = full_data
-            else:
-                # Merger Strategy:
-                # Create dict from existing by timestamp for easy lookup/overwrite
-                data_map = {item['x']: item for item in existing_data}
-                
-                # Update with new data
-                for item in new_data:
-                    data_map[item['x']] = item
-                
-                # Convert back to list and sort
-                merged_data = list(data_map.values())
-                merged_data.sort(key=lambda k: k['x'])
-                
-                stock_obj.candle_data = merged_data
+            with host_slot('yahoo'):
+                info = yf.Ticker(sym).fast_info
+                last_price = info.last_price
+                if last_price is None:
+                    continue
+                high_52w, low_52w = info.year_high, info.year_low
+        except Exception:
+            continue
+        now = timezone.now()
+        _resolved(stock_obj, sym)
+        stock_obj.current_price = last_price
+        stock_obj.high_52w = high_52w
+        stock_obj.low_52w = low_52w
+        stock_obj.quote_updated_at = now
+        stock_obj.updated_at = now  # bulk_update 는 auto_now 를 채우지 않음
+        return True
+    print(f"Failed to find ticker for {stock_obj.name} ({stock_obj.code})")
+    return False
 
+def fetch_candles(stock_obj, full_history=False):
+    """
+    Candle tier: weekly bars into stock_obj.fetched_candles (3y when full_history, else the last
+    month) for save_fetched_candles. Returns True if any bars were received.
+    """
+    from .services_candles import CandleService
+    for sym in yahoo_symbols(stock_obj):
+        try:
+            with host_slot('yahoo'):
+                hist = yf.Ticker(sym).history(period="3y" if full_history else "1mo", interval="1wk", auto_adjust=False)
         except Exception as e:
             print(f"Error fetching history for {stock_obj.name}: {e}")
-
-        stock_obj.save()
+            continue
+        if hist.empty:
+            continue
+        now = timezone.now()
+        _resolved(stock_obj, sym)
+        stock_obj.fetched_candles = CandleService.rows_from_history(hist)
+        stock_obj.candles_updated_at = now
+        stock_obj.updated_at = now
         return True
-        
-    except Exception as e:
-        print(f"Generla error updating {stock_obj.name}: {e}")
+    return False
+
+def fetch_fundamentals(stock_obj):
+    """
+    Fundamentals tier: Yahoo info dict (PER/PBR/market cap/description/country), then the Naver
+    item page for Korean stocks (market cap, description and name take precedence).
+    Returns True if successful.
+    """
+    full_info = None
+    for sym in yahoo_symbols(stock_obj):
+        try:
+            with host_slot('yahoo'):
+                info = yf.Ticker(sym).info
+        except Exception as e:
+            print(f"Error fetching full info for {stock_obj.name}: {e}")
+            continue
+        if info and (info.get('regularMarketPrice') is not None or info.get('longName')):
+            full_info = info
+            _resolved(stock_obj, sym)
+            break
+    if full_info is None:
         return False
 
-import requests
-from bs4 import BeautifulSoup
+    stock_obj.market_cap = full_info.get('marketCap')
+    stock_obj.per = full_info.get('trailingPE')
+    stock_obj.pbr = full_info.get('priceToBook')
+    stock_obj.description = full_info.get('longBusinessSummary') or ""
+
+    # Country Check (if empty)
+    if not stock_obj.country:
+        ctry = full_info.get('country', '')
+        if ctry == 'South Korea': stock_obj.country = '한국'
+        elif ctry == 'United States': stock_obj.country = '미국'
+        else: stock_obj.country = ctry
+
+    # [Naver Integration]
+    # Prioritize Naver for Korean stocks or general description
+    if stock_obj.code.isdigit() and len(stock_obj.code) == 6:
+        # 종목 페이지는 한 번만 받아 이름/시가총액/개요를 함께 파싱
+        naver_data = fetch_naver_stock_page(stock_obj.code)
+        if naver_data.get('market_cap'):
+            stock_obj.market_cap = naver_data['market_cap']
+        if naver_data.get('description'):
+            stock_obj.description = naver_data['description']
+        naver_name = naver_data.get('name')
+        if naver_name and naver_name != stock_obj.name:
+            stock_obj.name = naver_name
+
+    now = timezone.now()
+    stock_obj.fundamentals_updated_at = now
+    stock_obj.updated_at = now
+    return True
 
 def get_naver_stock_name(code):
     """
     Naver 금융에서 종목명 크롤링 (실시간/정확)
     """
-    try:
-        url = f"https://finance.naver.com/item/main.naver?code={code}"
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        res = requests.get(url, headers=headers)
-        soup = BeautifulSoup(res.text, 'html.parser')
-        
-        name_tag = soup.select_one('.wrap_company h2 a')
-        if name_tag:
-            return name_tag.text.strip()
-            
-        return None
-    except Exception as e:
-        print(f"Naver checking failed: {e}")
-        return None
+    return fetch_naver_stock_page(code)['name']
 
 def get_naver_stock_extra_info(code, exchange=''):
     """
     Naver 금융에서 시가총액 및 기업개요 가져오기
+    (해외 주식은 Naver 페이지 구조가 달라 값이 비어 있을 수 있음 -> Yahoo 정보 사용)
     """
-    data = {'market_cap': None, 'description': None}
-    try:
-        url = f"https://finance.naver.com/item/main.naver?code={code}"
-        # 해외 주식일 경우 (Naver 해외증권은 구조가 다름 -> 여기서는 국내 위주 혹은 해외는 Yahoo 사용)
-        # Naver 해외 증권 URL 구조 확인 필요. 일단 국내만 시도.
-        
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        res = requests.get(url, headers=headers)
-        soup = BeautifulSoup(res.text, 'html.parser')
-
-        # 1. Market Cap (시가총액)
-        # <em id="_market_sum">367조 1,416</em>
-        mkt_sum = soup.select_one('#_market_sum')
-        if mkt_sum:
-            # 367조 1,416 -> 숫자 변환
-            # 조 단위 처리, 억 단위 처리
-            txt = mkt_sum.text.strip().replace(',', '').replace('조', '').replace(' ', '')
-            # "3671416" (억 단위) -> * 100,000,000
-            try:
-                data['market_cap'] = int(txt) * 100000000
-            except:
-                pass
-
-        # 2. Description (기업개요)
-        # <div class="summary_info"> <p> ... </p> </div>
-        summary = soup.select_one('.summary_info p')
-        if summary:
-            data['description'] = summary.text.strip()
-            
-        return data
-    except Exception as e:
-        print(f"Naver extra info failed: {e}")
-        return data
+    data = fetch_naver_stock_page(code)
+    return {'market_cap': data['market_cap'], 'description': data['description']}
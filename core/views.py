@@ -13,13 +13,18 @@ from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views import View
 from datetime import datetime, time
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 
-from .models import User, Organization, Department, DailySnapshot, Transaction, Stock, InterestStock, Agent, Message, Approval, InvestmentLog, Account, TradeNotification, UserFavorite, PortfolioDisclosure, Post, Follow
+from .models import User, Organization, Department, DailySnapshot, Transaction, Stock, InterestStock, Agent, Message, Approval, InvestmentLog, Account, TradeNotification, UserFavorite, PortfolioDisclosure, Post, Follow, Position, StockRefreshJob
 from .forms import AgentForm, UserChangeForm, OrganizationForm, SignUpForm # [New]
-from .services import TransactionService, FinancialService
-from .tasks import create_approval_draft, create_daily_snapshot
+from .services import TransactionService, FinancialService, LotService, AccountPositionService, SidebarService, QuoteService
+from .services_ledger import LedgerService
+from .services_fx import FxService, currency_for, valuation
+from .services_performance import PerformanceService
+from .services_symbols import SymbolMasterService
+from .tasks import create_approval_draft, create_daily_snapshot, refresh_stocks, STALE_JOB_AFTER
 from .utils import parse_mirae_sms, format_approval_content, get_agent_by_stock
+from .scraping import get_client, fetch_naver_stock_page
 
 COUNTRY_MAP = {
     'South Korea': '한국',
@@ -61,9 +66,10 @@ def identify_stock_country(ticker_symbol, info):
     return ""
 
 def get_sidebar_agents(user):
-    if user.organization:
-        return Agent.objects.filter(organization=user.organization)
-    return Agent.objects.none()
+    # 조직별 캐시 (Agent/Department 변경 시 시그널로 무효화)
+    if user.organization_id:
+        return SidebarService.get_agents(user.organization_id)
+    return []
 
 def signup(request):
     if request.method == 'POST':
@@ -98,7 +104,7 @@ def dashboard(request):
     today = timezone.now().date()
     
     # [Favorites Logic]
-    favorites = UserFavorite.objects.filter(user=request.user)
+    favorites = SidebarService.get_favorites(request.user.id)
     
     return render(request, 'index.html', { # [Note] Keep index.html as the internal dashboard template
         'agents': agents,
@@ -129,7 +135,8 @@ def org_chart(request):
 # ==========================================
 @login_required
 def agent_management(request):
-    agents = Agent.objects.filter(organization=request.user.organization).select_related('department_obj')
+    # 카드마다 부서명/담당 종목을 표시 -> 한 번에 로드
+    agents = Agent.objects.filter(organization=request.user.organization).select_related('department_obj').prefetch_related('managed_stocks')
     return render(request, 'agent_management.html', {
         'agents': agents,
         'active_main_menu': 'organization',
@@ -224,6 +231,8 @@ def update_favorite_order(request):
             
             for index, fav_id in enumerate(order_list):
                 UserFavorite.objects.filter(id=fav_id, user=request.user).update(display_order=index)
+            # update()는 시그널을 발생시키지 않으므로 직접 무효화
+            SidebarService.invalidate_favorites(request.user.id)
                 
             return JsonResponse({'status': 'success'})
         except Exception as e:
@@ -363,27 +372,28 @@ def investment_management(request):
 
     # [Removed nested get_stock_detail]
             
+    # Current prices in KRW (one FX lookup per currency)
+    held = {sid: p['stock'] for sid, p in portfolio_map.items() if p['quantity'] > 0}
+    currencies = {sid: currency_for(stock.country) for sid, stock in held.items()}
+    krw_prices = FxService.to_krw({sid: stock.current_price for sid, stock in held.items()}, currencies)
+
     # Convert to list and filter zero holdings
     portfolio_list = []
     for sid, p in portfolio_map.items():
         if p['quantity'] > 0:
             stock = p['stock']
-            # Fetch Current Price
-            cur_price = stock.current_price
-            if not cur_price:
-                # Fallback check
-                 cur_price = 0
-            
-            p['current_price'] = cur_price
-            p['eval_amount'] = cur_price * p['quantity']
-            
-            # Yield
-            if p['total_amount'] > 0:
-                 p['yield'] = ((p['eval_amount'] - p['total_amount']) / p['total_amount']) * 100
-            else:
-                 p['yield'] = 0
-                 
+            # Current price stays in the listing currency; valuation is in KRW
+            p['current_price'] = stock.current_price or 0
+            p['currency'] = currencies[sid]
+            # Eval amount / yield (None when the currency has no FX rate)
+            p['eval_amount'], p['yield'] = valuation(krw_prices[sid], p['quantity'], p['total_amount'])
+
             portfolio_list.append(p)
+
+    # Per-lot unrealized P/L (open lots only, one query)
+    lot_map = LotService.get_open_lots(user.organization, stock_ids=[p['stock'].id for p in portfolio_list])
+    for p in portfolio_list:
+        p['lots'] = lot_map.get(p['stock'].id, [])
             
     # Pagination
     pf_paginator = Paginator(portfolio_list, 5)
@@ -391,8 +401,11 @@ def investment_management(request):
     portfolio = pf_paginator.get_page(pf_page_number)
     
     # Summary Calculation
-    total_eval_amount = sum(p['eval_amount'] for p in portfolio_list)
+    # 환율이 없어 평가할 수 없는 종목은 평가금액/수익률 합계에서 제외
+    valued = [p for p in portfolio_list if p['eval_amount'] is not None]
+    total_eval_amount = sum(p['eval_amount'] for p in valued)
     total_buy_amount = sum(p['total_amount'] for p in portfolio_list)
+    valued_buy_amount = sum(p['total_amount'] for p in valued)
     
     # Calculate Total Sell Amount from Transactions
     total_sell_amount = Transaction.objects.filter(
@@ -402,8 +415,8 @@ def investment_management(request):
     # Note: Sell amount in DB is positive (Revenue). No modification needed.
     
     total_yield = 0
-    if total_buy_amount > 0:
-        total_yield = ((total_eval_amount - total_buy_amount) / total_buy_amount) * 100
+    if valued_buy_amount > 0:
+        total_yield = ((total_eval_amount - valued_buy_amount) / valued_buy_amount) * 100
 
     yield_color = 'text-success' if total_yield >= 0 else 'text-orange'
     if total_yield == 0: yield_color = 'text-dark'
@@ -414,7 +427,8 @@ def investment_management(request):
         'total_sell': total_sell_amount,
         'eval_balance': total_eval_amount, # Renamed label in Template, variable kept for compatibility
         'yield': round(total_yield, 2),
-        'yield_color': yield_color
+        'yield_color': yield_color,
+        'unvalued': len(portfolio_list) - len(valued),
     }
 
     # 2. 결재 대기 목록
@@ -536,47 +550,96 @@ def financial_management(request):
         selected_date = parse_date(selected_date_str)
 
     latest_snapshot = None
+    historical_holdings = None
 
     if selected_date:
+        # As-of reconstruction: nearest checkpoint + ledger deltas, valued with stored closes
+        as_of = LedgerService.as_of(user.organization, selected_date)
+        historical_holdings = as_of['holdings']
         latest_snapshot = DailySnapshot.objects.filter(organization=user.organization, date=selected_date).first()
-        # For historical dates, we might want just transactions for that day? 
-        # But User request implies "Last Balance" correctness generally.
-        transactions = Transaction.objects.filter(organization=user.organization, timestamp__date=selected_date).order_by('-timestamp')
+        if not latest_snapshot:
+            latest_snapshot = as_of['financials']
     else:
         # Real-time calculation using FinancialService
         latest_snapshot = FinancialService.calculate_financials(user.organization)
-        transactions = Transaction.objects.filter(organization=user.organization).order_by('-timestamp')
 
     # [Dynamic Balance Calculation]
-    # To fix "Last Balance" issue without rewriting all DB history
-    # Use Aggregate Sum of transactions strictly to ensure table consistency
-    aggregated_balance = transactions.aggregate(Sum('amount'))['amount__sum'] or 0
-    running_bal = aggregated_balance
-    
-    transactions_list = list(transactions)
-    
-    for tx in transactions_list:
-        tx.dynamic_balance = running_bal
-        # Prepare for next row (older): The balance BEFORE this tx was (End - Amount)
-        # Wait. Balance After Tx = running_bal.
-        # Balance Before Tx = running_bal - tx.amount
-        # Next row (older) 's Balance After = Balance Before This Tx
-        running_bal = running_bal - tx.amount
-
-    # Pagination for Transactions
-    paginator = Paginator(transactions_list, 15)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Running balance is computed in the DB (Window Sum) and paginated by keyset cursor,
+    # so only the rows of the current page are loaded.
+    ledger_page = FinancialService.get_ledger_page(
+        user.organization,
+        date=selected_date,
+        before=_cursor_param(request, 'before'),
+        after=_cursor_param(request, 'after'),
+        page_size=15
+    )
 
     return render(request, 'financial_management.html', {
         'agents': agents,
         'latest_snapshot': latest_snapshot,
-        'transactions': page_obj,
+        'transactions': ledger_page['transactions'],
+        'ledger_page': ledger_page,
+        'historical_holdings': historical_holdings,
         'selected_date': selected_date_str,
         'active_main_menu': 'portfolio',
         'active_sub_menu': 'finance'
     })
 
+def _cursor_param(request, name):
+    """
+    Ledger keyset cursor (transaction id) from the query string; invalid values are ignored.
+    """
+    try:
+        return int(request.GET[name])
+    except (KeyError, ValueError):
+        return None
+
+@login_required
+def financial_as_of_api(request):
+    """
+    As-of query API (JSON)
+    GET /finance/as-of/?date=YYYY-MM-DD
+    """
+    as_of_date = parse_date(request.GET.get('date', '') or '')
+    if not as_of_date:
+        return JsonResponse({'success': False, 'error': 'date (YYYY-MM-DD) is required'}, status=400)
+
+    as_of = LedgerService.as_of(request.user.organization, as_of_date)
+    financials = {k: (str(v) if k == 'date' else v if isinstance(v, int) else float(v)) for k, v in as_of['financials'].items()}
+    optional = lambda v: float(v) if v is not None else None
+    holdings = [{
+        'stock_id': h['stock'].id if h['stock'] else None,
+        'stock_name': h['stock'].name if h['stock'] else '',
+        'stock_code': h['stock'].code if h['stock'] else '',
+        'quantity': h['quantity'],
+        'avg_price': float(h['avg_price']),
+        'close_price': optional(h['close_price']),
+        'currency': h['currency'],
+        'eval_amount': optional(h['eval_amount']),
+        'yield': optional(h['yield']),
+    } for h in as_of['holdings']]
+    return JsonResponse({'success': True, 'financials': financials, 'holdings': holdings})
+
+@login_required
+def performance_api(request):
+    """
+    Performance API (JSON): TWR, MWR(IRR) and per-stock contribution
+    GET /finance/performance/?start=YYYY-MM-DD&end=YYYY-MM-DD (both optional)
+    """
+    start = parse_date(request.GET.get('start', '') or '')
+    end = parse_date(request.GET.get('end', '') or '')
+    if start and end and start > end:
+        return JsonResponse({'success': False, 'error': 'start must be before end'}, status=400)
+
+    result = PerformanceService.get_performance(request.user.organization, start, end)
+    if result is None:
+        return JsonResponse({'success': False, 'error': '해당 기간의 스냅샷이 2개 이상 필요합니다.'}, status=404)
+
+    data = dict(result)
+    data['start'] = str(result['start'])
+    data['end'] = str(result['end'])
+    return JsonResponse({'success': True, 'performance': data})
+
 @login_required
 def cash_operation(request):
     if request.method == 'POST':
@@ -664,7 +727,7 @@ def approval_list(request):
             Q(temp_stock_name__icontains=search_query)
         )
         
-    approvals = approvals.order_by('-updated_at') # Latest update first
+    approvals = approvals.select_related('agent', 'drafter').order_by('-updated_at') # Latest update first
     
     return render(request, 'approval_list.html', {
         'agents': agents, 
@@ -738,30 +801,14 @@ def approval_detail(request, pk):
                     approval=approval # [New] Link for Cascade Delete
                 )
             elif approval.report_type == 'sell':
-                # Realized Profit Calculation
-                profit = 0
-                try:
-                    buy_txs = Transaction.objects.filter(
-                        organization=user.organization,
-                        related_asset=stock,
-                        transaction_type='BUY'
-                    )
-                    
-                    total_buy_qty = sum(abs(t.quantity) for t in buy_txs)
-                    total_buy_amt = sum(abs(t.amount) - t.fee for t in buy_txs) # Deduct fees
-                    
-                    avg_buy_price = total_buy_amt / total_buy_qty if total_buy_qty > 0 else 0
-                    profit = (price - float(avg_buy_price)) * approval.temp_quantity
-                except Exception:
-                    profit = 0
-                
+                # Realized Profit is computed by TransactionService from the maintained Position
                 TransactionService.sell_stock(
                     organization=user.organization,
                     stock=stock,
                     quantity=approval.temp_quantity,
                     price=price,
-                    profit=profit,
                     description=f"승인된 매도: {approval.title}",
+                    timestamp=log_date, # 매수와 같은 결재일 기준 (과거 일자면 그 시점 원가로 계산)
                     approval=approval # [New] Link
                 )
             
@@ -809,10 +856,11 @@ def org_chart(request):
     ])
 
     # 3. Add Departments
-    departments = Department.objects.filter(organization=org)
+    departments = list(Department.objects.filter(organization=org))
     for dept in departments:
         dept_id = f"DEPT_{dept.id}"
-        parent_id = f"DEPT_{dept.parent.id}" if dept.parent else ceo_id
+        # parent_id 컬럼만 사용 (부서마다 상위 부서를 조회하지 않음)
+        parent_id = f"DEPT_{dept.parent_id}" if dept.parent_id else ceo_id
         
         rows.append([
             {'v': dept_id, 'f': f'<div class="node-card dept-card"><div class="node-name">{dept.name}</div></div>'},
@@ -821,10 +869,10 @@ def org_chart(request):
         ])
 
     # 4. Add Agents
-    all_agents = Agent.objects.filter(organization=org).select_related('department_obj').prefetch_related('managed_stocks')
+    all_agents = list(Agent.objects.filter(organization=org).prefetch_related('managed_stocks'))
     for agent in all_agents:
         agent_id = f"AGENT_{agent.id}"
-        parent_id = f"DEPT_{agent.department_obj.id}" if agent.department_obj else ceo_id
+        parent_id = f"DEPT_{agent.department_obj_id}" if agent.department_obj_id else ceo_id
         
         img_url = agent.profile_image.url if agent.profile_image else ""
         img_html = f'<img src="{img_url}" style="width:100%; height:100%; object-fit:cover;">' if img_url else '👤'
@@ -861,11 +909,7 @@ def org_chart(request):
             agent.role
         ])
 
-    # Prepare raw data for D3.js
-    departments = Department.objects.filter(organization=org)
-    all_agents = Agent.objects.filter(organization=org).select_related('department_obj')
-    ceo = User.objects.filter(organization=org, role='ceo').first()
-
+    # Raw data for D3.js (the lists loaded above; parents are read as *_id columns)
     return render(request, 'org_chart.html', {
         'agents': agents, # For Sidebar
         'departments': departments,
@@ -1133,17 +1177,16 @@ def add_interest_stock(request):
             
             # 2. External Search (Yahoo Finance API)
             if not stock:
-                search_code = keyword
+                # 로컬 종목 마스터에서 심볼 확정 (.KS/.KQ 포함), 없을 때만 Yahoo 검색
+                search_code = SymbolMasterService.resolve(keyword) or keyword
                 
                 # A. If keyword is NOT a 6-digit code, try to find the ticker via Search API
-                if not (keyword.isdigit() and len(keyword) == 6):
+                if search_code == keyword and not (keyword.isdigit() and len(keyword) == 6):
                     try:
-                        import requests
                         url = "https://query2.finance.yahoo.com/v1/finance/search"
-                        headers = {'User-Agent': 'Mozilla/5.0'}
                         params = {'q': keyword, 'quotesCount': 5, 'newsCount': 0}
                         
-                        response = requests.get(url, headers=headers, params=params, timeout=5)
+                        response = get_client().get(url, params=params, timeout=5)
                         data = response.json()
                         
                         if 'quotes' in data and len(data['quotes']) > 0:
@@ -1181,27 +1224,28 @@ def add_interest_stock(request):
                     except: 
                         pass
                     
-                    # Clean code
+                    # Clean code (국내 종목은 6자리 코드 + 거래소 접미사 저장)
                     db_code = search_code
-                    if search_code.endswith('.KS'):
-                        check_code = search_code.replace('.KS', '')
+                    yahoo_suffix = ''
+                    if search_code.endswith(('.KS', '.KQ')):
+                        check_code = search_code[:-3]
                         if check_code.isdigit() and len(check_code) == 6:
-                            db_code = check_code
+                            db_code, yahoo_suffix = check_code, search_code[-3:]
                     
                     # [UPDATE] Try Naver for Metal Data
                     market_cap = None
                     description = ""
                     if db_code.isdigit() and len(db_code) == 6:
-                        naver_name = get_naver_stock_name(db_code)
-                        if naver_name:
-                            stock_name = naver_name
+                        # 종목 페이지 1회 조회로 이름/시가총액/개요
+                        naver_data = fetch_naver_stock_page(db_code)
+                        if naver_data.get('name'):
+                            stock_name = naver_data['name']
                         
-                        naver_data = get_naver_stock_extra_info(db_code, full_info.get('exchange', ''))
                         market_cap = naver_data.get('market_cap')
-                        description = naver_data.get('description', '')
+                        description = naver_data.get('description') or ''
                     else:
                         # World Stock
-                        naver_data = get_naver_stock_extra_info(db_code, full_info.get('exchange', ''))
+                        naver_data = fetch_naver_stock_page(db_code)
                         if naver_data.get('description'):
                             description = naver_data['description']
 
@@ -1214,7 +1258,8 @@ def add_interest_stock(request):
                             'current_price': current_price,
                             'country': country_ko,
                             'market_cap': market_cap,
-                            'description': description
+                            'description': description,
+                            'yahoo_suffix': yahoo_suffix,
                         }
                     )
                     # Update if exists but name/price might be old? (Optional, skipping for now)
@@ -1247,25 +1292,22 @@ def delete_interest_stock(request, stock_id):
 def get_stock_detail(request):
     """
     Ajax로 종목 상세 정보 반환 (API)
-    Refactored to use centralized update_stock utils function.
+    저장된 시세를 즉시 반환하고, 장 운영 여부에 따른 TTL이 지났으면 백그라운드 갱신을 예약합니다.
+    (한 번도 조회되지 않은 종목만 동기 갱신)
     """
     stock_id = request.GET.get('stock_id')
     try:
         stock = Stock.objects.get(id=stock_id)
         
-        # Trigger centralized update (Optimized: 1mo inc)
-        from .utils import update_stock
-        success = update_stock(stock)
-        
-        if not success:
-            print(f"Update failed for {stock.name}, serving cached data.")
-        
-        # Refresh from DB after update
-        stock.refresh_from_db()
-        
-        # Ensure candle_data is list
-        candles = stock.candle_data if isinstance(stock.candle_data, list) else []
+        refreshing = False
+        if stock.current_price is None:
+            from .utils import update_stock
+            if not update_stock(stock):
+                print(f"Update failed for {stock.name}, serving cached data.")
+        elif QuoteService.is_stale(stock):
+            refreshing = QuoteService.schedule_refresh(stock)
         
+        # 차트는 stock_chart_data 에서 기간/주기별로 따로 조회
         return JsonResponse({
             'success': True,
             'name': stock.name,
@@ -1277,34 +1319,87 @@ def get_stock_detail(request):
             'high_52w': stock.high_52w,
             'low_52w': stock.low_52w,
             'description': stock.description,
-            'candles': candles
+            'updated_at': stock.quote_updated_at.isoformat() if stock.quote_updated_at else None,
+            'refreshing': refreshing,
         })
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
 
+def _parse_chart_bound(value):
+    """
+    Chart range bound: epoch milliseconds (ApexCharts zoom) or YYYY-MM-DD. None when absent/invalid.
+    """
+    if not value:
+        return None
+    if value.isdigit():
+        return datetime.fromtimestamp(int(value) / 1000, tz=timezone.get_current_timezone())
+    day = parse_date(value)
+    return timezone.make_aware(datetime.combine(day, time.min)) if day else None
+
+@login_required
+def stock_chart_data(request, stock_id):
+    """
+    GET /api/stock/<stock_id>/chart/?interval=1d|1wk|1mo&start=...&end=...
+    Candlestick series for the visible window only; weekly/monthly bars are resampled from
+    stored daily bars (cached per stock, interval, range and candle version).
+    """
+    from .services_candles import CandleService, CHART_WINDOWS
+    interval = request.GET.get('interval', '1wk')
+    if interval not in CHART_WINDOWS:
+        return JsonResponse({'success': False, 'error': 'interval must be one of 1d, 1wk, 1mo'}, status=400)
+    if not Stock.objects.filter(id=stock_id).exists():
+        return JsonResponse({'success': False, 'error': 'Stock not found'}, status=404)
+    start = _parse_chart_bound(request.GET.get('start'))
+    end = _parse_chart_bound(request.GET.get('end'))
+    if start and end and start > end:
+        start, end = end, start
+    data = CandleService.chart(stock_id, interval, start, end)
+    return JsonResponse({'success': True, **data})
+
+@login_required
+def price_stream(request):
+    """
+    GET /api/stream/prices/?ids=1,2,3 (text/event-stream)
+    Pushes quote changes of the given stocks as 'prices' events ({stock_id: {price, krw_price,
+    currency, updated_at}}), fanned out from the process-wide PriceBroadcaster.
+    """
+    from .services_stream import PRICE_STREAM_MAX_IDS, price_events
+    ids = {int(i) for i in request.GET.get('ids', '').split(',') if i.strip().isdigit()}
+    if not ids:
+        return JsonResponse({'success': False, 'error': 'ids required'}, status=400)
+    ids = sorted(ids)[:PRICE_STREAM_MAX_IDS]
+    response = StreamingHttpResponse(price_events(ids), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx 버퍼링 해제
+    return response
+
 @login_required
 def search_stock_api(request):
     """
-    Yahoo Finance Auto-complete Proxy
+    Stock search autocomplete (local symbol master first, Yahoo Finance proxy on a miss)
     GET /stock/search/?q=...
     """
     query = request.GET.get('q', '')
     if not query:
         return JsonResponse({'quotes': []})
+
+    # 로컬 종목 마스터 (메모리 인덱스, 외부 호출 없음) - 결과가 없을 때만 Yahoo 검색
+    local = SymbolMasterService.search(query, limit=10)
+    if local:
+        return JsonResponse({'quotes': [
+            {'symbol': r['symbol'], 'name': r['name'], 'exch': r['exchange'], 'label': f"{r['name']} ({r['symbol']})"}
+            for r in local
+        ]})
     
     try:
-        import requests
         url = "https://query2.finance.yahoo.com/v1/finance/search"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
         params = {
             'q': query,
             'quotesCount': 10,
             'newsCount': 0
         }
         
-        response = requests.get(url, headers=headers, params=params, timeout=5)
+        response = get_client().get(url, params=params, timeout=5)
         data = response.json()
         
         if 'quotes' not in data:
@@ -1379,8 +1474,14 @@ def account_management(request):
         action = request.GET.get('action')
         if action == 'get_portfolio':
             account_id = request.GET.get('account_id')
+            # 'all' (or no id): every account's breakdown in one response, switched client-side
+            if not account_id or account_id == 'all':
+                portfolios = AccountPositionService.get_portfolios(user.organization)
+                return render(request, 'partials/account_portfolios.html', {
+                    'account_portfolios': [(acc, portfolios.get(acc.id, [])) for acc in accounts]
+                })
             account = get_object_or_404(Account, id=account_id, organization=user.organization)
-            portfolio = FinancialService.get_portfolio_data(user.organization, account=account)
+            portfolio = AccountPositionService.get_portfolios(user.organization, account=account).get(account.id, [])
             return render(request, 'partials/account_portfolio.html', {'portfolio': portfolio})
 
     return render(request, 'account_management.html', {
@@ -1454,19 +1555,45 @@ def update_all_stocks_api(request):
             else:
                 return JsonResponse({'status': 'error', 'message': f'Failed to update {stock.name}.'})
         else:
-            # Update all
-            stocks = Stock.objects.all()
-            count = 0
-            for stock in stocks:
-                if utils.update_stock(stock):
-                    count += 1
-            
-            messages.success(request, f'전체 {count}개 종목 평가금액 업데이트 완료.') # [New]
-            return JsonResponse({'status': 'success', 'message': f'{count} stocks updated.'})
+            # Update all: 백그라운드 작업으로 실행하고 작업 ID만 즉시 반환 (진행률은 stock_refresh_status)
+            # 진행 중인 작업 재사용 (STALE_JOB_AFTER 보다 오래된 pending/running 은 죽은 워커로 보고 새로 시작)
+            job = StockRefreshJob.objects.filter(
+                kind='manual', status__in=['pending', 'running'],
+                created_at__gte=timezone.now() - STALE_JOB_AFTER,
+            ).first()
+            if not job:
+                job = StockRefreshJob.objects.create(requested_by=request.user, total=Stock.objects.count())
+                try:
+                    refresh_stocks.delay(job.id)
+                except Exception as e:
+                    # 브로커 장애: pending 으로 남겨 두면 이후 요청이 영원히 이 작업을 반환함
+                    StockRefreshJob.objects.filter(id=job.id).update(status='failed', error=str(e), finished_at=timezone.now())
+                    return JsonResponse({'status': 'error', 'message': f'갱신 작업을 시작하지 못했습니다: {e}'}, status=503)
+            return JsonResponse({'status': 'accepted', 'job_id': job.id, 'total': job.total}, status=202)
             
     except Exception as e:
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
+@login_required
+def stock_refresh_status(request, job_id):
+    """
+    GET /api/stock/update/<job_id>/ - 일괄 갱신 작업 진행률
+    """
+    job = get_object_or_404(StockRefreshJob, id=job_id)
+    if job.status == 'done':
+        # 클라이언트는 완료 응답을 받으면 폴링을 멈추고 새로고침 (전역 메시지 모달로 표시)
+        messages.success(request, f'전체 {job.succeeded}개 종목 평가금액 업데이트 완료.')
+    return JsonResponse({
+        'job_id': job.id,
+        'status': job.status,
+        'total': job.total,
+        'processed': job.processed,
+        'succeeded': job.succeeded,
+        'failed': job.failed,
+        'progress': job.progress,
+        'error': job.error,
+    })
+
 # ==========================================
 # [New] My Info (User & Organization & Disclosure)
 # ==========================================
@@ -1495,35 +1622,24 @@ def my_info(request):
         elif 'update_disclosure' in request.POST:
             public_stock_ids = request.POST.getlist('public_stocks')
             
-            # [Fix] Must use the same logic as GET to identify held stocks
-            # Calculate held stocks from transactions
-            portfolio_map = {}
-            txs = Transaction.objects.filter(
-                organization=user.organization, 
-                related_asset__isnull=False
-            ).select_related('related_asset')
-
-            for tx in txs:
-                sid = tx.related_asset.id
-                if sid not in portfolio_map:
-                    portfolio_map[sid] = {'stock': tx.related_asset, 'quantity': 0}
-                
-                if tx.transaction_type == 'BUY':
-                    portfolio_map[sid]['quantity'] += tx.quantity
-                elif tx.transaction_type == 'SELL':
-                    portfolio_map[sid]['quantity'] -= abs(tx.quantity)
-            
-            # Iterate only currently held stocks
-            for sid, p in portfolio_map.items():
-                if p['quantity'] > 0:
-                    stock = p['stock']
-                    is_public = str(stock.id) in public_stock_ids
-                    
-                    PortfolioDisclosure.objects.update_or_create(
-                        user=user, 
-                        stock=stock, 
-                        defaults={'is_public': is_public}
-                    )
+            # Held stocks come from the incrementally maintained Position table (same source as GET)
+            held_stock_ids = list(
+                Position.objects.filter(organization=organization, quantity__gt=0).values_list('stock_id', flat=True)
+            )
+            existing = {
+                d.stock_id: d for d in PortfolioDisclosure.objects.filter(user=user, stock_id__in=held_stock_ids)
+            }
+            to_create, to_update = [], []
+            for sid in held_stock_ids:
+                is_public = str(sid) in public_stock_ids
+                disclosure = existing.get(sid)
+                if disclosure is None:
+                    to_create.append(PortfolioDisclosure(user=user, stock_id=sid, is_public=is_public))
+                elif disclosure.is_public != is_public:
+                    disclosure.is_public = is_public
+                    to_update.append(disclosure)
+            PortfolioDisclosure.objects.bulk_create(to_create)
+            PortfolioDisclosure.objects.bulk_update(to_update, ['is_public'])
             
             messages.success(request, "포트폴리오 공개 설정이 저장되었습니다.")
             return redirect('my_info')
@@ -1533,48 +1649,25 @@ def my_info(request):
     org_form = OrganizationForm(instance=organization)
 
     # Prepare Stock List (Based on Actual Portfolio Holdings)
-    # Refactored: Use Transaction aggregation instead of InterestStock
-    portfolio_map = {}
-    txs = Transaction.objects.filter(
-        organization=user.organization, 
-        related_asset__isnull=False
-    ).select_related('related_asset').order_by('timestamp')
-
-    for tx in txs:
-        sid = tx.related_asset.id
-        if sid not in portfolio_map:
-            portfolio_map[sid] = {'stock': tx.related_asset, 'quantity': 0}
-        
-        if tx.transaction_type == 'BUY':
-            portfolio_map[sid]['quantity'] += tx.quantity
-        elif tx.transaction_type == 'SELL':
-            # Note: Quantity in SELL transaction is negative in logic or positive?
-            # In investment_management: qty_sold = abs(tx.quantity). 
-            # Let's check Transaction model usage. Usually it is stored as is.
-            # investment_management logic: p['quantity'] -= abs(tx.quantity)
-            portfolio_map[sid]['quantity'] -= abs(tx.quantity)
+    # Holdings from Position, disclosure flags fetched in one query (no per-stock lookups)
+    positions = Position.objects.filter(
+        organization=organization, quantity__gt=0
+    ).select_related('stock').order_by('stock__name')
+    disclosures = dict(
+        PortfolioDisclosure.objects.filter(user=user).values_list('stock_id', 'is_public')
+    )
 
     stock_disclosure_list = []
-    for sid, p in portfolio_map.items():
-        if p['quantity'] > 0:
-            stock = p['stock']
-            disclosure = PortfolioDisclosure.objects.filter(user=user, stock=stock).first()
-            is_public = disclosure.is_public if disclosure else True # Default to True? Or False?
-            # Requirement: "Restricting access... to only superusers." -> No.
-            # Requirement: "Only users who have disclosed at least one stock"
-            # Default should probably be False for privacy, or True if opt-out? 
-            # Existing code: is_public = disclosure.is_public if disclosure else True
-            # Let's keep existing default.
-            
-            stock_disclosure_list.append({
-                'stock': stock,
-                'is_public': is_public
-            })
+    for position in positions:
+        stock_disclosure_list.append({
+            'stock': position.stock,
+            'is_public': disclosures.get(position.stock_id, True),  # 설정 전 종목은 공개가 기본값
+        })
 
     # [New] Social Stats
     followers_count = Follow.objects.filter(following=user).count()
     following_count = Follow.objects.filter(follower=user).count()
-    following_list = Follow.objects.filter(follower=user).select_related('following')
+    following_list = Follow.objects.filter(follower=user).select_related('following__organization')
 
     return render(request, 'my_info.html', {
         'user': user,
@@ -1713,108 +1806,57 @@ def portfolio_ranking(request):
         return redirect('my_info')
         
     # 2. Calculate Ranking Data
-    # Target: Users who have at least 1 public stock
-    # Logic:
-    # - Iterate candidates
-    # - Calculate Total Asset (from InvestmentLog or InterestStock 'amount' * current price?)
-    #   * Note: InvestmentLog is historical. InterestStock is current holdings but doesn't track bought price well for yield.
-    #   * Better: Use `InvestmentLog` aggregation for Total Buy/Sell -> Realized PnL? 
-    #   * OR: Just sum up `account.balance` + `stock value`.
-    #   * For simplicity & MVP: 
-    #     - Total Asset = Organization.cash_balance + Sum(InterestStock.amount * Stock.current_price)
-    #     - Total Yield = (Total Asset - Initial Capital) / Initial Capital * 100? (Hard to track initial)
-    #     - Alternative Yield: Sum(InterestStock PnL) / Sum(Buy Cost)
-    
-    # [Refined Logic utilizing InvestmentLog for accuracy]
-    candidates = User.objects.filter(role='ceo').select_related('organization')
+    # Target: CEOs who have at least 1 public stock
+    # - Total Asset = Organization.cash_balance + KRW valuation of Position holdings
+    # - Total Yield = (valuation - cost) / cost of all holdings, Public Yield = same over public stocks
+    # Disclosures, positions and prices are loaded once for all candidates (constant query count).
+    public_stocks_by_user = {}
+    for user_id, stock_id in PortfolioDisclosure.objects.filter(
+        is_public=True, user__role='ceo'
+    ).values_list('user_id', 'stock_id'):
+        public_stocks_by_user.setdefault(user_id, set()).add(stock_id)
+
+    candidates = list(
+        User.objects.filter(id__in=public_stocks_by_user, organization__isnull=False).select_related('organization')
+    )
+    org_ids = {candidate.organization_id for candidate in candidates}
+
+    positions_by_org = {}
+    for position in Position.objects.filter(organization_id__in=org_ids, quantity__gt=0).select_related('stock'):
+        positions_by_org.setdefault(position.organization_id, []).append(position)
+
+    stocks = {p.stock_id: p.stock for org_positions in positions_by_org.values() for p in org_positions}
+    stock_prices = FxService.to_krw(
+        {sid: stock.current_price for sid, stock in stocks.items()},
+        {sid: currency_for(stock.country) for sid, stock in stocks.items()},
+    )
+
     ranking_data = []
-    
     for candidate in candidates:
-        # 1. Check Participation
-        public_disclosures = PortfolioDisclosure.objects.filter(user=candidate, is_public=True).select_related('stock')
-        if not public_disclosures.exists():
-            continue
-            
-        public_stock_ids = [pd.stock.id for pd in public_disclosures]
-        
-        # 2. Calculate Portfolio Stats from InvestmentLog (Actual Ledger)
-        logs = InvestmentLog.objects.filter(user=candidate, action__in=['buy', 'sell']).select_related('stock')
-        
-        # Group by stock to calculate weighted average yield
-        stock_stats = {} # { stock_id: { 'total_qty': 0, 'total_cost': 0, 'current_value': 0 } }
-        
-        total_investment_cost = 0
-        current_total_value = 0
-        
-        # Simplified calculation: 
-        # For each log, if buy -> add cost/qty. if sell -> remove cost/qty (FIFO or Avg).
-        # Since it's complex, let's use a simpler current-state snapshot approch if possible.
-        # Check if `InterestStock` has the current holding amount?
-        # If not, let's assume `InvestmentLog` is the source of truth.
-        
-        # [Alternative] Use simple aggregation for MVP
-        # Total Asset = Org Cash + Stock Valuation
-        org_cash = candidate.organization.cash_balance
-        
-        # Calculate Stock Valuation
-        # We need per-stock quantity. 
-        # Let's retrieve this from `InterestStock` assuming it syncs with holdings (as per my_info logic).
-        interest_stocks = InterestStock.objects.filter(user=candidate).select_related('stock')
-        
+        public_stock_ids = public_stocks_by_user[candidate.id]
+
         stock_valuation = 0
+        total_investment_cost = 0
         public_stock_valuation = 0
-        public_stock_profit = 0
         public_stock_cost = 0
-        
-        # Note: InterestStock usually needs to store 'quantity' and 'average_price' to be useful here.
-        # If it doesn't, we must rely on logs.
-        # Let's try to infer from logs quickly.
-        
-        portfolio_map = {}
-        for log in logs:
-            if not log.stock:
+
+        for position in positions_by_org.get(candidate.organization_id, []):
+            price = stock_prices.get(position.stock_id)
+            if price is None:
+                # 환율 없음: 평가/원가 모두 제외
                 continue
-                
-            sid = log.stock.id
-            if sid not in portfolio_map:
-                portfolio_map[sid] = {'qty': 0, 'cost': 0}
-            
-            if log.action == 'buy':
-                portfolio_map[sid]['qty'] += log.amount
-                portfolio_map[sid]['cost'] += (log.amount * log.price)
-            elif log.action == 'sell':
-                # Reduce cost proportionally
-                if portfolio_map[sid]['qty'] > 0:
-                    avg_price = portfolio_map[sid]['cost'] / portfolio_map[sid]['qty']
-                    portfolio_map[sid]['cost'] -= (log.amount * avg_price)
-                    portfolio_map[sid]['qty'] -= log.amount
-
-        # [Optimization] Pre-fetch stock prices
-        # We need prices for all stocks in logs
-        all_stock_ids = set([l.stock.id for l in logs if l.stock])
-        stock_prices = {s.id: s.current_price for s in Stock.objects.filter(id__in=all_stock_ids)}
-        
-        # Value Calculation
-        for sid, data in portfolio_map.items():
-            qty = data['qty']
-            cost = data['cost']
-            
-            if qty > 0:
-                try:
-                    current_price = stock_prices.get(sid, 0)
-                    val = qty * current_price
-                    
-                    stock_valuation += val
-                    total_investment_cost += cost
-                    
-                    # If this stock is public
-                    if sid in public_stock_ids:
-                        public_stock_valuation += val
-                        public_stock_cost += cost
-                except:
-                    pass
-
-        total_asset = org_cash + stock_valuation
+            val = float(position.quantity * price)
+            cost = float(position.total_cost)
+
+            stock_valuation += val
+            total_investment_cost += cost
+
+            # If this stock is public
+            if position.stock_id in public_stock_ids:
+                public_stock_valuation += val
+                public_stock_cost += cost
+
+        total_asset = float(candidate.organization.cash_balance) + stock_valuation
         
         # Calculate Yields
         total_yield = 0
@@ -1828,7 +1870,7 @@ def portfolio_ranking(request):
         ranking_data.append({
             'user': candidate,
             'organization': candidate.organization,
-            'total_asset': total_asset,
+            'total_asset': round(total_asset),
             'total_yield': round(total_yield, 2),
             'public_yield': round(public_yield, 2),
             'stock_count': len(public_stock_ids)
@@ -1862,7 +1904,7 @@ def feed(request):
     user = request.user
     
     # 1. Get List of Following
-    following_ids = Follow.objects.filter(follower=user).values_list('following_id', flat=True)
+    following_ids = set(Follow.objects.filter(follower=user).values_list('following_id', flat=True))
     
     # 2. Feed Algorithm
     # - Following Posts: High priority
@@ -1874,7 +1916,7 @@ def feed(request):
     following_posts = Post.objects.filter(author_id__in=following_ids).select_related('author', 'organization')
     
     # Fetch Popular Posts (High Views, excluding Following)
-    popular_posts = Post.objects.exclude(author_id__in=following_ids).exclude(author=user).filter(views__gte=10).order_by('-views', '-created_at')[:5]
+    popular_posts = Post.objects.exclude(author_id__in=following_ids).exclude(author=user).filter(views__gte=10).select_related('author', 'organization').order_by('-views', '-created_at')[:5]
     
     # Merge and Sort (in Python) to interleave? 
     # Or just show "Following" feed primarily, and a "Recommended" section.
@@ -1888,23 +1930,21 @@ def feed(request):
     final_feed = []
     pop_idx = 0
     
-    if not feed_items and pop_items:
-        # If no following, just show popular
-        final_feed = pop_items
-    else:
-        for i, post in enumerate(feed_items):
-            final_feed.append({'type': 'following', 'post': post})
-            if (i + 1) % 3 == 0 and pop_idx < len(pop_items):
-                final_feed.append({'type': 'popular', 'post': pop_items[pop_idx]})
-                pop_idx += 1
-                
-        # Append remaining popular if feed is short
-        while pop_idx < len(pop_items):
+    # 팔로우가 없으면 아래 루프가 인기 글만 채움 (템플릿은 항상 {'type', 'post'} 항목을 기대)
+    for i, post in enumerate(feed_items):
+        final_feed.append({'type': 'following', 'post': post})
+        if (i + 1) % 3 == 0 and pop_idx < len(pop_items):
             final_feed.append({'type': 'popular', 'post': pop_items[pop_idx]})
             pop_idx += 1
 
+    # Append remaining popular if feed is short
+    while pop_idx < len(pop_items):
+        final_feed.append({'type': 'popular', 'post': pop_items[pop_idx]})
+        pop_idx += 1
+
     return render(request, 'community/feed.html', {
         'feed_items': final_feed,
+        'following_ids': following_ids, # 팔로우 버튼 상태 (포스트별 쿼리 없이 판별)
         'active_main_menu': 'community',
         'active_sub_menu': 'feed'
     })
@@ -124,6 +124,16 @@ def delete_strategy_api(request, pk):
     except Strategy.DoesNotExist:
         return JsonResponse({'success': False, 'error': '전략을 찾을 수 없습니다.'})
 
+def yahoo_ticker(code):
+    """
+    Stock code -> Yahoo symbol: the stored exchange suffix when the stock is known,
+    else .KS for numeric (Korean) codes.
+    """
+    if not code or not code.isdigit():
+        return code
+    suffix = Stock.objects.filter(code=code).values_list('yahoo_suffix', flat=True).first()
+    return f"{code}{suffix or '.KS'}"
+
 @login_required
 def run_backtest_api(request):
     """
@@ -147,12 +157,8 @@ def run_backtest_api(request):
         except Exception as e:
             return JsonResponse({'success': False, 'error': f"전략 설정 오류: {str(e)}"})
 
-        # 2. Add '.KS' suffix for yfinance if Korean stock
-        # Ideally, Stock model should handle this, but for now:
-        # If code is numeric (e.g., 005930), add .KS
-        ticker_symbol = ticker_code
-        if ticker_code.isdigit():
-             ticker_symbol = f"{ticker_code}.KS"
+        # 2. Yahoo symbol (stored .KS/.KQ suffix for Korean stocks)
+        ticker_symbol = yahoo_ticker(ticker_code)
 
         # 3. Run Engine
         result = BacktestEngine.run(strategy_logic, ticker_symbol, capital)
@@ -195,9 +201,7 @@ def export_backtest_csv(request):
             pass # Engine handles runtime errors, or we can catch here
 
         # Ticker Suffix
-        ticker_symbol = ticker
-        if ticker and ticker.isdigit():
-             ticker_symbol = f"{ticker}.KS"
+        ticker_symbol = yahoo_ticker(ticker)
 
         # Run Engine
         result = BacktestEngine.run(strategy_logic, ticker_symbol, capital)